@@ -1,15 +1,24 @@
 import time
-import re
 import os
-from typing import List, Dict, Tuple, Union
+from typing import List, Dict, Tuple, Union, Optional, Set, Iterable
 import logging
 import sys
+import threading
 from io import StringIO
+from colorama import Fore, Style
 from .web_scraper import get_web_content, can_fetch
-from .llm_config import get_llm_config
+from .cancellation import CancellationToken, UNCANCELLABLE
+from .page_knowledge import PageKnowledgeBase, canonical_url, get_shared_knowledge_base
 from .llm_response_parser import UltimateLLMResponseParser
 from .llm_wrapper import LLMWrapper
-from urllib.parse import urlparse
+from .search_cache import SearchCache
+from .search_providers import SearchProvider, DuckDuckGoProvider, TIME_RANGE_SECONDS
+from .result_ranker import ResultRanker, PageSelectionPolicy, YieldTracker
+from .summarizer import estimate_tokens
+from .prompt_builder import PromptBuilder, normalize_whitespace
+from .response_parsing import parse_response, clean_query, normalize_time_range
+from .response_corpus import record_response
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
 # Set up logging
 log_directory = 'logs'
@@ -20,7 +29,7 @@ if not os.path.exists(log_directory):
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 log_file = os.path.join(log_directory, 'llama_output.log')
-file_handler = logging.FileHandler(log_file)
+file_handler = logging.FileHandler(log_file, delay=True)
 formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 file_handler.setFormatter(formatter)
 logger.handlers = []
@@ -33,27 +42,86 @@ for name in ['root', 'duckduckgo_search', 'requests', 'urllib3']:
     logging.getLogger(name).handlers = []
     logging.getLogger(name).propagate = False
 
+class _ThreadRoutedStream:
+    """Stream proxy that sends writes to the calling thread's redirect target, if it has one"""
+
+    def __init__(self, default):
+        self.default = default
+        self.local = threading.local()
+
+    def _target(self):
+        return getattr(self.local, 'stream', None) or self.default
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        return self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self.default, name)
+
 class OutputRedirector:
+    """
+    Captures output printed by the current thread.
+
+    sys.stdout and sys.stderr are replaced once by thread-routing proxies, so concurrent
+    redirects in worker threads neither capture each other's output nor restore the wrong stream.
+    """
+
+    _install_lock = threading.Lock()
+
     def __init__(self, stream=None):
         self.stream = stream or StringIO()
-        self.original_stdout = sys.stdout
-        self.original_stderr = sys.stderr
+        self._previous = []
+
+    @classmethod
+    def _routed(cls):
+        with cls._install_lock:
+            if not isinstance(sys.stdout, _ThreadRoutedStream):
+                sys.stdout = _ThreadRoutedStream(sys.stdout)
+            if not isinstance(sys.stderr, _ThreadRoutedStream):
+                sys.stderr = _ThreadRoutedStream(sys.stderr)
+        return sys.stdout, sys.stderr
 
     def __enter__(self):
-        sys.stdout = self.stream
-        sys.stderr = self.stream
+        self._previous = []
+        for routed in self._routed():
+            self._previous.append((routed, getattr(routed.local, 'stream', None)))
+            routed.local.stream = self.stream
         return self.stream
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        sys.stdout = self.original_stdout
-        sys.stderr = self.original_stderr
+        for routed, previous in self._previous:
+            routed.local.stream = previous
 
 class EnhancedSelfImprovingSearch:
-    def __init__(self, llm: LLMWrapper, parser: UltimateLLMResponseParser, max_attempts: int = 5):
+    def __init__(self, llm: LLMWrapper, parser: UltimateLLMResponseParser, max_attempts: int = 5,
+                 search_cache: Optional[SearchCache] = None, search_provider: Optional[SearchProvider] = None,
+                 snippet_first: bool = True, knowledge_base: Optional[PageKnowledgeBase] = None):
         self.llm = llm
         self.parser = parser
         self.max_attempts = max_attempts
-        self.llm_config = get_llm_config()
+        # The preset the LLM was created with; loading the default preset could prompt for one
+        self.llm_config = llm.llm_config
+        self.search_cache = search_cache if search_cache is not None else SearchCache()
+        self.search_provider = search_provider or DuckDuckGoProvider()
+        self.ranker = ResultRanker()
+        self.seen_urls: Set[str] = set()
+        self.page_policy = PageSelectionPolicy()
+        self.yield_tracker = YieldTracker()
+        # Try answering from search result snippets before fetching any page
+        self.snippet_first = snippet_first
+        self.max_snippets = 8
+        # Pages from earlier sessions that match a query are offered alongside its search results
+        self.knowledge_base = knowledge_base if knowledge_base is not None else get_shared_knowledge_base()
+        self.max_known_pages = 3
+        self.cancel_token: CancellationToken = UNCANCELLABLE
+
+    def set_cancel_token(self, token: CancellationToken):
+        """Abort this engine's LLM calls, searches and page fetches with Cancelled once token is set"""
+        self.cancel_token = token
+        self.llm.cancel_token = token
 
     @staticmethod
     def initialize_llm():
@@ -66,14 +134,28 @@ class EnhancedSelfImprovingSearch:
     def print_searching(self):
         print(Fore.MAGENTA + "📝 Searching..." + Style.RESET_ALL)
 
-    def search_and_improve(self, user_query: str) -> str:
+    def search_and_improve(self, user_query: str, interactive: bool = True, parallel_attempts: int = 1) -> str:
+        """
+        Search, scrape and evaluate until the content answers the question or attempts run out.
+
+        Args:
+            user_query (str): The question to answer.
+            interactive (bool): Confirm each search at the terminal. When False, attempts are
+                pipelined: the query for the next attempt is formulated while the current one
+                is searched, scraped and evaluated.
+            parallel_attempts (int): In non-interactive mode, how many attempts may run at once.
+        """
+        if not interactive:
+            return self._search_and_improve_pipelined(user_query, parallel_attempts)
+
         attempt = 0
+        tried_queries: List[str] = []
         while attempt < self.max_attempts:
             print(f"\n{Fore.CYAN}Search attempt {attempt + 1}:{Style.RESET_ALL}")
             self.print_searching()
 
             try:
-                formulated_query, time_range = self.formulate_query(user_query, attempt)
+                formulated_query, time_range = self.formulate_query(user_query, attempt, tried_queries)
 
                 print(f"{Fore.YELLOW}Original query: {user_query}{Style.RESET_ALL}")
                 print(f"{Fore.YELLOW}Formulated query: {formulated_query}{Style.RESET_ALL}")
@@ -83,61 +165,165 @@ class EnhancedSelfImprovingSearch:
                     print(f"{Fore.RED}Error: Empty search query. Retrying...{Style.RESET_ALL}")
                     attempt += 1
                     continue
-                
-                input(f"\nTrying search:\n{formulated_query}\nPress enter to continue\n")
-
-                search_results = self.perform_search(formulated_query, time_range)
+                tried_queries.append(formulated_query)
 
-                if not search_results:
-                    print(f"{Fore.RED}No results found. Retrying with a different query...{Style.RESET_ALL}")
-                    attempt += 1
-                    continue
+                input(f"\nTrying search:\n{formulated_query}\nPress enter to continue\n")
 
-                self.display_search_results(search_results)
+                answer = self._run_attempt(user_query, formulated_query, time_range)
+                if answer is not None:
+                    return answer
+                attempt += 1
 
-                selected_urls = self.select_relevant_pages(search_results, user_query)
+            except Exception as e:
+                print(f"{Fore.RED}An error occurred during search attempt. Check the log file for details.{Style.RESET_ALL}")
+                logger.error(f"An error occurred during search: {str(e)}", exc_info=True)
+                attempt += 1
 
-                if not selected_urls:
-                    print(f"{Fore.RED}No relevant URLs found. Retrying...{Style.RESET_ALL}")
-                    attempt += 1
-                    continue
+        return self.synthesize_final_answer(user_query)
 
-                print(Fore.MAGENTA + "⚙️ Scraping selected pages..." + Style.RESET_ALL)
-                # Scraping is done without OutputRedirector to ensure messages are visible
-                scraped_content = self.scrape_content(selected_urls)
+    def _search_and_improve_pipelined(self, user_query: str, parallel_attempts: int = 1) -> str:
+        """Non-interactive search_and_improve that overlaps query formulation with running attempts"""
+        # Attempts share a token of their own: setting it once an answer is in aborts the LLM
+        # calls and page fetches of the attempts still running. Cancelling the engine's token
+        # cancels it too.
+        session_token, session_llm_token = self.cancel_token, self.llm.cancel_token
+        attempts_token = CancellationToken()
+        executor = ThreadPoolExecutor(max_workers=max(1, parallel_attempts) + 1, thread_name_prefix="search-attempt")
+        tried_queries: List[str] = []
+        in_flight = set()
+        answer = None
+        attempt = 0
 
-                if not scraped_content:
-                    print(f"{Fore.RED}Failed to scrape content. Retrying...{Style.RESET_ALL}")
-                    attempt += 1
-                    continue
+        with session_token.on_cancel(attempts_token.set):
+            self.set_cancel_token(attempts_token)
+            try:
+                next_query = executor.submit(self.formulate_query, user_query, 0, [])
+                while answer is None:
+                    if next_query is not None and len(in_flight) < max(1, parallel_attempts):
+                        formulated_query, time_range = self._formulated_query(next_query, user_query, tried_queries)
+                        attempt += 1
+                        next_query = None
+                        if formulated_query:
+                            print(f"\n{Fore.CYAN}Search attempt {attempt}: {formulated_query} (time range: {time_range}){Style.RESET_ALL}")
+                            tried_queries.append(formulated_query)
+                            in_flight.add(executor.submit(
+                                self._run_attempt_safely, user_query, formulated_query, time_range
+                            ))
+                        # Start on the next query right away, while this attempt runs
+                        if attempt < self.max_attempts:
+                            next_query = executor.submit(self.formulate_query, user_query, attempt, list(tried_queries))
+                        continue
+
+                    if not in_flight:
+                        break
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if future.result() is not None and answer is None:
+                            answer = future.result()
+            finally:
+                attempts_token.set()
+                for future in in_flight:
+                    future.cancel()
+                # The token has aborted whatever the remaining attempts were waiting on
+                executor.shutdown(wait=True)
+                self.cancel_token, self.llm.cancel_token = session_token, session_llm_token
+
+        return answer if answer is not None else self.synthesize_final_answer(user_query)
+
+    def _formulated_query(self, future, user_query: str, tried_queries: List[str]) -> Tuple[str, str]:
+        """
+        The query a formulate_query future produced. If formulating it failed, the fallback
+        query is tried instead, unless it already was, in which case the attempt is skipped.
+        """
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"{Fore.RED}An error occurred while formulating a search query. Check the log file for details.{Style.RESET_ALL}")
+            logger.error(f"An error occurred while formulating a search query: {str(e)}", exc_info=True)
+        fallback = self.fallback_query(user_query)
+        return ("" if fallback in tried_queries else fallback), "none"
 
-                self.display_scraped_content(scraped_content)
+    def _run_attempt_safely(self, user_query: str, formulated_query: str, time_range: str) -> Optional[str]:
+        try:
+            return self._run_attempt(user_query, formulated_query, time_range)
+        except Exception as e:
+            print(f"{Fore.RED}An error occurred during search attempt. Check the log file for details.{Style.RESET_ALL}")
+            logger.error(f"An error occurred during search: {str(e)}", exc_info=True)
+            return None
 
-                self.print_thinking()
+    def _run_attempt(self, user_query: str, formulated_query: str, time_range: str) -> Optional[str]:
+        """
+        One search attempt: search, select, scrape and evaluate.
 
-                with OutputRedirector() as output:
-                    evaluation, decision = self.evaluate_scraped_content(user_query, scraped_content)
-                llm_output = output.getvalue()
-                logger.info(f"LLM Output in evaluate_scraped_content:\n{llm_output}")
+        Returns the final answer, or None if the attempt failed, needs refinement or was cancelled.
+        """
+        def is_cancelled() -> bool:
+            return self.cancel_token.is_set()
 
-                print(f"{Fore.MAGENTA}Evaluation: {evaluation}{Style.RESET_ALL}")
-                print(f"{Fore.MAGENTA}Decision: {decision}{Style.RESET_ALL}")
+        search_results = self.perform_search(formulated_query, time_range)
 
-                if decision == "answer":
-                    return self.generate_final_answer(user_query, scraped_content)
-                elif decision == "refine":
-                    print(f"{Fore.YELLOW}Refining search...{Style.RESET_ALL}")
-                    attempt += 1
-                else:
-                    print(f"{Fore.RED}Unexpected decision. Proceeding to answer.{Style.RESET_ALL}")
-                    return self.generate_final_answer(user_query, scraped_content)
+        if not search_results:
+            print(f"{Fore.RED}No results found. Retrying with a different query...{Style.RESET_ALL}")
+            return None
+        if is_cancelled():
+            return None
 
-            except Exception as e:
-                print(f"{Fore.RED}An error occurred during search attempt. Check the log file for details.{Style.RESET_ALL}")
-                logger.error(f"An error occurred during search: {str(e)}", exc_info=True)
-                attempt += 1
+        self.display_search_results(search_results)
 
-        return self.synthesize_final_answer(user_query)
+        if self.snippet_first:
+            snippets = self.collect_snippets(search_results, user_query)
+            if snippets:
+                self.print_thinking()
+                with OutputRedirector() as output:
+                    evaluation, decision = self.evaluate_snippets(user_query, snippets)
+                logger.info(f"LLM Output in evaluate_snippets:\n{output.getvalue()}")
+                print(f"{Fore.MAGENTA}Snippet evaluation: {evaluation}{Style.RESET_ALL}")
+                if decision == "answer" and not is_cancelled():
+                    print(f"{Fore.GREEN}Search snippets are sufficient, skipping page scraping.{Style.RESET_ALL}")
+                    return self.generate_final_answer(user_query, snippets)
+
+        selected_urls = self.select_relevant_pages(search_results, user_query)
+
+        if not selected_urls:
+            print(f"{Fore.RED}No relevant URLs found. Retrying...{Style.RESET_ALL}")
+            return None
+        if is_cancelled():
+            return None
+
+        print(Fore.MAGENTA + "⚙️ Scraping selected pages..." + Style.RESET_ALL)
+        # Scraping is done without OutputRedirector to ensure messages are visible
+        scraped_content = self.scrape_content(selected_urls)
+        for url in selected_urls:
+            self.yield_tracker.record(user_query, estimate_tokens(scraped_content.get(url, "")))
+
+        if not scraped_content:
+            print(f"{Fore.RED}Failed to scrape content. Retrying...{Style.RESET_ALL}")
+            return None
+        if is_cancelled():
+            return None
+
+        self.display_scraped_content(scraped_content)
+
+        self.print_thinking()
+
+        with OutputRedirector() as output:
+            evaluation, decision = self.evaluate_scraped_content(user_query, scraped_content)
+        llm_output = output.getvalue()
+        logger.info(f"LLM Output in evaluate_scraped_content:\n{llm_output}")
+
+        print(f"{Fore.MAGENTA}Evaluation: {evaluation}{Style.RESET_ALL}")
+        print(f"{Fore.MAGENTA}Decision: {decision}{Style.RESET_ALL}")
+
+        if is_cancelled():
+            return None
+        if decision == "answer":
+            return self.generate_final_answer(user_query, scraped_content)
+        elif decision == "refine":
+            print(f"{Fore.YELLOW}Refining search...{Style.RESET_ALL}")
+            return None
+        else:
+            print(f"{Fore.RED}Unexpected decision. Proceeding to answer.{Style.RESET_ALL}")
+            return self.generate_final_answer(user_query, scraped_content)
 
     def evaluate_scraped_content(self, user_query: str, scraped_content: Dict[str, str]) -> Tuple[str, str]:
         user_query_short = user_query[:200]
@@ -170,18 +356,64 @@ Decision: [ONLY 'answer' if content is sufficient, or 'refine' if more informati
         logger.warning("Failed to get a valid decision in evaluate_scraped_content. Defaulting to 'refine'.")
         return "Failed to evaluate content.", "refine"
 
+    def collect_snippets(self, search_results: List[Dict], user_query: str, min_words: int = 30) -> Dict[str, str]:
+        """
+        The snippets of the best ranked results, keyed by URL like scraped content.
+
+        Returns an empty dict when there is too little snippet text to be worth evaluating.
+        """
+        ranked = self.ranker.rank(search_results, user_query)
+        snippets = {}
+        for r in ranked[:self.max_snippets]:
+            body = normalize_whitespace(r.result.get('body', ''))
+            if body:
+                snippets[r.url] = f"{normalize_whitespace(r.result.get('title', ''))}: {body}"
+        if sum(len(text.split()) for text in snippets.values()) < min_words:
+            return {}
+        return snippets
+
+    def evaluate_snippets(self, user_query: str, snippets: Dict[str, str]) -> Tuple[str, str]:
+        """Decide whether search snippets alone answer the question ('answer') or pages are needed ('refine')"""
+        user_query_short = user_query[:200]
+        prompt = f"""
+Evaluate if the following search result snippets already answer the user's question.
+
+User's question: "{user_query_short}"
+
+Search Snippets:
+{self.format_scraped_content(snippets)}
+
+Your task:
+1. Snippets are short excerpts, so only decide to 'answer' if they directly and unambiguously contain the information the question asks for.
+2. If the question needs detail, explanation or context the snippets do not contain, decide to 'refine' so the full pages are read.
+
+Respond using EXACTLY this format:
+Evaluation: [Your evaluation of the snippets]
+Decision: [ONLY 'answer' if the snippets are sufficient, or 'refine' if the full pages are needed]
+"""
+        for attempt in range(2):
+            try:
+                response_text = self.llm.generate(prompt, max_tokens=150, stop=None)
+                evaluation, decision = self.parse_evaluation_response(response_text)
+                if decision in ['answer', 'refine']:
+                    return evaluation, decision
+            except Exception as e:
+                logger.warning(f"Error in evaluate_snippets (attempt {attempt + 1}): {str(e)}")
+
+        return "Failed to evaluate snippets.", "refine"
+
     def parse_evaluation_response(self, response: str) -> Tuple[str, str]:
-        evaluation = ""
-        decision = ""
-        for line in response.strip().split('\n'):
-            if line.startswith('Evaluation:'):
-                evaluation = line.split(':', 1)[1].strip()
-            elif line.startswith('Decision:'):
-                decision = line.split(':', 1)[1].strip().lower()
-        return evaluation, decision
-
-    def formulate_query(self, user_query: str, attempt: int) -> Tuple[str, str]:
+        record_response('evaluation', response)
+        parsed = parse_response(response)
+        return parsed.evaluation or "", parsed.decision or ""
+
+    def formulate_query(self, user_query: str, attempt: int,
+                        previous_queries: Optional[List[str]] = None) -> Tuple[str, str]:
         user_query_short = user_query[:200]
+        previous = ""
+        if previous_queries:
+            previous = ("These queries were already tried without finding a sufficient answer; "
+                        "use a different query:\n" + "\n".join(f"- {q}" for q in previous_queries) + "\n")
         prompt = f"""
 Based on the following user question, formulate a concise and effective search query:
 "{user_query_short}"
@@ -194,7 +426,7 @@ Time range options:
 - 'm': Limit results to the past month. Use for relatively recent information or ongoing events.
 - 'y': Limit results to the past year. Use for annual events or information that changes yearly.
 - 'none': No time limit. Use for historical information or topics not tied to a specific time frame.
-Respond in the following format:
+{previous}Respond in the following format:
 Search query: [Your 2-5 word query]
 Time range: [d/w/m/y/none]
 Do not provide any additional information or explanation.
@@ -211,28 +443,15 @@ Do not provide any additional information or explanation.
         return self.fallback_query(user_query), "none"
 
     def parse_query_response(self, response: str) -> Tuple[str, str]:
-        query = ""
-        time_range = "none"
-        for line in response.strip().split('\n'):
-            if ":" in line:
-                key, value = line.split(":", 1)
-                key = key.strip().lower()
-                value = value.strip()
-                if "query" in key:
-                    query = self.clean_query(value)
-                elif "time" in key or "range" in key:
-                    time_range = self.validate_time_range(value)
-        return query, time_range
+        record_response('query', response)
+        parsed = parse_response(response)
+        return parsed.query, parsed.time_range or "none"
 
     def clean_query(self, query: str) -> str:
-        query = re.sub(r'["\'\[\]]', '', query)
-        query = re.sub(r'\s+', ' ', query)
-        return query.strip()[:100]
+        return clean_query(query)
 
     def validate_time_range(self, time_range: str) -> str:
-        valid_ranges = ['d', 'w', 'm', 'y', 'none']
-        time_range = time_range.lower()
-        return time_range if time_range in valid_ranges else 'none'
+        return normalize_time_range(time_range) or 'none'
 
     def fallback_query(self, user_query: str) -> str:
         words = user_query.split()
@@ -241,22 +460,80 @@ Do not provide any additional information or explanation.
     def perform_search(self, query: str, time_range: str) -> List[Dict]:
         if not query:
             return []
+        self.cancel_token.raise_if_cancelled()
+
+        results = self._add_known_pages(query, time_range, self._search_provider(query, time_range))
+        return [{'number': i+1, **result} for i, result in enumerate(results)]
 
-        from duckduckgo_search import DDGS
+    def _search_provider(self, query: str, time_range: str) -> List[Dict]:
+        provider = self.search_provider
+        if provider.cacheable:
+            cached_results = self.search_cache.get(query, time_range, provider.name)
+            if cached_results is not None:
+                logger.info(f"Search cache hit for: {query} ({time_range})")
+                return cached_results
 
-        with DDGS() as ddgs:
+        try:
+            results = provider.search(query, time_range, max_results=10)
+            logger.info(f"{provider.name} returned {len(results)} results for: {query}")
+        except Exception as e:
+            print(f"{Fore.RED}Search error: {str(e)}{Style.RESET_ALL}")
+            logger.error(f"Search error from {provider.name}: {str(e)}")
+            return []
+        # Provider calls cannot be interrupted; results that arrive after a stop are dropped
+        self.cancel_token.raise_if_cancelled()
+
+        if provider.cacheable:
             try:
-                with OutputRedirector() as output:
-                    if time_range and time_range != 'none':
-                        results = list(ddgs.text(query, timelimit=time_range, max_results=10))
-                    else:
-                        results = list(ddgs.text(query, max_results=10))
-                ddg_output = output.getvalue()
-                logger.info(f"DDG Output in perform_search:\n{ddg_output}")
-                return [{'number': i+1, **result} for i, result in enumerate(results)]
+                self.search_cache.put(query, time_range, results, provider.name)
             except Exception as e:
-                print(f"{Fore.RED}Search error: {str(e)}{Style.RESET_ALL}")
-                return []
+                # The results are still good, they just are not cached
+                logger.warning(f"Could not cache search results for '{query}': {str(e)}")
+        return results
+
+    def _add_known_pages(self, query: str, time_range: str, results: List[Dict]) -> List[Dict]:
+        """Append stored pages from earlier sessions that match the query and are not among the results"""
+        if not self.max_known_pages:
+            return results
+        try:
+            known = self.knowledge_base.search(query, self.max_known_pages, max_age=TIME_RANGE_SECONDS.get(time_range))
+        except Exception as e:
+            logger.warning(f"Page knowledge base search failed: {str(e)}")
+            return results
+        urls = {self.normalize_url(result.get('href', '')) for result in results}
+        added = [result for result in known if self.normalize_url(result['href']) not in urls]
+        if added:
+            logger.info(f"Page knowledge base offered {len(added)} earlier pages for: {query}")
+        return results + added
+
+    def perform_searches(self, queries: List[str], time_range: str = 'none', max_results: int = 20) -> List[Dict]:
+        """Run several queries concurrently and merge their results without duplicate URLs"""
+        queries = [query for query in queries if query]
+        if not queries:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(4, len(queries))) as executor:
+            result_sets = list(executor.map(lambda query: self.perform_search(query, time_range), queries))
+
+        # Interleave by rank so every query's best results come before any query's weaker ones
+        merged = []
+        seen = set()
+        for rank in range(max((len(results) for results in result_sets), default=0)):
+            for results in result_sets:
+                if rank >= len(results):
+                    continue
+                result = {k: v for k, v in results[rank].items() if k != 'number'}
+                key = self.normalize_url(result.get('href', ''))
+                if key and key not in seen:
+                    seen.add(key)
+                    merged.append(result)
+
+        return [{'number': i+1, **result} for i, result in enumerate(merged[:max_results])]
+
+    @staticmethod
+    def normalize_url(url: str) -> str:
+        """Canonical form of a URL for duplicate detection"""
+        return canonical_url(url)
 
     def display_search_results(self, results: List[Dict]) -> None:
         """Display search results with minimal output"""
@@ -272,25 +549,49 @@ Do not provide any additional information or explanation.
         except Exception as e:
             logger.error(f"Error displaying search results: {str(e)}")
 
-    def select_relevant_pages(self, search_results: List[Dict], user_query: str) -> List[str]:
+    def select_relevant_pages(self, search_results: List[Dict], user_query: str,
+                              seen_urls: Optional[Iterable[str]] = None, focus: str = "",
+                              remaining_pages: Optional[int] = None) -> List[str]:
+        seen_urls = self.seen_urls if seen_urls is None else set(seen_urls) | self.seen_urls
+        ranked = self.ranker.rank(search_results, f"{focus} {user_query}", seen_urls)
+
+        # How many pages this result set is worth, from 0 up to the policy maximum
+        count = self.page_policy.choose_count(ranked, remaining_pages, self.yield_tracker.novelty_factor())
+        if count == 0:
+            logger.info("No search result scored high enough to be worth fetching")
+            return []
+
+        # A confident local ranking replaces the LLM call entirely
+        if self.ranker.is_confident(ranked, count):
+            allowed_urls = [r.url for r in ranked[:count] if can_fetch(r.url, self.knowledge_base)]
+            if allowed_urls:
+                logger.info(f"Selected pages by local ranking without LLM: {allowed_urls}")
+                return allowed_urls
+
+        # Otherwise the LLM only chooses among the shortlist
+        shortlist = self.ranker.shortlist(ranked)
+        if len(shortlist) <= count:
+            return [result['href'] for result in shortlist if can_fetch(result['href'], self.knowledge_base)]
+
         prompt = f"""
 Given the following search results for the user's question: "{user_query}"
-Select the 2 most relevant results to scrape and analyze. Explain your reasoning for each selection.
+Select up to {count} of the most relevant results to scrape and analyze. Explain your reasoning for each selection.
 
 Search Results:
-{self.format_results(search_results)}
+{self.format_results(shortlist)}
 
 Instructions:
-1. You MUST select exactly 2 result numbers from the search results.
+1. You MUST select between 1 and {count} result numbers from the search results. Select fewer if only a few results are clearly relevant.
 2. Choose the results that are most likely to contain comprehensive and relevant information to answer the user's question.
 3. Provide a brief reason for each selection.
 
 You MUST respond using EXACTLY this format and nothing else:
 
-Selected Results: [Two numbers corresponding to the selected results]
+Selected Results: [Numbers corresponding to the selected results]
 Reasoning: [Your reasoning for the selections]
 """
 
+        valid_numbers = {result['number'] for result in shortlist}
         max_retries = 3
         for retry in range(max_retries):
             with OutputRedirector() as output:
@@ -299,10 +600,10 @@ Reasoning: [Your reasoning for the selections]
             logger.info(f"LLM Output in select_relevant_pages:\n{llm_output}")
 
             parsed_response = self.parse_page_selection_response(response_text)
-            if parsed_response and self.validate_page_selection_response(parsed_response, len(search_results)):
-                selected_urls = [result['href'] for result in search_results if result['number'] in parsed_response['selected_results']]
+            if parsed_response and self.validate_page_selection_response(parsed_response, len(search_results), valid_numbers, count):
+                selected_urls = [result['href'] for result in shortlist if result['number'] in parsed_response['selected_results']]
 
-                allowed_urls = [url for url in selected_urls if can_fetch(url)]
+                allowed_urls = [url for url in selected_urls if can_fetch(url, self.knowledge_base)]
                 if allowed_urls:
                     return allowed_urls
                 else:
@@ -310,25 +611,26 @@ Reasoning: [Your reasoning for the selections]
             else:
                 print(f"{Fore.YELLOW}Warning: Invalid page selection. Retrying.{Style.RESET_ALL}")
 
-        print(f"{Fore.YELLOW}Warning: All attempts to select relevant pages failed. Falling back to top allowed results.{Style.RESET_ALL}")
-        allowed_urls = [result['href'] for result in search_results if can_fetch(result['href'])][:2]
+        print(f"{Fore.YELLOW}Warning: All attempts to select relevant pages failed. Falling back to top ranked allowed results.{Style.RESET_ALL}")
+        allowed_urls = [result['href'] for result in shortlist if can_fetch(result['href'], self.knowledge_base)][:count]
         return allowed_urls
 
     def parse_page_selection_response(self, response: str) -> Dict[str, Union[List[int], str]]:
-        lines = response.strip().split('\n')
-        parsed = {}
-        for line in lines:
-            if line.startswith('Selected Results:'):
-                parsed['selected_results'] = [int(num.strip()) for num in re.findall(r'\d+', line)]
-            elif line.startswith('Reasoning:'):
-                parsed['reasoning'] = line.split(':', 1)[1].strip()
-        return parsed if 'selected_results' in parsed and 'reasoning' in parsed else None
-
-    def validate_page_selection_response(self, parsed_response: Dict[str, Union[List[int], str]], num_results: int) -> bool:
-        if len(parsed_response['selected_results']) != 2:
+        record_response('page_selection', response)
+        parsed = parse_response(response)
+        if not parsed.selected_results or parsed.reasoning is None:
+            return None
+        return {'selected_results': parsed.selected_results, 'reasoning': parsed.reasoning}
+
+    def validate_page_selection_response(self, parsed_response: Dict[str, Union[List[int], str]], num_results: int,
+                                         valid_numbers: Optional[Set[int]] = None, max_selected: int = 2) -> bool:
+        selected = parsed_response['selected_results']
+        if not 1 <= len(selected) <= max_selected or len(set(selected)) != len(selected):
             return False
         if any(num < 1 or num > num_results for num in parsed_response['selected_results']):
             return False
+        if valid_numbers is not None and not set(parsed_response['selected_results']) <= valid_numbers:
+            return False
         return True
 
     def format_results(self, results: List[Dict]) -> str:
@@ -344,9 +646,11 @@ Reasoning: [Your reasoning for the selections]
         scraped_content = {}
         blocked_urls = []
         for url in urls:
-            robots_allowed = can_fetch(url)
+            self.cancel_token.raise_if_cancelled()
+            robots_allowed = can_fetch(url, self.knowledge_base)
             if robots_allowed:
-                content = get_web_content([url])
+                content = get_web_content([url], self.cancel_token, self.knowledge_base)
+                self.seen_urls.add(url)
                 if content:
                     scraped_content.update(content)
                     print(Fore.YELLOW + f"Successfully scraped: {url}" + Style.RESET_ALL)
@@ -405,12 +709,25 @@ Answer:
         logger.warning(f"Failed to generate a response after {max_retries} attempts. Returning error message.")
         return error_message
 
-    def format_scraped_content(self, scraped_content: Dict[str, str]) -> str:
-        formatted_content = []
-        for url, content in scraped_content.items():
-            content = re.sub(r'\s+', ' ', content)
-            formatted_content.append(f"Content from {url}:\n{content}\n")
-        return "\n".join(formatted_content)
+    def content_token_budget(self, max_output_tokens: int = 1024) -> int:
+        """Tokens available for scraped content in a prompt, leaving room for instructions and output"""
+        n_ctx = int(self.llm_config.get('n_ctx', 2048))
+        return max(256, n_ctx - max_output_tokens - 400)
+
+    def format_scraped_content(self, scraped_content: Dict[str, str], max_tokens: Optional[int] = None) -> str:
+        """
+        Format scraped pages for a prompt, fitted to the content budget.
+
+        Every page gets an equal share of the budget and earlier (better ranked) pages win when
+        space runs out. Content is already whitespace-normalized by the scraper.
+        """
+        if max_tokens is None:
+            max_tokens = self.content_token_budget()
+        per_source = max(max_tokens // max(1, len(scraped_content)), 200)
+        builder = PromptBuilder(max_tokens, per_source_tokens=per_source)
+        for i, (url, content) in enumerate(scraped_content.items()):
+            builder.add(content, url, priority=-i, normalize=False)
+        return builder.build()
 
     def synthesize_final_answer(self, user_query: str) -> str:
         prompt = f"""
@@ -1,20 +1,24 @@
 import sys
 import os
 import time
+import argparse
 import requests
-# from .Self_Improving_Search import EnhancedSelfImprovingSearch
 from .llm_config import get_llm_config
-# from .llm_response_parser import UltimateLLMResponseParser
 # from .strategic_analysis_parser import StrategicAnalysisParser
-from .research_manager import ResearchManager
+from .budget import ResearchBudget
+from .session_factory import create_shared_resources, build_research_manager
+from .response_corpus import enable_recording
 
 class ResearchSession:
     
-    def __init__(self, query):
+    def __init__(self, query, budget=None, resources=None):
 
         self.query = query
         self.llm_config=None
-        self.research_manager = ResearchManager()
+        self.budget = budget
+        # Connection pools and caches; long-lived processes pass theirs in to share them
+        self.resources = resources
+        self.research_manager = None
 
         print("Initialized new ResearchSession\n")
         
@@ -40,19 +44,67 @@ class ResearchSession:
             )
         
         print("API server connection successful!\n")
+
+        # The manager needs the connection settings, so it is created once a preset is loaded
+        if self.resources is None:
+            self.resources = create_shared_resources()
+        self.research_manager = build_research_manager(self.llm_config, self.resources, budget=self.budget)
         
     def start_research(self):
         if self.llm_config is None:
             raise ValueError("No API configuration loaded. Please load a preset first.")
         
         # Use ResearchManager to start research
-        self.research_manager.start_research(self.query, self.llm_config)
+        self.research_manager.start_research(self.query)
+
+    def run_unattended(self):
+        if self.llm_config is None:
+            raise ValueError("No API configuration loaded. Please load a preset first.")
+
+        summary = self.research_manager.run_budgeted(self.query)
+        print("\nFinal Research Summary:")
+        print(summary)
+
+    def resume_research(self, session):
+        if self.llm_config is None:
+            raise ValueError("No API configuration loaded. Please load a preset first.")
+
+        # The query and collected sources are restored from the session's store and checkpoint
+        self.research_manager.resume_research(session)
 
 def main():
+    arg_parser = argparse.ArgumentParser(description="LLM Researcher")
+    arg_parser.add_argument("--resume", metavar="SESSION",
+                            help="resume an interrupted session by number or file path (e.g. 3 or research_session_3.txt)")
+    arg_parser.add_argument("--record-corpus", metavar="FILE",
+                            help="append every LLM response the parsers see to a JSONL corpus file "
+                                 "(e.g. fixtures/parser_corpus/recorded.jsonl)")
+    budget_args = arg_parser.add_argument_group("research budget",
+                                                "limits after which research stops and is summarized")
+    budget_args.add_argument("--max-minutes", type=float, help="wall-clock time limit")
+    budget_args.add_argument("--max-llm-tokens", type=int, help="LLM prompt and completion token limit")
+    budget_args.add_argument("--max-pages", type=int, help="page fetch limit")
+    budget_args.add_argument("--max-document-tokens", type=int, help="research document size limit")
+    arg_parser.add_argument("--unattended", action="store_true",
+                            help="research without the command prompt until the budget runs out, then print the summary")
+    args = arg_parser.parse_args()
+
+    budget = ResearchBudget(
+        max_seconds=args.max_minutes * 60 if args.max_minutes else None,
+        max_llm_tokens=args.max_llm_tokens,
+        max_pages=args.max_pages,
+        max_document_tokens=args.max_document_tokens
+    )
+    if args.unattended and not budget.is_limited():
+        arg_parser.error("--unattended needs at least one budget limit")
+
     print("LLM Researcher\n")
 
-    research_query = input(f"research query: ").strip()
-    research_session = ResearchSession(research_query)
+    if args.resume:
+        research_session = ResearchSession(None, budget)
+    else:
+        research_query = input(f"research query: ").strip()
+        research_session = ResearchSession(research_query, budget)
     
     print("enter LLM preset name (entering a preset which doesn't exists prompts it's creation)")
     preset_name = input("preset name (default=default): ").strip() or "default"
@@ -60,7 +112,15 @@ def main():
     print()
 
     research_session.load_preset(preset_name)
-    research_session.start_research()
+    if args.record_corpus:
+        # Presets carry no model name of their own, so the preset identifies the model
+        enable_recording(args.record_corpus, research_session.llm_config.get('model', preset_name))
+    if args.resume:
+        research_session.resume_research(args.resume)
+    elif args.unattended:
+        research_session.run_unattended()
+    else:
+        research_session.start_research()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,231 @@
+"""
+Headless batch mode: run many research queries in parallel without a terminal.
+
+Each line of the input JSONL file is one session: {"query": "..."} plus optional "id", "preset"
+and budget fields ("max_minutes", "max_llm_tokens", "max_pages", "max_document_tokens") and
+"queries_per_focus". Fields a line leaves out fall back to the command line options. Sessions run
+in a pool of worker processes; each worker builds its search cache, search provider, scraper and
+LLM connection pool once and shares them with every session it runs.
+
+Every session writes <id>.txt (the research document), <id>.db (its store) and <id>.log (its
+console output) to the output directory; ids are reduced to letters, digits, '.', '-' and '_' so
+they cannot name paths outside it. The parent appends one JSON result record per session to
+results.jsonl. Sessions already recorded there as successful are skipped when a batch is rerun;
+the others start over, replacing the files their previous attempt left behind.
+
+Usage: python -m src.batch queries.jsonl --workers 4 --max-minutes 10 --output-dir batch_results
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import re
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from .session_factory import (
+    BUDGET_FIELDS, SharedResources, budget_from_options, build_research_manager,
+    create_shared_resources, load_preset, parse_provider_options
+)
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class BatchJob:
+    """One research session of a batch, with its options resolved"""
+    id: str
+    query: str
+    llm_config: Dict
+    budget: Dict
+    queries_per_focus: int
+    output_dir: str
+
+_resources: Optional[SharedResources] = None
+
+def _init_worker(provider_name: str, provider_options: Dict, pool_size: int):
+    """Process pool initializer: create this worker's shared resources once"""
+    global _resources
+    _resources = create_shared_resources(provider_name, provider_options, pool_size)
+
+def run_job(job: BatchJob) -> Dict:
+    """Run one session in a worker and return its result record"""
+    document_path = os.path.join(job.output_dir, f"{job.id}.txt")
+    record = {
+        'id': job.id,
+        'query': job.query,
+        'status': 'error',
+        'document': document_path,
+        'store': os.path.splitext(document_path)[0] + ".db",
+        'log': os.path.join(job.output_dir, f"{job.id}.log"),
+        'worker_pid': os.getpid(),
+        'started': time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    started = time.time()
+    manager = None
+    _remove_session_files(document_path)
+    # Sessions print progress as they go; each one gets its own log instead of the console
+    with open(record['log'], 'w', encoding='utf-8') as log, contextlib.redirect_stdout(log):
+        try:
+            manager = build_research_manager(job.llm_config, _resources, budget_from_options(job.budget),
+                                             queries_per_focus=job.queries_per_focus)
+            formatted = manager.run_budgeted(job.query, document_path=document_path)
+            # The plain summary; the document holds the formatted one
+            record['summary'] = manager.research_summary or formatted.strip()
+            record['status'] = 'ok'
+        except Exception as e:
+            record['error'] = f"{type(e).__name__}: {e}"
+            traceback.print_exc(file=log)
+
+    record['elapsed_seconds'] = round(time.time() - started, 1)
+    if manager is not None:
+        record.update({
+            'budget_exhausted': manager.budget_exhausted,
+            'sources': manager.store.source_count() if manager.store else 0,
+            'document_tokens': manager.store.total_tokens() if manager.store else 0,
+            'pages_fetched': manager.yield_tracker.fetches,
+            'llm_calls': manager.llm_wrapper.usage.calls,
+            'llm_tokens': manager.llm_wrapper.usage.total_tokens,
+            'focus_areas_completed': sorted(manager.completed_areas),
+            'generation_rounds': manager.cycle,
+        })
+    return record
+
+def _remove_session_files(document_path: str):
+    """Delete what an earlier, unsuccessful attempt at a session left, so it starts with a fresh store"""
+    base = os.path.splitext(document_path)[0]
+    for suffix in ('.txt', '.db', '.db-wal', '.db-shm', '.checkpoint.json', '.vectors.npy', '.vectors.jsonl'):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(base + suffix)
+
+def _safe_id(value) -> str:
+    """A session id usable as a file name inside the output directory"""
+    return re.sub(r'[^\w.-]', '_', str(value)).lstrip('.')
+
+def _job_id(line_number: int, query: str) -> str:
+    slug = re.sub(r'[^a-z0-9]+', '-', query.lower()).strip('-')[:40]
+    return f"{line_number:04d}-{slug}" if slug else f"{line_number:04d}"
+
+def load_jobs(path: str, defaults: Dict, output_dir: str) -> List[BatchJob]:
+    """Read the query file and resolve every line's options against the defaults"""
+    configs: Dict[str, Dict] = {}
+    jobs = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if not entry.get('query'):
+                raise ValueError(f"{path}:{line_number}: every line needs a 'query'")
+
+            preset = entry.get('preset', defaults['preset'])
+            if preset not in configs:
+                try:
+                    configs[preset] = load_preset(preset)
+                except ValueError as e:
+                    raise ValueError(f"{path}:{line_number}: {e}")
+
+            budget = {field: entry.get(field, defaults[field]) for field in BUDGET_FIELDS}
+            if not any(budget.values()):
+                raise ValueError(f"{path}:{line_number}: no budget limit; set one on the line or the command line")
+
+            jobs.append(BatchJob(
+                id=_safe_id(entry.get('id') or '') or _job_id(line_number, entry['query']),
+                query=entry['query'],
+                llm_config=configs[preset],
+                budget=budget,
+                queries_per_focus=entry.get('queries_per_focus', defaults['queries_per_focus']),
+                output_dir=output_dir,
+            ))
+
+    ids = [job.id for job in jobs]
+    duplicates = sorted({job_id for job_id in ids if ids.count(job_id) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate session ids in {path}: {', '.join(duplicates)}")
+    return jobs
+
+def completed_ids(results_path: str) -> set:
+    """Ids of sessions a previous run of the batch finished successfully"""
+    if not os.path.exists(results_path):
+        return set()
+    done = set()
+    with open(results_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # A line cut short by an interrupted run
+            if record.get('status') == 'ok':
+                done.add(record['id'])
+    return done
+
+def run_batch(jobs: List[BatchJob], output_dir: str, workers: int, provider_name: str = "duckduckgo",
+              provider_options: Optional[Dict] = None, pool_size: int = 16) -> List[Dict]:
+    """Run jobs across a process pool, appending each result record to results.jsonl as it finishes"""
+    os.makedirs(output_dir, exist_ok=True)
+    results_path = os.path.join(output_dir, "results.jsonl")
+    done = completed_ids(results_path)
+    pending = [job for job in jobs if job.id not in done]
+    if len(pending) < len(jobs):
+        print(f"Skipping {len(jobs) - len(pending)} sessions already completed in {results_path}")
+
+    records = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(provider_name, provider_options or {}, pool_size)) as executor:
+        futures = {executor.submit(run_job, job): job for job in pending}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                # The worker process itself failed, e.g. it was killed
+                record = {'id': job.id, 'query': job.query, 'status': 'error', 'error': f"{type(e).__name__}: {e}"}
+            records.append(record)
+            with open(results_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + "\n")
+            print(f"[{len(records)}/{len(pending)}] {record['status']:<5} {job.id} "
+                  f"({record.get('elapsed_seconds', 0)}s, {record.get('sources', 0)} sources)")
+    return records
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Run research queries from a JSONL file without a terminal")
+    arg_parser.add_argument("queries", help="JSONL file with one {\"query\": ...} object per line")
+    arg_parser.add_argument("--output-dir", default="batch_results")
+    arg_parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="worker processes")
+    arg_parser.add_argument("--preset", default="default", help="LLM preset for lines without one")
+    arg_parser.add_argument("--queries-per-focus", type=int, default=1)
+    arg_parser.add_argument("--search-provider", default="duckduckgo", help="duckduckgo, searxng or local")
+    arg_parser.add_argument("--provider-option", action="append", default=[], metavar="KEY=VALUE",
+                            help="search provider option, e.g. base_url=http://localhost:8888")
+    arg_parser.add_argument("--pool-size", type=int, default=16, help="HTTP connections per host in each worker")
+    budget_args = arg_parser.add_argument_group("default research budget", "used by lines that set no limit of their own")
+    # Always capping time keeps a session that finds nothing to fetch from running all night
+    budget_args.add_argument("--max-minutes", type=float, default=30.0)
+    budget_args.add_argument("--max-llm-tokens", type=int)
+    budget_args.add_argument("--max-pages", type=int)
+    budget_args.add_argument("--max-document-tokens", type=int)
+    args = arg_parser.parse_args()
+
+    try:
+        provider_options = parse_provider_options(args.provider_option)
+    except ValueError as e:
+        arg_parser.error(str(e))
+
+    defaults = {field: getattr(args, field) for field in BUDGET_FIELDS}
+    defaults.update(preset=args.preset, queries_per_focus=args.queries_per_focus)
+    try:
+        jobs = load_jobs(args.queries, defaults, args.output_dir)
+    except ValueError as e:
+        arg_parser.error(str(e))
+
+    print(f"Running {len(jobs)} research sessions on {args.workers} workers, output in {args.output_dir}")
+    records = run_batch(jobs, args.output_dir, args.workers, args.search_provider, provider_options, args.pool_size)
+    failed = sum(1 for record in records if record['status'] != 'ok')
+    print(f"\nFinished: {len(records) - failed} succeeded, {failed} failed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from .llm_wrapper import TokenUsage
+from .result_ranker import YieldTracker
+
+@dataclass
+class ResearchBudget:
+    """Limits for one research session. None leaves a resource unlimited."""
+    max_seconds: Optional[float] = None
+    max_llm_tokens: Optional[int] = None
+    max_pages: Optional[int] = None
+    max_document_tokens: Optional[int] = None
+    # Share of the time and LLM token limits held back for the final summary
+    summary_reserve: float = 0.1
+
+    def is_limited(self) -> bool:
+        return any(limit is not None for limit in (
+            self.max_seconds, self.max_llm_tokens, self.max_pages, self.max_document_tokens
+        ))
+
+class BudgetScheduler:
+    """
+    Tracks a session's spending against its ResearchBudget and divides what is left.
+
+    Every limit is converted into a number of page fetches it can still pay for, using the
+    observed cost per fetch (seconds, LLM tokens and new document tokens per page). The
+    smallest of those is the remaining page budget, which is split across the open focus
+    areas in proportion to their priority, weighted by the yield of their fetches so far.
+    """
+
+    RESOURCES = ('time', 'llm_tokens', 'pages', 'document_tokens')
+
+    def __init__(self, budget: ResearchBudget, usage: TokenUsage, yield_tracker: YieldTracker,
+                 document_tokens: Callable[[], int]):
+        self.budget = budget
+        self.usage = usage
+        self.yield_tracker = yield_tracker
+        self.document_tokens = document_tokens
+        self.started: Optional[float] = None
+        self._start_tokens = 0
+        self._start_fetches = 0
+
+    def start(self):
+        """Start the clock; tokens and fetches are counted from here"""
+        self.started = time.time()
+        self._start_tokens = self.usage.total_tokens
+        self._start_fetches = self.yield_tracker.fetches
+
+    def spent(self) -> Dict[str, float]:
+        return {
+            'time': time.time() - self.started if self.started else 0.0,
+            'llm_tokens': self.usage.total_tokens - self._start_tokens,
+            'pages': self.yield_tracker.fetches - self._start_fetches,
+            'document_tokens': self.document_tokens(),
+        }
+
+    def limits(self) -> Dict[str, Optional[float]]:
+        """Limits available to research, with the summary reserve taken off time and tokens"""
+        research_share = 1.0 - self.budget.summary_reserve
+        return {
+            'time': self.budget.max_seconds * research_share if self.budget.max_seconds else None,
+            'llm_tokens': self.budget.max_llm_tokens * research_share if self.budget.max_llm_tokens else None,
+            'pages': self.budget.max_pages,
+            'document_tokens': self.budget.max_document_tokens,
+        }
+
+    def exhausted(self) -> Optional[str]:
+        """
+        The first resource whose limit has been reached, or None.
+
+        A resource that can no longer pay for a single page counts as exhausted too, since
+        research could only keep generating focus areas without fetching anything.
+        """
+        spent = self.spent()
+        for resource, limit in self.limits().items():
+            if limit is not None and spent[resource] >= limit:
+                return resource
+        for resource, pages in self._page_estimates(spent).items():
+            if pages < 1:
+                return resource
+        return None
+
+    def _page_estimates(self, spent: Dict[str, float]) -> Dict[str, float]:
+        """Pages each limited resource can still pay for at the observed cost per fetch"""
+        pages = spent['pages']
+        cost_per_page = {
+            'time': spent['time'] / pages if pages else None,
+            'llm_tokens': spent['llm_tokens'] / pages if pages else None,
+            'pages': 1,
+            'document_tokens': self.yield_tracker.yield_per_fetch() or 1000,
+        }
+        return {
+            resource: (limit - spent[resource]) / cost_per_page[resource]
+            for resource, limit in self.limits().items()
+            # Time and tokens per page are unknown until the first fetch
+            if limit is not None and cost_per_page[resource]
+        }
+
+    def remaining_pages(self) -> Optional[int]:
+        """Page fetches the tightest limit can still pay for, or None if nothing is limited"""
+        estimates = self._page_estimates(self.spent())
+        if not estimates:
+            return None
+        return max(0, math.floor(min(estimates.values())))
+
+    def weight(self, focus: Any) -> float:
+        """Priority scaled by observed yield; areas without fetches count at their priority"""
+        fetches = self.yield_tracker.by_focus.get(focus.area, (0, 0))[0]
+        if not fetches:
+            return float(focus.priority)
+        factor = self.yield_tracker.yield_per_fetch(focus.area) / self.yield_tracker.target_tokens
+        return focus.priority * max(0.25, min(2.0, factor))
+
+    def page_allowance(self, focus: Any, open_areas: List[Any]) -> Optional[int]:
+        """This focus area's share of the remaining pages, or None if pages are unlimited"""
+        remaining = self.remaining_pages()
+        if remaining is None:
+            return None
+        areas = open_areas if any(a is focus for a in open_areas) else open_areas + [focus]
+        total = sum(self.weight(area) for area in areas) or 1.0
+        return min(remaining, math.ceil(remaining * self.weight(focus) / total))
+
+    def report(self) -> str:
+        spent = self.spent()
+        limits = (self.budget.max_seconds, self.budget.max_llm_tokens,
+                  self.budget.max_pages, self.budget.max_document_tokens)
+        parts = []
+        for resource, limit in zip(self.RESOURCES, limits):
+            name = resource.replace('_', ' ')
+            parts.append(f"{name} {spent[resource]:.0f}/{limit:.0f}" if limit else f"{name} {spent[resource]:.0f}")
+        return ", ".join(parts)
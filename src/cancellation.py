@@ -0,0 +1,129 @@
+import itertools
+import logging
+import socket
+import threading
+from contextlib import ExitStack, contextmanager, suppress
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+class Cancelled(BaseException):
+    """
+    Raised inside work whose cancellation token has been set.
+
+    Like asyncio.CancelledError it is not an Exception, so the retry loops around LLM calls and
+    fetches, which catch Exception, let it through instead of retrying cancelled work.
+    """
+
+class CancellationToken(threading.Event):
+    """
+    An Event that cancels in-flight work when it is set.
+
+    Long running calls check the token between steps (stream chunks, retries, backoff waits)
+    and raise Cancelled. Work blocked on I/O registers a callback with on_cancel that unblocks
+    it, e.g. by closing its HTTP response, so setting the token takes effect at once.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._callbacks = {}
+        self._callback_ids = itertools.count()
+        self._callback_lock = threading.Lock()
+
+    def set(self):
+        super().set()
+        with self._callback_lock:
+            callbacks = list(self._callbacks.values())
+            self._callbacks.clear()
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.debug(f"Cancellation callback failed: {str(e)}")
+
+    def raise_if_cancelled(self):
+        if self.is_set():
+            raise Cancelled()
+
+    def sleep(self, seconds: float):
+        """Sleep, waking and raising Cancelled as soon as the token is set"""
+        if seconds > 0 and self.wait(seconds):
+            raise Cancelled()
+        self.raise_if_cancelled()
+
+    @contextmanager
+    def on_cancel(self, callback: Callable[[], None]):
+        """Run callback if the token is set while the block runs, or at once if it already is"""
+        with self._callback_lock:
+            callback_id = next(self._callback_ids)
+            self._callbacks[callback_id] = callback
+        with self._callback_lock:
+            # Set before the callback was registered: set() will not run it, so run it here
+            run_now = self.is_set() and self._callbacks.pop(callback_id, None) is not None
+        if run_now:
+            callback()
+        try:
+            yield
+        finally:
+            with self._callback_lock:
+                self._callbacks.pop(callback_id, None)
+
+def abort_response(response):
+    """
+    Close a streamed requests response from another thread. Closing alone does not wake a read
+    blocked on the socket until data arrives, so the socket is shut down first.
+    """
+    fp = getattr(getattr(response, 'raw', None), '_fp', None)
+    sock = getattr(getattr(getattr(fp, 'fp', None), 'raw', None), '_sock', None)
+    if isinstance(sock, socket.socket):
+        with suppress(OSError):
+            sock.shutdown(socket.SHUT_RDWR)
+    response.close()
+
+class _Uncancellable(CancellationToken):
+    def set(self):
+        raise RuntimeError("UNCANCELLABLE cannot be cancelled")
+
+# Stands in for a missing token, so callers need no None checks
+UNCANCELLABLE = _Uncancellable()
+
+class PauseGate:
+    """Pause and resume for worker threads, which block in wait_while_paused without polling"""
+
+    def __init__(self):
+        self._paused = False
+        self._changed = threading.Condition()
+
+    @property
+    def paused(self) -> bool:
+        return self._paused
+
+    def pause(self):
+        with self._changed:
+            self._paused = True
+
+    def resume(self):
+        with self._changed:
+            self._paused = False
+            self._changed.notify_all()
+
+    def _wake(self):
+        with self._changed:
+            self._changed.notify_all()
+
+    def wait_while_paused(self, *tokens: threading.Event) -> bool:
+        """
+        Block while paused. Setting any of the tokens ends the wait.
+
+        Returns:
+            bool: False if a token was set, True once research may continue.
+        """
+        with ExitStack() as stack:
+            for token in tokens:
+                if isinstance(token, CancellationToken):
+                    stack.enter_context(token.on_cancel(self._wake))
+            with self._changed:
+                # Plain Events cannot wake the gate, so they are checked every second
+                while self._paused and not any(token.is_set() for token in tokens):
+                    self._changed.wait(timeout=1.0)
+        return not any(token.is_set() for token in tokens)
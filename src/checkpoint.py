@@ -0,0 +1,50 @@
+import json
+import os
+import re
+from typing import Dict, Optional, Tuple
+
+CHECKPOINT_VERSION = 1
+
+def checkpoint_path(document_path: str) -> str:
+    """Checkpoint file belonging to a session document"""
+    return os.path.splitext(document_path)[0] + ".checkpoint.json"
+
+def save_checkpoint(path: str, state: Dict):
+    """Atomically write a checkpoint so a crash mid-write never leaves a corrupt file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': CHECKPOINT_VERSION, **state}, f)
+    os.replace(tmp_path, path)
+
+def load_checkpoint(path: str) -> Optional[Dict]:
+    """Load a checkpoint, or None if it is missing, unreadable or from another version"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get('version') != CHECKPOINT_VERSION:
+        return None
+    return state
+
+def find_session(session: str) -> Tuple[str, str, str]:
+    """
+    Locate the files of an existing research session.
+
+    Args:
+        session (str): A session number ("3"), name ("research_session_3") or the path of any of
+            the session's files (.txt, .db or .checkpoint.json).
+
+    Returns:
+        tuple: (document path, store path, checkpoint path)
+    """
+    if re.fullmatch(r'\d+', session):
+        base = f"research_session_{session}"
+    else:
+        base = re.sub(r'(\.checkpoint\.json|\.txt|\.db)$', '', session)
+
+    document_path = f"{base}.txt"
+    store_path = f"{base}.db"
+    if not os.path.exists(store_path):
+        raise FileNotFoundError(f"No research session store found at {store_path}")
+    return document_path, store_path, checkpoint_path(document_path)
@@ -0,0 +1,348 @@
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from .retrieval import Chunk, chunk_text
+
+try:
+    import numpy as np
+except ImportError:  # Semantic retrieval is optional
+    np = None
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingClient:
+    """Batched client for the /embeddings endpoint of an OpenAI-compatible API server"""
+
+    def __init__(self, base_url: str, model: str, api_key: str = "", batch_size: int = 32, timeout: int = 60):
+        base_url = base_url.rstrip('/')
+        if not base_url.endswith('/v1'):
+            base_url += '/v1'
+        self.url = f"{base_url}/embeddings"
+        self.model = model
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.session = requests.Session()
+        if api_key:
+            self.session.headers.update({"Authorization": f"Bearer {api_key}"})
+
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            batch = texts[i:i + self.batch_size]
+            response = self.session.post(
+                self.url,
+                json={"model": self.model, "input": batch},
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            data = sorted(response.json()["data"], key=lambda item: item["index"])
+            vectors.extend(item["embedding"] for item in data)
+        return np.asarray(vectors, dtype=np.float32)
+
+class LocalEmbeddingModel:
+    """Small CPU embedding model loaded through sentence-transformers"""
+
+    def __init__(self, model: str = "all-MiniLM-L6-v2", batch_size: int = 32):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model, device="cpu")
+        self.batch_size = batch_size
+
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        return np.asarray(
+            self.model.encode(texts, batch_size=self.batch_size, show_progress_bar=False),
+            dtype=np.float32
+        )
+
+def get_embedder(llm_config: Dict):
+    """
+    Create the embedder configured in the LLM preset, or None if semantic retrieval is off.
+
+    Presets enable it with "embedding_model" and choose the backend with "embedding_backend":
+    "api" (default) uses the server at base_url, "local" runs a sentence-transformers model.
+    """
+    model = llm_config.get('embedding_model')
+    if not model or np is None:
+        return None
+    try:
+        if llm_config.get('embedding_backend', 'api') == 'local':
+            return LocalEmbeddingModel(model)
+        return EmbeddingClient(llm_config['base_url'], model, llm_config.get('api_key', ''))
+    except Exception as e:
+        logger.warning(f"Semantic retrieval disabled, could not create embedder: {str(e)}")
+        return None
+
+class VectorIndex:
+    """
+    Matrix of L2-normalized vectors with batched, vectorized cosine top-k search.
+
+    Vectors are kept in a growable NumPy matrix, optionally backed by a memory-mapped file so
+    large sessions do not have to stay resident. Past ivf_threshold vectors, searches go
+    through a coarse IVF quantizer (k-means lists, nprobe lists scanned per query), or through
+    an HNSW graph when use_hnsw is set and hnswlib is installed.
+    """
+
+    def __init__(self, path: Optional[str] = None, initial_capacity: int = 1024,
+                 ivf_threshold: int = 50000, nprobe: int = 8, use_hnsw: bool = False):
+        if np is None:
+            raise ImportError("numpy is required for VectorIndex")
+        self.path = path
+        self.initial_capacity = initial_capacity
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self.use_hnsw = use_hnsw
+        self.matrix = None
+        self.count = 0
+        self._centroids = None
+        self._lists: List[List[int]] = []
+        self._ivf_size = 0
+        self._hnsw = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.count
+
+    @staticmethod
+    def _normalize(vectors: "np.ndarray") -> "np.ndarray":
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _allocate(self, capacity: int, dim: int) -> "np.ndarray":
+        """Allocate a matrix with the given capacity, carrying over the existing rows"""
+        if not self.path:
+            matrix = np.zeros((capacity, dim), dtype=np.float32)
+            if self.matrix is not None:
+                matrix[:self.count] = self.matrix[:self.count]
+            return matrix
+        tmp_path = f"{self.path}.tmp"
+        matrix = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=(capacity, dim))
+        if self.matrix is not None:
+            matrix[:self.count] = self.matrix[:self.count]
+            matrix.flush()
+        os.replace(tmp_path, self.path)
+        return matrix
+
+    def load(self, count: int) -> int:
+        """
+        Memory-map the vectors already stored at path and keep the first count rows, e.g. to
+        resume a session. Returns the number of rows kept.
+        """
+        matrix = np.load(self.path, mmap_mode='r+')
+        with self._lock:
+            self.matrix = matrix
+            self.count = min(count, len(matrix))
+            self._centroids, self._lists, self._ivf_size, self._hnsw = None, [], 0, None
+            return self.count
+
+    def add(self, vectors: "np.ndarray") -> List[int]:
+        """Add vectors and return their row ids"""
+        vectors = self._normalize(vectors)
+        with self._lock:
+            if self.matrix is None:
+                self.matrix = self._allocate(max(self.initial_capacity, len(vectors)), vectors.shape[1])
+            elif self.count + len(vectors) > len(self.matrix):
+                capacity = max(len(self.matrix) * 2, self.count + len(vectors))
+                self.matrix = self._allocate(capacity, vectors.shape[1])
+
+            ids = list(range(self.count, self.count + len(vectors)))
+            self.matrix[self.count:self.count + len(vectors)] = vectors
+            self.count += len(vectors)
+
+            if self._centroids is not None:
+                assignments = np.argmax(vectors @ self._centroids.T, axis=1)
+                for row_id, list_id in zip(ids, assignments):
+                    self._lists[list_id].append(row_id)
+            if self._hnsw is not None:
+                self._hnsw.add_items(vectors, ids)
+            return ids
+
+    def search(self, queries: "np.ndarray", k: int = 5) -> List[List[Tuple[int, float]]]:
+        """Cosine top-k for every query row, best first"""
+        queries = self._normalize(queries)
+        with self._lock:
+            if not self.count:
+                return [[] for _ in queries]
+            k = min(k, self.count)
+            if self.count >= self.ivf_threshold:
+                self._ensure_approximate_index()
+                if self._hnsw is not None:
+                    labels, distances = self._hnsw.knn_query(queries, k=k)
+                    return [[(int(i), float(1 - d)) for i, d in zip(row_ids, row_distances)]
+                            for row_ids, row_distances in zip(labels, distances)]
+                if self._centroids is not None:
+                    return [self._search_ivf(query, k) for query in queries]
+            return self._search_exact(queries, None, k)
+
+    def _search_exact(self, queries: "np.ndarray", candidates: Optional["np.ndarray"], k: int) -> List[List[Tuple[int, float]]]:
+        if candidates is None:
+            # Scan all rows; slicing avoids copying the (possibly memory-mapped) matrix
+            candidates = np.arange(self.count)
+            scores = queries @ self.matrix[:self.count].T
+        else:
+            scores = queries @ self.matrix[candidates].T
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, top_row in zip(scores, top):
+            ordered = top_row[np.argsort(-row[top_row])]
+            results.append([(int(candidates[i]), float(row[i])) for i in ordered])
+        return results
+
+    def _search_ivf(self, query: "np.ndarray", k: int) -> List[Tuple[int, float]]:
+        nprobe = min(self.nprobe, len(self._centroids))
+        probe = np.argpartition(-(self._centroids @ query), nprobe - 1)[:nprobe]
+        candidates = np.fromiter((i for p in probe for i in self._lists[p]), dtype=np.int64)
+        if not len(candidates):
+            return []
+        return self._search_exact(query[None, :], candidates, k)[0]
+
+    def _ensure_approximate_index(self):
+        """Build (or rebuild once the index has doubled) the approximate index"""
+        if self.use_hnsw and self._hnsw is None:
+            try:
+                import hnswlib
+
+                self._hnsw = hnswlib.Index(space='cosine', dim=self.matrix.shape[1])
+                self._hnsw.init_index(max_elements=len(self.matrix) * 2, ef_construction=200, M=16)
+                self._hnsw.add_items(self.matrix[:self.count], np.arange(self.count))
+                return
+            except ImportError:
+                logger.warning("hnswlib is not installed, falling back to IVF index")
+                self.use_hnsw = False
+        if self._hnsw is not None:
+            if self._hnsw.get_max_elements() < self.count * 2:
+                self._hnsw.resize_index(self.count * 2)
+            return
+        if self._centroids is None or self.count > self._ivf_size * 2:
+            self._build_ivf()
+
+    def _build_ivf(self, iterations: int = 10):
+        vectors = self.matrix[:self.count]
+        n_lists = max(1, int(np.sqrt(self.count)))
+        rng = np.random.default_rng(0)
+        centroids = vectors[rng.choice(self.count, n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            for list_id in range(n_lists):
+                members = vectors[assignments == list_id]
+                if len(members):
+                    centroids[list_id] = members.mean(axis=0)
+            centroids = self._normalize(centroids)
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        self._lists = [np.flatnonzero(assignments == i).tolist() for i in range(n_lists)]
+        self._centroids = centroids
+        self._ivf_size = self.count
+
+class SemanticIndex:
+    """Embedding-based retrieval over research findings, paired chunk-for-chunk with a VectorIndex"""
+
+    def __init__(self, embedder, path: Optional[str] = None, chunk_words: int = 120, **index_options):
+        self.embedder = embedder
+        self.chunk_words = chunk_words
+        self.vectors = VectorIndex(**index_options)
+        self.chunks: List[Chunk] = []
+        # With a vectors file, each chunk is also appended here so the index can be reopened
+        self.chunks_path: Optional[str] = None
+        self._lock = threading.Lock()
+        if path:
+            self.set_path(path)
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        return self.embedder.embed(texts)
+
+    @staticmethod
+    def _chunks_path(path: Optional[str]) -> Optional[str]:
+        return f"{os.path.splitext(path)[0]}.jsonl" if path else None
+
+    def set_path(self, path: str, resume: bool = False) -> int:
+        """
+        Keep the vectors in a memory-mapped file at path; only possible while the index is empty.
+
+        With resume, the vectors and chunks an earlier run left at path are reopened instead of
+        being overwritten, so nothing has to be embedded again. Returns the number of chunks
+        restored.
+        """
+        with self._lock:
+            if len(self.vectors):
+                raise RuntimeError("Cannot move a semantic index that already holds vectors")
+            self.vectors.path = path
+            self.chunks_path = self._chunks_path(path)
+            chunks = self._read_chunks() if resume and os.path.exists(path) else []
+            count = self.vectors.load(len(chunks)) if chunks else 0
+            self.chunks = chunks[:count]
+            # Drop chunks without vectors (or a stale file), so appended chunks line up with rows
+            if count < len(chunks) or not count:
+                self._write_chunks(self.chunks, 'w')
+            return count
+
+    def _read_chunks(self) -> List[Chunk]:
+        chunks = []
+        if not os.path.exists(self.chunks_path):
+            return chunks
+        with open(self.chunks_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    chunk = Chunk(*json.loads(line))
+                except (ValueError, TypeError):
+                    break  # A line cut short by a crash; its vectors were never counted
+                if chunk.chunk_id != len(chunks):
+                    break
+                chunks.append(chunk)
+        return chunks
+
+    def _write_chunks(self, chunks: List[Chunk], mode: str):
+        if not self.chunks_path:
+            return
+        with open(self.chunks_path, mode, encoding='utf-8') as f:
+            f.writelines(json.dumps([c.chunk_id, c.text, c.source_url, c.focus_area]) + "\n" for c in chunks)
+
+    def add(self, text: str, source_url: str, focus_area: str = "") -> List[int]:
+        """Chunk, embed in one batch and index a finding"""
+        pieces = chunk_text(text, self.chunk_words)
+        if not pieces:
+            return []
+        vectors = self.embed(pieces)
+        with self._lock:
+            ids = self.vectors.add(vectors)
+            added = [Chunk(chunk_id, piece, source_url, focus_area) for chunk_id, piece in zip(ids, pieces)]
+            self.chunks.extend(added)
+            # Written after the vectors, so a reopened index never has chunks without rows
+            self._write_chunks(added, 'a')
+        return ids
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[Chunk, float]]:
+        results = self.vectors.search(self.embed([query]), k)[0]
+        # add() publishes rows before their chunks; holding the lock waits for the chunks
+        with self._lock:
+            return [(self.chunks[chunk_id], score) for chunk_id, score in results]
+
+    def max_similarity(self, texts: List[str]) -> List[float]:
+        """Highest cosine similarity of each text to anything already indexed"""
+        if not len(self.vectors):
+            return [0.0 for _ in texts]
+        results = self.vectors.search(self.embed(texts), 1)
+        return [row[0][1] if row else 0.0 for row in results]
+
+    def is_duplicate(self, text: str, threshold: float = 0.95) -> bool:
+        """True if most of the text's chunks are near-duplicates of indexed chunks"""
+        pieces = chunk_text(text, self.chunk_words)
+        if not pieces or not len(self.vectors):
+            return False
+        similarities = self.max_similarity(pieces)
+        return sum(s >= threshold for s in similarities) > len(pieces) / 2
+
+def create_semantic_index(llm_config: Dict, path: Optional[str] = None) -> Optional[SemanticIndex]:
+    """Create a SemanticIndex if an embedder is configured and NumPy is available"""
+    embedder = get_embedder(llm_config)
+    if embedder is None:
+        return None
+    return SemanticIndex(embedder, path=path, use_hnsw=bool(llm_config.get('embedding_hnsw', False)))
@@ -0,0 +1,103 @@
+import threading
+from typing import Any, Iterable, List, Optional
+
+from .result_ranker import YieldTracker
+
+class FocusScheduler:
+    """
+    Priority queue of research focus areas that persists across generation rounds.
+
+    An area's score combines the priority the LLM gave it, its novelty against the areas
+    already covered, and the yield of its fetches so far; areas that have not been fetched for
+    yet are scored optimistically. Yields change while research runs, so areas are scored when
+    one is taken rather than when they are queued. The queue only ever holds a handful of
+    areas, which makes a scan cheaper than keeping a heap up to date.
+
+    After a pass through the pipeline, an area that is still yielding new material goes back
+    into the queue at a discount instead of being dropped, so partly investigated areas get
+    further passes with new queries.
+    """
+
+    def __init__(self, yield_tracker: YieldTracker, low_water: int = 2, max_passes: int = 3,
+                 requeue_yield: float = 150, pass_discount: float = 0.6,
+                 priority_weight: float = 0.5, novelty_weight: float = 0.25, yield_weight: float = 0.25):
+        self.yield_tracker = yield_tracker
+        self.low_water = low_water
+        self.max_passes = max_passes
+        self.requeue_yield = requeue_yield
+        self.pass_discount = pass_discount
+        self.priority_weight = priority_weight
+        self.novelty_weight = novelty_weight
+        self.yield_weight = yield_weight
+        self._items: List[Any] = []
+        # Notified whenever the queue changes, so the research loop can wait instead of polling
+        self.changed = threading.Condition()
+
+    def __len__(self) -> int:
+        with self.changed:
+            return len(self._items)
+
+    def score(self, focus: Any) -> float:
+        fetches = self.yield_tracker.by_focus.get(focus.area, (0, 0))[0]
+        if fetches:
+            yield_score = min(1.0, self.yield_tracker.yield_per_fetch(focus.area) / self.yield_tracker.target_tokens)
+        else:
+            yield_score = 1.0
+        score = (self.priority_weight * focus.priority / 5
+                 + self.novelty_weight * getattr(focus, 'novelty', 1.0)
+                 + self.yield_weight * yield_score)
+        return score * self.pass_discount ** getattr(focus, 'passes', 0)
+
+    def push(self, focus: Any):
+        """Queue an area unless an area with the same name is already queued"""
+        with self.changed:
+            if all(item.area != focus.area for item in self._items):
+                self._items.append(focus)
+                self.changed.notify_all()
+
+    def extend(self, focus_areas: Iterable[Any]):
+        for focus in focus_areas:
+            self.push(focus)
+
+    def pop(self) -> Optional[Any]:
+        """Take the highest scoring area, or None if the queue is empty"""
+        with self.changed:
+            if not self._items:
+                return None
+            best = max(self._items, key=self.score)
+            self._items.remove(best)
+            return best
+
+    def requeue(self, focus: Any) -> bool:
+        """
+        Record a finished pass over an area and queue it again if it is worth another.
+
+        The pass's queries move to past_queries so the next pass formulates new ones.
+        """
+        focus.passes += 1
+        if focus.passes >= self.max_passes:
+            return False
+        if self.yield_tracker.yield_per_fetch(focus.area) < self.requeue_yield:
+            return False
+        focus.past_queries.extend(q for q in focus.search_queries if q not in focus.past_queries)
+        focus.search_queries = []
+        self.push(focus)
+        return True
+
+    def needs_areas(self) -> bool:
+        """Whether the queue is running low and new areas should be generated"""
+        return len(self) <= self.low_water
+
+    def snapshot(self) -> List[Any]:
+        """Queued areas, best first"""
+        with self.changed:
+            return sorted(self._items, key=self.score, reverse=True)
+
+    def wait(self, timeout: float):
+        """Block until the queue changes or the timeout passes"""
+        with self.changed:
+            self.changed.wait(timeout)
+
+    def notify(self):
+        with self.changed:
+            self.changed.notify_all()
@@ -1,7 +1,11 @@
-import re
-from typing import Dict, List, Union, Optional
+from typing import Dict, List, Union
 import json
-# from .strategic_analysis_parser import StrategicAnalysisParser, AnalysisResult, ResearchFocus
+import re
+from .strategic_analysis_parser import AnalysisResult, parse_analysis
+from .response_corpus import record_response
+from .response_parsing import (
+    parse_response, clean_query, normalize_time_range, JSON_OBJECT, RESULT_NUMBER
+)
 
 class UltimateLLMResponseParser:
     def __init__(self):
@@ -9,14 +13,11 @@ class UltimateLLMResponseParser:
             'refine': ['refine', 'need more info', 'insufficient', 'unclear', 'more research', 'additional search'],
             'answer': ['answer', 'sufficient', 'enough info', 'can respond', 'adequate', 'comprehensive']
         }
-        self.section_identifiers = [
-            ('decision', r'(?i)decision\s*:'),
-            ('reasoning', r'(?i)reasoning\s*:'),
-            ('selected_results', r'(?i)selected results\s*:'),
-            ('response', r'(?i)response\s*:')
-        ]
-        # Initialize strategic analysis parser
-        self.strategic_parser = StrategicAnalysisParser()
+        # Whole words only, so that 'insufficient' does not also count as 'sufficient'
+        self.decision_patterns = {
+            decision: re.compile(r'\b(?:%s)\b' % '|'.join(map(re.escape, keywords)))
+            for decision, keywords in self.decision_keywords.items()
+        }
 
     def parse_llm_response(self, response: str, mode: str = 'search') -> Dict[str, Union[str, List[int], AnalysisResult]]:
         """
@@ -32,6 +33,8 @@ class UltimateLLMResponseParser:
         if mode == 'research':
             return self._parse_research_response(response)
 
+        record_response('llm_response', response)
+
         # Original search mode parsing
         result = {
             'decision': None,
@@ -40,12 +43,12 @@ class UltimateLLMResponseParser:
             'response': None
         }
 
-        parsing_strategies = [
-            self._parse_structured_response,
-            self._parse_json_response,
-            self._parse_unstructured_response,
-            self._parse_implicit_response
-        ]
+        # The structured scan covers labelled and loosely formatted fields in one pass; JSON and
+        # keyword inference only run when it finds nothing
+        parsing_strategies = [self._parse_structured_response]
+        if '{' in response:
+            parsing_strategies.append(self._parse_json_response)
+        parsing_strategies.append(self._parse_implicit_response)
 
         for strategy in parsing_strategies:
             parsed_result = strategy(response)
@@ -65,7 +68,7 @@ class UltimateLLMResponseParser:
     def _parse_research_response(self, response: str) -> Dict[str, Union[str, AnalysisResult]]:
         """Handle research mode specific parsing"""
         try:
-            analysis_result = self.strategic_parser.parse_analysis(response)
+            analysis_result = parse_analysis(response)
             if analysis_result:
                 return {
                     'mode': 'research',
@@ -90,44 +93,26 @@ class UltimateLLMResponseParser:
     def parse_search_query(self, query_response: str) -> Dict[str, str]:
         """Parse search query formulation response"""
         try:
-            lines = query_response.strip().split('\n')
-            result = {
-                'query': '',
-                'time_range': 'none'
-            }
-
-            for line in lines:
-                if ':' in line:
-                    key, value = line.split(':', 1)
-                    key = key.strip().lower()
-                    value = value.strip()
-
-                    if 'query' in key:
-                        result['query'] = self._clean_query(value)
-                    elif 'time' in key or 'range' in key:
-                        result['time_range'] = self._validate_time_range(value)
-
-            return result
+            parsed = parse_response(query_response)
+            return {'query': parsed.query, 'time_range': parsed.time_range or 'none'}
         except Exception as e:
             print(f"Error parsing search query: {str(e)}")
             return {'query': '', 'time_range': 'none'}
 
     def _parse_structured_response(self, response: str) -> Dict[str, Union[str, List[int]]]:
-        result = {}
-        for key, pattern in self.section_identifiers:
-            match = re.search(f'{pattern}(.*?)(?={"|".join([p for k, p in self.section_identifiers if k != key])}|$)',
-                            response, re.IGNORECASE | re.DOTALL)
-            if match:
-                result[key] = match.group(1).strip()
-
-        if 'selected_results' in result:
-            result['selected_results'] = self._extract_numbers(result['selected_results'])
-
-        return result
+        parsed = parse_response(response)
+        return {
+            key: value for key, value in (
+                ('decision', parsed.decision),
+                ('reasoning', parsed.reasoning),
+                ('response', parsed.response),
+                ('selected_results', parsed.selected_results),
+            ) if value
+        }
 
     def _parse_json_response(self, response: str) -> Dict[str, Union[str, List[int]]]:
         try:
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
+            json_match = JSON_OBJECT.search(response)
             if json_match:
                 json_str = json_match.group(0)
                 parsed_json = json.loads(json_str)
@@ -137,26 +122,6 @@ class UltimateLLMResponseParser:
             pass
         return {}
 
-    def _parse_unstructured_response(self, response: str) -> Dict[str, Union[str, List[int]]]:
-        result = {}
-        lines = response.split('\n')
-        current_section = None
-
-        for line in lines:
-            section_match = re.match(r'(.+?)[:.-](.+)', line)
-            if section_match:
-                key = self._match_section_to_key(section_match.group(1))
-                if key:
-                    current_section = key
-                    result[key] = section_match.group(2).strip()
-            elif current_section:
-                result[current_section] += ' ' + line.strip()
-
-        if 'selected_results' in result:
-            result['selected_results'] = self._extract_numbers(result['selected_results'])
-
-        return result
-
     def _parse_implicit_response(self, response: str) -> Dict[str, Union[str, List[int]]]:
         result = {}
 
@@ -198,19 +163,13 @@ class UltimateLLMResponseParser:
 
         return result
 
-    def _match_section_to_key(self, section: str) -> Optional[str]:
-        for key, pattern in self.section_identifiers:
-            if re.search(pattern, section, re.IGNORECASE):
-                return key
-        return None
-
     def _extract_numbers(self, text: str) -> List[int]:
-        return [int(num) for num in re.findall(r'\b(?:10|[1-9])\b', text)]
+        return [int(num) for num in RESULT_NUMBER.findall(text)]
 
     def _infer_decision(self, text: str) -> str:
         text = text.lower()
-        refine_score = sum(text.count(keyword) for keyword in self.decision_keywords['refine'])
-        answer_score = sum(text.count(keyword) for keyword in self.decision_keywords['answer'])
+        refine_score = len(self.decision_patterns['refine'].findall(text))
+        answer_score = len(self.decision_patterns['answer'].findall(text))
         return 'refine' if refine_score > answer_score else 'answer'
 
     def _is_valid_result(self, result: Dict[str, Union[str, List[int]]]) -> bool:
@@ -218,12 +177,8 @@ class UltimateLLMResponseParser:
 
     def _clean_query(self, query: str) -> str:
         """Clean and validate search query"""
-        query = re.sub(r'["\'\[\]]', '', query)
-        query = re.sub(r'\s+', ' ', query)
-        return query.strip()[:100]
+        return clean_query(query)
 
     def _validate_time_range(self, time_range: str) -> str:
         """Validate time range value"""
-        valid_ranges = ['d', 'w', 'm', 'y', 'none']
-        time_range = time_range.lower()
-        return time_range if time_range in valid_ranges else 'none'
+        return normalize_time_range(time_range) or 'none'
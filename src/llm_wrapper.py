@@ -1,18 +1,77 @@
+import contextlib
+import threading
+from typing import Optional
+
 import openai
 
+from .cancellation import Cancelled, CancellationToken, abort_response
+from .prompt_builder import estimate_tokens
+
+# Preset keys read by other parts of the program (see embeddings.get_embedder); they are not
+# completion parameters, so they are never sent to the server
+NON_COMPLETION_KEYS = frozenset({'embedding_model', 'embedding_backend', 'embedding_hnsw'})
+
+# The last HTTP response received by each thread, recorded by track_response
+_latest_response = threading.local()
+
+def track_response(response, *args, **kwargs):
+    """
+    requests response hook for the session the openai client uses. The openai stream hides its
+    HTTP response, which a cancelled stream needs in order to be aborted from another thread.
+    """
+    _latest_response.response = response
+
+class TokenUsage:
+    """
+    Thread-safe count of the tokens sent to and generated by the LLM.
+
+    Counts come from the API's usage report when it has one; streamed responses carry none, so
+    their tokens are estimated.
+    """
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def record(self, prompt_tokens: int, completion_tokens: int):
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.calls += 1
+
 class LLMWrapper:
-    def __init__(self, llm_config):
+    def __init__(self, llm_config, usage=None, cancel_token: Optional[CancellationToken] = None):
         """
         Initializes a new instance of the LLMWrapper class.
 
         This class is used to interact with a large language model (LLM) API.
         It uses the configuration provided by the llm_config module to make requests
-        to the LLM API and retrieve responses.
+        to the LLM API and retrieve responses. Token usage is added to `usage`, which
+        wrappers can share to account for a whole session. Setting `cancel_token` aborts
+        calls in progress with Cancelled and closes their connection.
         """
         
         self.llm_config = llm_config
+        self.usage = usage if usage is not None else TokenUsage()
+        self.cancel_token = cancel_token
+        # Cleared when the server turns out not to stream, so cancellable calls stop trying
+        self.can_stream = True
     
-    def generate(self, prompt, parameter_override=None):
+    def _parameters(self, parameter_override=None, overrides=None):
+        # Create a new dictionary with all the parameters from get_llm_config, and then update it with any
+        # overrides specified in parameter_override or as keyword arguments
+        parameters = {key: value for key, value in self.llm_config.items() if key not in NON_COMPLETION_KEYS}
+        parameters.update(parameter_override or {})
+        parameters.update(overrides or {})
+        return parameters
+
+    def generate(self, prompt, parameter_override=None, **overrides):
         """
         Generates a response from the LLM based on the given prompt.
 
@@ -20,24 +79,129 @@ class LLMWrapper:
             prompt (str): The input prompt for which to generate a response.
             parameter_override (dict): A dictionary of key-value pairs that override
                 the default configuration provided by llm_config. Defaults to None.
+            **overrides: Individual parameter overrides, e.g. max_tokens=200.
 
         Returns:
             str: The generated response from the LLM.
         """
+        if self.cancel_token is not None:
+            return self._generate_cancellable(prompt, parameter_override, overrides)
+        return self._complete(prompt, self._parameters(parameter_override, overrides))
 
-        if parameter_override is None:
-            parameter_override = {}
-
-        # Create a new dictionary with all the parameters from get_llm_config, and then update it with any
-        # overrides specified in parameter_override
-        parameters = self.llm_config.copy()
-        parameters.update(parameter_override)
-
+    def _complete(self, prompt, parameters):
         response = openai.Completion.create(
             prompt=prompt,
             **parameters
         )
-        return response.choices[0].text.strip()
+        text = response.choices[0].text
+        reported = getattr(response, 'usage', None)
+        if reported is not None:
+            self.usage.record(reported.prompt_tokens, reported.completion_tokens)
+        else:
+            self.usage.record(estimate_tokens(prompt), estimate_tokens(text))
+        return text.strip()
+
+    def _generate_cancellable(self, prompt, parameter_override, overrides):
+        """Generate through a stream, so cancelling can drop the connection mid-generation"""
+        self.cancel_token.raise_if_cancelled()
+        if not self.can_stream:
+            # Such calls can only be cancelled between calls
+            return self._complete(prompt, self._parameters(parameter_override, overrides))
+        fragments = []
+        try:
+            stream = self.generate_stream(prompt, parameter_override, **overrides)
+            try:
+                fragments.extend(stream)
+            finally:
+                stream.close()
+        except Exception:
+            if fragments:
+                raise
+            # Server without streaming support; a plain call fails too if the server is down
+            self.can_stream = False
+            return self._complete(prompt, self._parameters(parameter_override, overrides))
+        return "".join(fragments).strip()
+
+    def generate_stream(self, prompt, parameter_override=None, **overrides):
+        """
+        Generates a response as a stream of text fragments.
+
+        Closing the returned generator before it is exhausted closes the connection, which
+        stops generation on the server. So does setting the cancel token, which raises
+        Cancelled. When the openai session has the track_response hook, the connection is
+        aborted at once, even while the server is still reading the prompt; otherwise the
+        token is noticed at the next fragment.
+        """
+        parameters = self._parameters(parameter_override, overrides)
+        parameters['stream'] = True
+
+        if self.cancel_token is not None:
+            self.cancel_token.raise_if_cancelled()
+        _latest_response.response = None
+        stream = openai.Completion.create(prompt=prompt, **parameters)
+        response = _latest_response.response
+        abort = contextlib.nullcontext()
+        if self.cancel_token is not None and response is not None:
+            abort = self.cancel_token.on_cancel(lambda: abort_response(response))
+        generated = []
+        try:
+            with abort:
+                for chunk in stream:
+                    if self.cancel_token is not None and self.cancel_token.is_set():
+                        raise Cancelled()
+                    text = chunk.choices[0].text
+                    if text:
+                        generated.append(text)
+                        yield text
+        except Exception:
+            # An aborted connection fails the read in ways that depend on timing
+            if self.cancel_token is not None:
+                self.cancel_token.raise_if_cancelled()
+            raise
+        finally:
+            self.usage.record(estimate_tokens(prompt), estimate_tokens("".join(generated)))
+            close = getattr(stream, 'close', None)
+            if close:
+                close()
+
+    def generate_incremental(self, prompt, parser, parameter_override=None, **overrides):
+        """
+        Streams a response into an incremental parser and stops generating once it is complete.
+
+        Args:
+            prompt (str): The input prompt.
+            parser: An object with feed(), is_complete() and finish(), e.g. a StreamingParser.
+
+        Returns:
+            str: The text generated before the parser was complete.
+        """
+        if not self.can_stream:
+            return self._generate_and_parse(prompt, parser, parameter_override, overrides)
+        fragments = []
+        try:
+            stream = self.generate_stream(prompt, parameter_override, **overrides)
+            try:
+                for fragment in stream:
+                    fragments.append(fragment)
+                    parser.feed(fragment)
+                    if parser.is_complete():
+                        break
+            finally:
+                stream.close()
+        except Exception:
+            if fragments:
+                raise
+            # Server without streaming support: parse complete responses from now on
+            self.can_stream = False
+            return self._generate_and_parse(prompt, parser, parameter_override, overrides)
+        parser.finish()
+        return "".join(fragments).strip()
+
+    def _generate_and_parse(self, prompt, parser, parameter_override, overrides):
+        response = self.generate(prompt, parameter_override, **overrides)
+        parser.feed(response)
+        parser.finish()
+        return response
 
 class ChatLLMWrapper(LLMWrapper):
     def __init__(self, config, system_message):
@@ -48,13 +212,7 @@ class ChatLLMWrapper(LLMWrapper):
         self.messages = [{"role": "system", "content": system_message}]
 
     def generate(self, user_input, parameter_override=None):
-        if parameter_override is None:
-            parameter_override = {}
-        
-        # Create a new dictionary with all the parameters from get_llm_config, and then update it with any
-        # overrides specified in parameter_override
-        parameters = self.llm_config.copy()
-        parameters.update(parameter_override)
+        parameters = self._parameters(parameter_override)
         
         self.messages.append({"role": "user", "content": user_input})
 
@@ -0,0 +1,114 @@
+import logging
+from typing import List, Optional, Set, Tuple
+
+from .retrieval import tokenize
+
+logger = logging.getLogger(__name__)
+
+def _normalize_terms(text: str) -> Set[str]:
+    """Token set with a crude plural stem so 'rates' and 'rate' compare equal"""
+    return {t[:-1] if len(t) > 3 and t.endswith('s') else t for t in tokenize(text)}
+
+def lexical_similarity(a: str, b: str) -> float:
+    """Overlap of the content words of two focus areas, relative to the shorter one"""
+    terms_a, terms_b = _normalize_terms(a), _normalize_terms(b)
+    if not terms_a or not terms_b:
+        return 0.0
+    return len(terms_a & terms_b) / min(len(terms_a), len(terms_b))
+
+class FocusHistory:
+    """
+    Remembers the focus areas already investigated and scores new ones against them.
+
+    Similarity is lexical by default. When an embedder is available (the SemanticIndex used for
+    findings), focus areas are also embedded and the higher of the two scores is used.
+    """
+
+    def __init__(self, semantic_index=None, drop_threshold: float = 0.8,
+                 reprioritize_threshold: float = 0.5, embedding_drop_threshold: float = 0.9):
+        self.semantic_index = semantic_index
+        self.drop_threshold = drop_threshold
+        self.reprioritize_threshold = reprioritize_threshold
+        self.embedding_drop_threshold = embedding_drop_threshold
+        self.areas: List[str] = []
+        self._vectors = None
+        # Areas are embedded when first compared against, so restoring a session embeds nothing
+        self._embedded = 0
+
+        if semantic_index is not None:
+            try:
+                from .embeddings import VectorIndex
+                self._vectors = VectorIndex(initial_capacity=64)
+            except ImportError:
+                self._vectors = None
+
+    def __len__(self) -> int:
+        return len(self.areas)
+
+    def add(self, areas: List[str]):
+        """Record focus areas as investigated"""
+        self.areas.extend(area for area in dict.fromkeys(areas) if area not in self.areas)
+
+    def _embed_new_areas(self):
+        if self._vectors is None or self._embedded == len(self.areas):
+            return
+        try:
+            new_areas = self.areas[self._embedded:]
+            self._vectors.add(self.semantic_index.embed(new_areas))
+            self._embedded += len(new_areas)
+        except Exception as e:
+            logger.warning(f"Could not embed focus areas, using lexical novelty only: {str(e)}")
+            self._vectors = None
+
+    def similarity(self, area: str) -> Tuple[float, Optional[str]]:
+        """Highest similarity of an area to any covered area, and the area it matched"""
+        best_score, best_match = 0.0, None
+        for covered in self.areas:
+            score = lexical_similarity(area, covered)
+            if score > best_score:
+                best_score, best_match = score, covered
+
+        self._embed_new_areas()
+        if self._vectors is not None and len(self._vectors):
+            try:
+                row_id, cosine = self._vectors.search(self.semantic_index.embed([area]), 1)[0][0]
+                # Rescale so the embedding drop threshold lines up with the lexical one
+                score = cosine * self.drop_threshold / self.embedding_drop_threshold
+                if score > best_score:
+                    best_score, best_match = score, self.areas[row_id]
+            except Exception as e:
+                logger.warning(f"Embedding novelty check failed: {str(e)}")
+        return best_score, best_match
+
+    def filter(self, focus_areas: list) -> list:
+        """
+        Drop focus areas that repeat covered ground and demote ones that partly overlap.
+
+        Areas are also compared with each other so one batch cannot contain near-duplicates.
+        Each kept area's novelty (1 - its similarity to covered ground) is stored on it.
+        Returns the remaining areas sorted by priority, highest first.
+        """
+        kept = []
+        batch: List[str] = []
+        for focus in focus_areas:
+            score, match = self.similarity(focus.area)
+            within_batch = max((lexical_similarity(focus.area, other) for other in batch), default=0.0)
+
+            if score >= self.drop_threshold or within_batch >= self.drop_threshold:
+                print(f"Skipping already covered area: {focus.area}")
+                logger.info(f"Dropped focus area '{focus.area}' (similar to '{match}', {score:.2f})")
+                continue
+            if score >= self.reprioritize_threshold:
+                focus.priority = max(1, focus.priority - 2)
+                logger.info(f"Lowered priority of '{focus.area}' (similar to '{match}', {score:.2f})")
+            focus.novelty = round(1.0 - min(1.0, score), 3)
+
+            kept.append(focus)
+            batch.append(focus.area)
+
+        kept.sort(key=lambda x: x.priority, reverse=True)
+        return kept
+
+    def covered_areas(self, limit: int = 20) -> List[str]:
+        """Most recently covered areas, for feeding back into focus area generation"""
+        return self.areas[-limit:]
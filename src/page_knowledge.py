@@ -0,0 +1,245 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+logger = logging.getLogger(__name__)
+
+DAY = 24 * 60 * 60
+
+# How long a stored page stays fresh, by domain suffix; the longest matching suffix wins.
+# News and discussion pages change daily, reference and archival pages rarely.
+DEFAULT_PAGE_FRESHNESS = {
+    'wikipedia.org': 30 * DAY,
+    'arxiv.org': 365 * DAY,
+    'doi.org': 365 * DAY,
+    '.gov': 30 * DAY,
+    '.edu': 30 * DAY,
+    'nature.com': 90 * DAY,
+    'sciencedirect.com': 90 * DAY,
+    'reuters.com': DAY,
+    'apnews.com': DAY,
+    'bbc.co.uk': DAY,
+    'bbc.com': DAY,
+    'news.ycombinator.com': 60 * 60,
+    'reddit.com': DAY,
+    'twitter.com': 60 * 60,
+    'x.com': 60 * 60,
+}
+DEFAULT_MAX_AGE = 7 * DAY
+FRESHNESS_CONFIG = "config/page_freshness.json"
+
+# Query parameters that only track where a visitor came from
+TRACKING_PARAMS = re.compile(r'^(utm_\w+|fbclid|gclid|mc_cid|mc_eid|ref_src)$')
+
+def canonical_url(url: str) -> str:
+    """
+    Canonical form of a URL, so copies of a page share one entry: http and https, a leading
+    www., a trailing slash, the fragment and tracking parameters make no difference.
+    """
+    parsed = urlparse(url.strip())
+    netloc = parsed.netloc.lower()
+    if netloc.startswith('www.'):
+        netloc = netloc[4:]
+    scheme = 'https' if parsed.scheme.lower() in ('http', 'https') else parsed.scheme.lower()
+    path = parsed.path.rstrip('/') or '/'
+    query = urlencode([(k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+                       if not TRACKING_PARAMS.match(k)])
+    return urlunparse((scheme, netloc, path, '', query, ''))
+
+def load_freshness_policy(path: str = FRESHNESS_CONFIG) -> Dict[str, float]:
+    """
+    Per-domain freshness from a JSON file of {"default_hours": 168, "domains": {"example.com": 24}},
+    on top of the defaults. A domain set to 0 is never served from the knowledge base.
+    """
+    policy = dict(DEFAULT_PAGE_FRESHNESS)
+    policy[''] = DEFAULT_MAX_AGE
+    if not os.path.exists(path):
+        return policy
+    try:
+        with open(path, 'r') as f:
+            config = json.load(f)
+        if 'default_hours' in config:
+            policy[''] = float(config['default_hours']) * 60 * 60
+        for domain, hours in config.get('domains', {}).items():
+            policy[domain.lower()] = float(hours) * 60 * 60
+    except (OSError, ValueError, AttributeError) as e:
+        logger.warning(f"Ignoring page freshness config {path}: {e}")
+    return policy
+
+class PageKnowledgeBase:
+    """
+    Extracted pages shared by every research session run from the same directory.
+
+    Each page is stored under its canonical URL with its extracted title, text and links, the
+    time it was fetched and a hash of its content. The scraper consults it before fetching and
+    stores every page it extracts; a full-text index lets searches bring up pages from earlier
+    sessions that match a new query. A page is served only while it is fresh for its domain.
+    """
+
+    def __init__(self, path: Optional[str] = "cache/page_knowledge.db",
+                 freshness: Optional[Dict[str, float]] = None):
+        # '' holds the maximum age for domains without a policy of their own
+        self.freshness = freshness if freshness is not None else {**DEFAULT_PAGE_FRESHNESS, '': DEFAULT_MAX_AGE}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self.conn = None
+        if path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS pages (
+                    id INTEGER PRIMARY KEY,
+                    url TEXT NOT NULL UNIQUE,
+                    source_url TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    links TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    changed_at REAL NOT NULL
+                )
+            """)
+            # Rows share ids with pages
+            self.conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(title, content)")
+            self.conn.commit()
+
+    def max_age_for(self, url: str) -> float:
+        domain = urlparse(url).netloc.lower().split(':')[0]
+        best, max_age = -1, self.freshness.get('', DEFAULT_MAX_AGE)
+        for suffix, age in self.freshness.items():
+            if not suffix:
+                continue
+            if domain == suffix.lstrip('.') or domain.endswith(suffix if suffix.startswith('.') else '.' + suffix):
+                if len(suffix) > best:
+                    best, max_age = len(suffix), age
+        return max_age
+
+    @staticmethod
+    def _storable(url: str) -> bool:
+        # Local corpus files are read from disk anyway
+        return urlparse(url).scheme in ('http', 'https')
+
+    def _fresh(self, url: str, fetched_at: float, max_age: Optional[float] = None) -> bool:
+        limit = self.max_age_for(url)
+        if max_age is not None:
+            limit = min(limit, max_age)
+        return time.time() - fetched_at < limit
+
+    def get(self, url: str) -> Optional[Dict]:
+        """The stored page in the scraper's format, or None if it is missing or stale"""
+        if self.conn is None or not self._storable(url):
+            return None
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT title, content, links, fetched_at FROM pages WHERE url = ?", (canonical_url(url),)
+            ).fetchone()
+            if row and self._fresh(url, row[3]):
+                self.hits += 1
+                return {"url": url, "title": row[0], "content": row[1], "links": json.loads(row[2])}
+            self.misses += 1
+            return None
+
+    def contains(self, url: str) -> bool:
+        """Whether a fresh copy of the page is stored; not counted as a lookup"""
+        if self.conn is None or not self._storable(url):
+            return False
+        with self._lock:
+            row = self.conn.execute("SELECT fetched_at FROM pages WHERE url = ?", (canonical_url(url),)).fetchone()
+        return bool(row) and self._fresh(url, row[0])
+
+    def put(self, url: str, page: Dict):
+        """Store an extracted page; an unchanged page only has its fetch time renewed"""
+        content = page.get('content') or ''
+        if self.conn is None or not self._storable(url) or not content or self.max_age_for(url) <= 0:
+            return
+        key = canonical_url(url)
+        title = page.get('title') or ''
+        content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        now = time.time()
+        with self._lock, self.conn:
+            row = self.conn.execute("SELECT id, content_hash FROM pages WHERE url = ?", (key,)).fetchone()
+            if row and row[1] == content_hash:
+                self.conn.execute("UPDATE pages SET fetched_at = ? WHERE id = ?", (now, row[0]))
+                return
+            if row:
+                self.conn.execute("DELETE FROM pages_fts WHERE rowid = ?", (row[0],))
+                self.conn.execute(
+                    "UPDATE pages SET source_url = ?, title = ?, content = ?, links = ?, content_hash = ?, "
+                    "fetched_at = ?, changed_at = ? WHERE id = ?",
+                    (url, title, content, json.dumps(page.get('links') or []), content_hash, now, now, row[0])
+                )
+                page_id = row[0]
+            else:
+                page_id = self.conn.execute(
+                    "INSERT INTO pages (url, source_url, title, content, links, content_hash, fetched_at, changed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, url, title, content, json.dumps(page.get('links') or []), content_hash, now, now)
+                ).lastrowid
+            self.conn.execute("INSERT INTO pages_fts (rowid, title, content) VALUES (?, ?, ?)",
+                              (page_id, title, content))
+
+    def search(self, query: str, max_results: int = 5, max_age: Optional[float] = None) -> List[Dict]:
+        """
+        Fresh stored pages matching a query, best first, as search results ('title', 'href',
+        'body'). max_age further limits how long ago they may have been fetched.
+        """
+        # Quote every term so user input can never be interpreted as FTS5 query syntax
+        terms = re.findall(r'\w+', query)
+        if self.conn is None or not terms:
+            return []
+        match = " OR ".join(f'"{term}"' for term in terms)
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT p.source_url, p.title, snippet(pages_fts, 1, '', '', '...', 40), p.fetched_at "
+                "FROM pages_fts JOIN pages p ON p.id = pages_fts.rowid "
+                "WHERE pages_fts MATCH ? ORDER BY bm25(pages_fts) LIMIT ?",
+                (match, max_results * 3)
+            ).fetchall()
+        results = [
+            {'title': title, 'href': url, 'body': snippet, 'source': 'knowledge_base'}
+            for url, title, snippet, fetched_at in rows
+            if self._fresh(url, fetched_at, max_age)
+        ]
+        return results[:max_results]
+
+    def page_count(self) -> int:
+        if self.conn is None:
+            return 0
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def purge_stale(self) -> int:
+        """Delete pages older than the longest freshness policy. Returns the number deleted."""
+        if self.conn is None:
+            return 0
+        cutoff = time.time() - max(self.freshness.values())
+        with self._lock, self.conn:
+            ids = [row[0] for row in self.conn.execute("SELECT id FROM pages WHERE fetched_at < ?", (cutoff,))]
+            for page_id in ids:
+                self.conn.execute("DELETE FROM pages_fts WHERE rowid = ?", (page_id,))
+                self.conn.execute("DELETE FROM pages WHERE id = ?", (page_id,))
+        return len(ids)
+
+    def report(self) -> str:
+        return f"{self.page_count()} pages, {self.hits} hits, {self.misses} misses"
+
+_shared_knowledge_base: Optional[PageKnowledgeBase] = None
+_shared_lock = threading.Lock()
+
+def get_shared_knowledge_base() -> PageKnowledgeBase:
+    """The knowledge base shared by everything in this process, with the configured freshness policy"""
+    global _shared_knowledge_base
+    with _shared_lock:
+        if _shared_knowledge_base is None:
+            _shared_knowledge_base = PageKnowledgeBase(freshness=load_freshness_policy())
+        return _shared_knowledge_base
@@ -0,0 +1,249 @@
+"""
+Benchmark and fuzz harness for the LLM response parsers.
+
+Runs every response in a parser corpus (see response_corpus) through the parser the researcher
+uses for it and reports, per parser kind:
+
+  success        responses parsed into usable output that matches the record's expectations
+  strict         responses an exact-format parser, accepting only the layout the prompt asks
+                 for, would have handled
+  retries avoided  responses the current parser handles but the exact-format parser would
+                 have rejected; each one is an LLM call the caller would otherwise retry
+  us/parse       mean parse time
+  fuzz           success on mutated copies of the corpus (markdown bold labels, lowercase
+                 labels, CRLF, blank lines, preambles and closing chatter, bullets, "1)"
+                 numbering), and the number of mutated responses that raised
+
+Usage: python -m src.parser_bench [corpus] [--fuzz N] [--seed S] [--by-model] [--show-failures]
+"""
+import argparse
+import contextlib
+import io
+import random
+import re
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .response_corpus import DEFAULT_CORPUS_DIR, load_corpus
+from .response_parsing import parse_response, TIME_RANGES
+from .strategic_analysis_parser import parse_analysis
+from .llm_response_parser import UltimateLLMResponseParser
+from .Self_Improving_Search import EnhancedSelfImprovingSearch
+
+# A parser returns (usable, fields) where fields are compared against the record's expectations
+ParserFn = Callable[[str], Tuple[bool, Dict]]
+
+def _build_parsers() -> Dict[str, ParserFn]:
+    # The search parsing methods use no instance state, so no LLM or search provider is created
+    search = EnhancedSelfImprovingSearch.__new__(EnhancedSelfImprovingSearch)
+    llm_parser = UltimateLLMResponseParser()
+
+    def query(text):
+        q, time_range = search.parse_query_response(text)
+        return bool(q), {'query': q, 'time_range': time_range}
+
+    def page_selection(text):
+        parsed = search.parse_page_selection_response(text)
+        if parsed is None:
+            return False, {}
+        return True, {'selected_results': parsed['selected_results']}
+
+    def evaluation(text):
+        _, decision = search.parse_evaluation_response(text)
+        return decision in ('answer', 'refine'), {'decision': decision}
+
+    def llm_response(text):
+        result = llm_parser.parse_llm_response(text)
+        return result['decision'] in ('answer', 'refine'), {
+            'decision': result['decision'], 'selected_results': result['selected_results']
+        }
+
+    def analysis(text):
+        result = parse_analysis(text)
+        areas = result.focus_areas if result else []
+        return bool(areas), {'areas': len(areas)}
+
+    def focus_areas(text):
+        # ResearchManager reads generated focus areas with parse_response directly
+        areas = parse_response(text).areas
+        return bool(areas), {'areas': len(areas)}
+
+    return {
+        'query': query,
+        'page_selection': page_selection,
+        'evaluation': evaluation,
+        'llm_response': llm_response,
+        'analysis': analysis,
+        'focus_areas': focus_areas,
+    }
+
+# Exact-format baselines: only the literal layout each prompt asks for, case and spacing included
+_STRICT_AREA = re.compile(r'^\d+\. \S.*\nPriority: [1-5]$', re.MULTILINE)
+_STRICT_PATTERNS = {
+    'query': [re.compile(r'^Search query: \S.*$', re.MULTILINE),
+              re.compile(r'^Time range: (?:%s)$' % '|'.join(TIME_RANGES), re.MULTILINE)],
+    'page_selection': [re.compile(r'^Selected Results: \d+(?:, ?\d+)*$', re.MULTILINE),
+                       re.compile(r'^Reasoning: \S', re.MULTILINE)],
+    'evaluation': [re.compile(r'^Evaluation: \S', re.MULTILINE),
+                   re.compile(r'^Decision: (?:answer|refine)$', re.MULTILINE)],
+    'llm_response': [re.compile(r'^Decision: (?:answer|refine)$', re.MULTILINE)],
+    'analysis': [re.compile(r'^Research Gaps:$', re.MULTILINE), _STRICT_AREA],
+    'focus_areas': [_STRICT_AREA],
+}
+
+def strict_parse(kind: str, text: str) -> bool:
+    return all(pattern.search(text) for pattern in _STRICT_PATTERNS.get(kind, []))
+
+def matches_expected(fields: Dict, expected: Optional[Dict]) -> bool:
+    return all(fields.get(key) == value for key, value in (expected or {}).items())
+
+# Mutations model formatting drift seen across models; none of them changes the content
+_LABEL = re.compile(r'^([A-Z][A-Za-z ]*?):', re.MULTILINE)
+_NUMBERED = re.compile(r'^(\d+)\.', re.MULTILINE)
+PREAMBLES = ["Sure, here you go.", "Here is my output:", "Okay. Following the requested format:"]
+CLOSINGS = ["I hope this helps.", "Let me know if you would like me to adjust anything."]
+
+MUTATIONS: Dict[str, Callable[[str, random.Random], str]] = {
+    'bold_labels': lambda text, rng: _LABEL.sub(r'**\1:**', text),
+    'lowercase_labels': lambda text, rng: _LABEL.sub(lambda m: m.group(1).lower() + ':', text),
+    'label_spacing': lambda text, rng: _LABEL.sub(r'\1 :', text),
+    'bullets': lambda text, rng: _LABEL.sub(r'- \1:', text),
+    'paren_numbering': lambda text, rng: _NUMBERED.sub(r'\1)', text),
+    'blank_lines': lambda text, rng: text.replace('\n', '\n\n'),
+    'indent': lambda text, rng: '\n'.join('  ' + line for line in text.split('\n')),
+    'crlf': lambda text, rng: text.replace('\n', '\r\n'),
+    'preamble': lambda text, rng: f"{rng.choice(PREAMBLES)}\n\n{text}",
+    'closing': lambda text, rng: f"{text}\n\n{rng.choice(CLOSINGS)}",
+}
+
+def mutate(text: str, rng: random.Random) -> Tuple[str, List[str]]:
+    """Apply one to three distinct mutations; CRLF always goes last so the others see plain newlines"""
+    names = rng.sample(sorted(MUTATIONS), rng.randint(1, 3))
+    names.sort(key=lambda name: name == 'crlf')
+    for name in names:
+        text = MUTATIONS[name](text, rng)
+    return text, names
+
+class KindStats:
+    def __init__(self):
+        self.total = 0
+        self.success = 0
+        self.strict = 0
+        self.retries_avoided = 0
+        self.seconds = 0.0
+        self.parses = 0
+        self.fuzz_total = 0
+        self.fuzz_success = 0
+        self.fuzz_strict = 0
+        self.crashes = 0
+        self.failures: List[str] = []
+
+def _run(parser: ParserFn, text: str) -> Tuple[bool, Dict]:
+    try:
+        return parser(text)
+    except Exception as e:
+        return False, {'error': f"{type(e).__name__}: {e}"}
+
+def time_parse(parser: ParserFn, text: str, min_seconds: float = 0.02) -> Tuple[float, int]:
+    """Repeat a parse until min_seconds have passed. Returns (total seconds, parses)."""
+    parses = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_seconds or parses == 0:
+        _run(parser, text)
+        parses += 1
+        elapsed = time.perf_counter() - start
+    return elapsed, parses
+
+def run_benchmark(records: List[Dict], fuzz: int = 20, seed: int = 0,
+                  by_model: bool = False) -> Dict[str, KindStats]:
+    parsers = _build_parsers()
+    rng = random.Random(seed)
+    stats: Dict[str, KindStats] = defaultdict(KindStats)
+
+    # The parsers print progress messages; keep them out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        for record in records:
+            kind = record['kind']
+            parser = parsers.get(kind)
+            if parser is None:
+                continue
+            group = stats[f"{record.get('model', '?')}/{kind}" if by_model else kind]
+            text, expected = record['response'], record.get('expected')
+
+            usable, fields = _run(parser, text)
+            ok = usable and matches_expected(fields, expected)
+            strict = strict_parse(kind, text)
+            group.total += 1
+            group.success += ok
+            group.strict += strict
+            group.retries_avoided += ok and not strict
+            if not ok:
+                group.failures.append(f"[{record.get('source', '?')}] {text[:80]!r} -> {fields}")
+
+            seconds, parses = time_parse(parser, text)
+            group.seconds += seconds
+            group.parses += parses
+
+            for _ in range(fuzz):
+                mutated, names = mutate(text, rng)
+                try:
+                    usable, fields = parser(mutated)
+                except Exception as e:
+                    group.crashes += 1
+                    group.failures.append(f"crash after {'+'.join(names)}: {type(e).__name__}: {e}")
+                    usable, fields = False, {}
+                group.fuzz_total += 1
+                group.fuzz_strict += strict_parse(kind, mutated)
+                if usable and matches_expected(fields, expected):
+                    group.fuzz_success += 1
+                elif ok:
+                    group.failures.append(f"fuzz {'+'.join(names)}: {mutated[:80]!r} -> {fields}")
+    return stats
+
+def _rate(count: int, total: int) -> str:
+    return f"{100 * count / total:.0f}%" if total else "-"
+
+def format_report(stats: Dict[str, KindStats], show_failures: bool = False) -> str:
+    width = max([len(name) for name in stats] + [10])
+    lines = [f"{'parser':<{width}} {'n':>4} {'success':>8} {'strict':>7} {'retries avoided':>16} "
+             f"{'us/parse':>9} {'fuzz':>6} {'fuzz strict':>12} {'crashes':>8}"]
+    totals = KindStats()
+    for name in sorted(stats):
+        s = stats[name]
+        lines.append(
+            f"{name:<{width}} {s.total:>4} {_rate(s.success, s.total):>8} {_rate(s.strict, s.total):>7} "
+            f"{s.retries_avoided:>16} {s.seconds / max(1, s.parses) * 1e6:>9.1f} "
+            f"{_rate(s.fuzz_success, s.fuzz_total):>6} {_rate(s.fuzz_strict, s.fuzz_total):>12} {s.crashes:>8}"
+        )
+        for attr in ('total', 'success', 'strict', 'retries_avoided', 'fuzz_total', 'fuzz_success', 'crashes'):
+            setattr(totals, attr, getattr(totals, attr) + getattr(s, attr))
+    lines.append(
+        f"{'all':<{width}} {totals.total:>4} {_rate(totals.success, totals.total):>8} "
+        f"{_rate(totals.strict, totals.total):>7} {totals.retries_avoided:>16} {'':>9} "
+        f"{_rate(totals.fuzz_success, totals.fuzz_total):>6} {'':>12} {totals.crashes:>8}"
+    )
+    if show_failures:
+        for name in sorted(stats):
+            for failure in stats[name].failures:
+                lines.append(f"{name}: {failure}")
+    return "\n".join(lines)
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark and fuzz the LLM response parsers")
+    arg_parser.add_argument("corpus", nargs="?", default=DEFAULT_CORPUS_DIR,
+                            help="corpus JSONL file or directory of JSONL files")
+    arg_parser.add_argument("--fuzz", type=int, default=20, help="mutated variants per response")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--by-model", action="store_true", help="report each model separately")
+    arg_parser.add_argument("--show-failures", action="store_true")
+    args = arg_parser.parse_args()
+
+    records = load_corpus(args.corpus)
+    print(f"{len(records)} responses from {args.corpus}\n")
+    stats = run_benchmark(records, fuzz=args.fuzz, seed=args.seed, by_model=args.by_model)
+    print(format_report(stats, args.show_failures))
+
+if __name__ == "__main__":
+    main()
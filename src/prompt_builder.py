@@ -0,0 +1,113 @@
+import heapq
+import re
+from typing import Iterable, List, Optional, Tuple
+
+_WHITESPACE = re.compile(r'\s+')
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate used throughout the research manager"""
+    return int(len(text.split()) * 1.3)
+
+def normalize_whitespace(text: str) -> str:
+    """Collapse all whitespace runs to single spaces. Applied once when content is ingested."""
+    return _WHITESPACE.sub(' ', text).strip()
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to roughly max_tokens estimated tokens, on a word boundary"""
+    if max_tokens <= 0:
+        return ""
+    words = text.split()
+    max_words = max(1, int(max_tokens / 1.3))
+    if len(words) <= max_words:
+        return text
+    return " ".join(words[:max(1, max_words - 1)]) + " ..."
+
+def content_budget(n_ctx: int, template: str, max_output_tokens: int, minimum: int = 256) -> int:
+    """Tokens left for content once the prompt template and the generated output are accounted for"""
+    return max(minimum, n_ctx - estimate_tokens(template) - max_output_tokens)
+
+class PromptBuilder:
+    """
+    Fits content sections into a token budget for a single prompt.
+
+    Sections are normalized once when added and clipped to a per-source quota. The builder holds
+    at most its budget: when a section does not fit, lower priority sections are evicted, or the
+    new section is clipped or dropped if it ranks lowest. build() renders the kept sections
+    highest priority first, in insertion order within a priority.
+    """
+
+    def __init__(self, max_tokens: int, per_source_tokens: Optional[int] = None,
+                 section_format: str = "Content from {source}:\n{text}\n", separator: str = "\n",
+                 min_section_tokens: int = 50):
+        self.max_tokens = max_tokens
+        self.per_source_tokens = per_source_tokens
+        self.section_format = section_format
+        self.separator = separator
+        self.min_section_tokens = min_section_tokens
+        self.used_tokens = 0
+        self.dropped = 0
+        # Min-heap of (priority, -order, tokens, source, text); the root is evicted first
+        self._sections: List[Tuple[int, int, int, str, str]] = []
+        self._source_tokens = {}
+        self._order = 0
+
+    def __len__(self) -> int:
+        return len(self._sections)
+
+    @property
+    def remaining_tokens(self) -> int:
+        return self.max_tokens - self.used_tokens
+
+    def add(self, text: str, source: str = "", priority: int = 0, normalize: bool = True) -> bool:
+        """Add a section. Returns False if it was dropped for lack of budget."""
+        if normalize:
+            text = normalize_whitespace(text)
+        if not text:
+            return False
+
+        overhead = estimate_tokens(self.section_format.format(source=source, text="", index=0))
+        limit = self.max_tokens
+        if self.per_source_tokens is not None:
+            used = self._source_tokens.get(source, 0)
+            limit = min(limit, self.per_source_tokens - used)
+            if used and limit - overhead < self.min_section_tokens:
+                limit = 0  # Too little quota left for more than a fragment
+        text = truncate_to_tokens(text, limit - overhead)
+        if not text:
+            self.dropped += 1  # The source has used up its quota
+            return False
+        tokens = estimate_tokens(text) + overhead
+
+        # Make room by evicting sections that rank below the new one
+        while self._sections and tokens > self.remaining_tokens and self._sections[0][0] < priority:
+            self._evict()
+
+        if tokens > self.remaining_tokens:
+            if self.remaining_tokens - overhead < self.min_section_tokens:
+                self.dropped += 1
+                return False
+            text = truncate_to_tokens(text, self.remaining_tokens - overhead)
+            tokens = estimate_tokens(text) + overhead
+
+        self._order += 1
+        heapq.heappush(self._sections, (priority, -self._order, tokens, source, text))
+        self.used_tokens += tokens
+        self._source_tokens[source] = self._source_tokens.get(source, 0) + tokens
+        return True
+
+    def extend(self, sections: Iterable[Tuple[str, str]], priority: int = 0, normalize: bool = True) -> int:
+        """Stream (source, text) pairs into the builder. Returns the number kept."""
+        return sum(self.add(text, source, priority, normalize) for source, text in sections)
+
+    def _evict(self):
+        _, _, tokens, source, _ = heapq.heappop(self._sections)
+        self.used_tokens -= tokens
+        self._source_tokens[source] -= tokens
+        self.dropped += 1
+
+    def build(self) -> str:
+        ordered = sorted(self._sections, key=lambda s: (-s[0], -s[1]))
+        return self.separator.join(
+            self.section_format.format(source=source, text=text, index=i)
+            for i, (_, _, _, source, text) in enumerate(ordered, 1)
+        )
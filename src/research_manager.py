@@ -5,8 +5,8 @@ import time
 import re
 import json
 import signal
-from typing import List, Dict, Set, Optional, Tuple, Union
-from dataclasses import dataclass
+from typing import Callable, List, Dict, Set, Optional, Tuple, Union
+from dataclasses import dataclass, asdict
 from queue import Queue
 from datetime import datetime
 from io import StringIO
@@ -16,8 +16,70 @@ import tty
 from threading import Event
 from urllib.parse import urlparse
 from pathlib import Path
+import logging
 
 from .llm_wrapper import LLMWrapper, ChatLLMWrapper # new
+from .research_pipeline import ResearchPipeline, PipelineStage, DEFAULT_STAGE_WORKERS
+from .summarizer import MapReduceSummarizer, RollingSummarizer, estimate_tokens
+from .prompt_builder import PromptBuilder, content_budget, truncate_to_tokens
+from .retrieval import BM25Index
+from .embeddings import create_semantic_index
+from .session_store import SessionStore, render_section
+from .checkpoint import checkpoint_path, save_checkpoint, load_checkpoint, find_session
+from .novelty import FocusHistory
+from .focus_scheduler import FocusScheduler
+from .budget import ResearchBudget, BudgetScheduler
+from .cancellation import Cancelled, CancellationToken, PauseGate
+from .response_parsing import parse_response, clean_query, StreamingParser
+from .response_corpus import record_response
+
+logger = logging.getLogger(__name__)
+
+# A time range letter standing alone, used when the model omits the 'Time range:' label
+ISOLATED_TIME_CHAR = re.compile(r'(?<![a-z])([dwmy])(?![a-z])')
+
+# Prompt for assessing the research so far; the content is fitted to the summarizer's budget
+ASSESSMENT_PROMPT = """
+Based on the following research content, please assess whether the original query "{original_query}" can be answered sufficiently with the collected information.
+
+Research Content:
+{content}
+
+Instructions:
+1. If the research content provides enough information to answer the original query in detail, respond with: "The research is sufficient to answer the query."
+2. If not, respond with: "The research is insufficient and it would be advisable to continue gathering information."
+3. Do not provide any additional information or details.
+
+Assessment:
+"""
+
+# Prompt for questions asked after research has finished; context is fitted to the model context
+CONVERSATION_PROMPT = """
+Based on the following research content and summary, please answer this question:
+
+{context}
+
+Question: {user_query}
+
+you have 2 sets of instructions the applied set and the unapplied set, the applied set should be followed if the question is directly relating to the research content whereas anything else other then direct questions about the content of the research will result in you instead following the unapplied ruleset
+
+Applied:
+
+Instructions:
+1. Answer based ONLY on the research content provided above if asked a question about your research or that content.
+2. If the information requested isn't in the research, clearly state that it isn't in the content you gathered.
+3. Be direct and specific in your response, DO NOT directly cite research unless specifically asked to, be concise and give direct answers to questions based on the research, unless instructed otherwise.
+
+Unapplied:
+
+Instructions:
+
+1. Do not make up anything that isn't actually true.
+2. Respond directly to the user's question in an honest and thoughtful manner.
+3. disregard rules in the applied set for queries not DIRECTLY related to the research, including queries about the research process or what you remember about the research should result in the unapplied ruleset being used.
+
+Answer:
+"""
 
 @dataclass
 class ResearchFocus:
@@ -27,12 +89,19 @@ class ResearchFocus:
     source_query: str = ""
     timestamp: str = ""
     search_queries: List[str] = None
+    # Scheduling state: novelty against covered areas when generated, finished passes and
+    # the queries of those passes
+    novelty: float = 1.0
+    passes: int = 0
+    past_queries: List[str] = None
 
     def __post_init__(self):
         if not self.timestamp:
             self.timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         if self.search_queries is None:
             self.search_queries = []
+        if self.past_queries is None:
+            self.past_queries = []
 
 @dataclass
 class AnalysisResult:
@@ -56,11 +125,17 @@ class StrategicAnalysisParser:
             ]
         }
 
-    def strategic_analysis(self, original_query: str) -> Optional[AnalysisResult]:
-        """Generate and process research areas with retries until success"""
+    def strategic_analysis(self, original_query: str, covered_areas: Optional[List[str]] = None,
+                           on_area: Optional[Callable[[ResearchFocus], None]] = None) -> Optional[AnalysisResult]:
+        """
+        Generate and process research areas with retries until success.
+
+        If on_area is given it is called with each area as soon as it has been generated,
+        while the model is still writing the remaining ones.
+        """
         max_retries = 3
         try:
-            self.logger.info("Starting strategic analysis...")
+            logger.info("Starting strategic analysis...")
             prompt = f"""
 You must select exactly 5 areas to investigate in order to explore and gather information to answer the research question:
 "{original_query}"
@@ -83,10 +158,15 @@ Priority: [number 1-5]
 
 5. [Fifth research topic]
 Priority: [number 1-5]
+"""
+            if covered_areas:
+                covered = "\n".join(f"- {area}" for area in covered_areas)
+                prompt += f"""
+The following areas have already been investigated. Do NOT repeat them or rephrase them; choose areas that will uncover new information:
+{covered}
 """
             for attempt in range(max_retries):
-                response = self.llm.generate(prompt, max_tokens=1000)
-                focus_areas = self._extract_research_areas(response)
+                response, focus_areas = self._generate_areas(prompt, on_area)
 
                 if focus_areas:  # If we got any valid areas
                     # Sort by priority (highest first)
@@ -103,8 +183,7 @@ Priority: [number 1-5]
 
             # If all retries failed, try one final time with a stronger prompt
             prompt += "\n\nIMPORTANT: You MUST provide exactly 5 research areas with priorities. This is crucial."
-            response = self.llm.generate(prompt, {"max_tokens": 1000})
-            focus_areas = self._extract_research_areas(response)
+            response, focus_areas = self._generate_areas(prompt, on_area)
 
             if focus_areas:
                 focus_areas.sort(key=lambda x: x.priority, reverse=True)
@@ -120,71 +199,28 @@ Priority: [number 1-5]
         except Exception as e:
             return None
 
+    def _generate_areas(self, prompt: str, on_area: Optional[Callable[[ResearchFocus], None]] = None,
+                        expected_areas: int = 5) -> Tuple[str, List[ResearchFocus]]:
+        """Stream the model's areas through an incremental parser, stopping once all have arrived"""
+        focus_areas: List[ResearchFocus] = []
+
+        def emit(area: str, priority: int):
+            focus = ResearchFocus(area=area, priority=priority)
+            focus_areas.append(focus)
+            if on_area:
+                on_area(focus)
+
+        parser = StreamingParser(expected_areas=expected_areas, on_area=emit)
+        response = self.llm.generate_incremental(prompt, parser, {"max_tokens": 1000})
+        record_response('focus_areas', response)
+        return response, focus_areas
+
     def _extract_research_areas(self, text: str) -> List[ResearchFocus]:
-        """Extract research areas with enhanced parsing to handle priorities in various formats."""
-        areas = []
-        lines = text.strip().split('\n')
-
-        current_area = None
-        current_priority = None
-
-        for i in range(len(lines)):
-            line = lines[i].strip()
-            if not line:
-                continue
-
-            # Check for numbered items (e.g., '1. Area Name')
-            number_match = re.match(r'^(\d+)\.\s*(.*)', line)
-            if number_match:
-                # If we have a previous area, add it to our list
-                if current_area is not None:
-                    areas.append(ResearchFocus(
-                        area=current_area.strip(' -:'),
-                        priority=current_priority or 3,
-                    ))
-                # Start a new area
-                area_line = number_match.group(2)
-
-                # Search for 'priority' followed by a number, anywhere in the area_line
-                priority_inline_match = re.search(
-                    r'(?i)\bpriority\b\s*(?:[:=]?\s*)?(\d+)', area_line)
-                if priority_inline_match:
-                    # Extract and set the priority
-                    try:
-                        current_priority = int(priority_inline_match.group(1))
-                        current_priority = max(1, min(5, current_priority))
-                    except ValueError:
-                        current_priority = 3  # Default priority if parsing fails
-                    # Remove the 'priority' portion from area_line
-                    area_line = area_line[:priority_inline_match.start()] + area_line[priority_inline_match.end():]
-                    area_line = area_line.strip(' -:')
-                else:
-                    current_priority = None  # Priority might be on the next line
-
-                current_area = area_line.strip()
-
-            elif re.match(r'(?i)^priority\s*(?:[:=]?\s*)?(\d+)', line):
-                # Extract priority from the line following the area
-                try:
-                    priority_match = re.match(r'(?i)^priority\s*(?:[:=]?\s*)?(\d+)', line)
-                    current_priority = int(priority_match.group(1))
-                    current_priority = max(1, min(5, current_priority))
-                except (ValueError, IndexError):
-                    current_priority = 3  # Default priority if parsing fails
-
-            # Check if this is the last line or the next line is a new area
-            next_line_is_new_area = (i + 1 < len(lines)) and re.match(r'^\d+\.', lines[i + 1].strip())
-            if next_line_is_new_area or i + 1 == len(lines):
-                if current_area is not None:
-                    # Append the current area and priority to the list
-                    areas.append(ResearchFocus(
-                        area=current_area.strip(' -:'),
-                        priority=current_priority or 3,
-                    ))
-                    current_area = None
-                    current_priority = None
-
-        return areas
+        """Extract numbered research areas with their priorities, inline or on the following line"""
+        return [
+            ResearchFocus(area=area, priority=priority)
+            for area, priority in parse_response(text).areas
+        ]
 
     def _clean_text(self, text: str) -> str:
         """Clean and normalize text"""
@@ -239,11 +275,43 @@ Priority: [number 1-5]
 
 class ResearchManager:
     """Manages the research process including analysis, search, and documentation"""
-    def __init__(self, llm_config, search_engine, max_searches_per_cycle: int = 5):
-        self.llm_wrapper = LLMWrapper(llm_config)
-        self.parser = parser
+    def __init__(self, llm_config, search_engine, max_searches_per_cycle: int = 5,
+                 stage_workers: Optional[Dict[str, int]] = None, pipeline_queue_size: int = 8,
+                 max_document_tokens: Optional[int] = None, checkpoint_interval: float = 30.0,
+                 queries_per_focus: int = 1, max_active_areas: int = 3,
+                 budget: Optional[ResearchBudget] = None,
+                 on_event: Optional[Callable[[str, Dict], None]] = None):
+        # Setting should_terminate cancels the LLM calls, searches and fetches of research in
+        # progress. Summaries and questions use llm_wrapper, which it does not cancel.
+        self.should_terminate = CancellationToken()
+        search_engine.set_cancel_token(self.should_terminate)
+        # Token usage is shared with the search engine's LLM so the budget sees every call
+        self.llm_wrapper = LLMWrapper(llm_config, usage=search_engine.llm.usage)
+        self.research_llm = LLMWrapper(llm_config, usage=search_engine.llm.usage,
+                                       cancel_token=self.should_terminate)
+        self.parser = search_engine.parser
         self.search_engine = search_engine
+        # Shared with the search engine so its page selection sees the yield of every fetch
+        self.yield_tracker = search_engine.yield_tracker
         self.max_searches = max_searches_per_cycle
+        self.stage_workers = {**DEFAULT_STAGE_WORKERS, **(stage_workers or {})}
+        self.pipeline_queue_size = pipeline_queue_size
+        # With more than one query per focus area, queries are generated in one call and searched concurrently
+        self.queries_per_focus = max(1, queries_per_focus)
+        # Documents are summarized with map-reduce, so their size is only capped when asked to
+        self.max_document_tokens = max_document_tokens
+        # Optional limits on time, LLM tokens, pages and document size; research is summarized
+        # automatically once one of them runs out
+        self.budget = budget or ResearchBudget()
+        if self.budget.max_document_tokens is None:
+            self.budget.max_document_tokens = max_document_tokens
+        self.budget_scheduler = BudgetScheduler(
+            self.budget, self.llm_wrapper.usage, self.yield_tracker,
+            document_tokens=lambda: self.store.total_tokens() if self.store else 0
+        )
+        self.budget_exhausted: Optional[str] = None
+        # Progress events for front ends other than the terminal, e.g. the HTTP service
+        self.on_event = on_event
         self.stop_words = {
             'the', 'be', 'to', 'of', 'and', 'a', 'in', 'that', 'have', 'i',
             'it', 'for', 'not', 'on', 'with', 'he', 'as', 'you', 'do', 'at'
@@ -253,21 +321,74 @@ class ResearchManager:
         self.searched_urls: Set[str] = set()
         self.current_focus: Optional[ResearchFocus] = None
         self.original_query: str = ""
-        self.focus_areas: List[ResearchFocus] = []
         self.is_running = False
+        self.pipeline: Optional[ResearchPipeline] = None
+        self._claimed_urls: Set[str] = set()
+        self._url_lock = threading.Lock()
+        self._document_full = Event()
+
+        # Control flags shared between the command loop and the research thread
+        self.shutdown_event = Event()
+        self.research_started = Event()
+        self.pause_gate = PauseGate()
+        self.awaiting_user_decision = False
+        self.summary_ready = False
+
+        # Checkpointing state
+        self.cycle = 0
+        self.completed_areas: Set[str] = set()
+        self.checkpoint_path: Optional[str] = None
+        self.checkpoint_interval = checkpoint_interval
+        self._last_checkpoint = 0.0
+        self._checkpoint_lock = threading.Lock()
+        self._resume_focus_areas: List[ResearchFocus] = []
 
         # New conversation mode attributes
         self.research_complete = False
         self.research_summary = ""
         self.conversation_active = False
         self.research_content = ""
-
-        # Initialize document paths
+        self.findings_index = BM25Index()
+        # Optional embedding index, only created when the preset configures an embedding model
+        self.semantic_index = create_semantic_index(llm_config)
+        self.retrieval_top_k = 6
+
+        # Focus areas investigated in earlier cycles, used to keep new cycles on new ground
+        self.focus_history = FocusHistory(self.semantic_index)
+        self._stale_generations = 0
+
+        # Focus areas wait in a persistent queue; only max_active_areas are in the pipeline at once
+        self.focus_scheduler = FocusScheduler(self.yield_tracker)
+        self.max_active_areas = max(1, max_active_areas)
+        self._active_areas: List[ResearchFocus] = []
+        self._active_lock = threading.Lock()
+        self._generation_thread: Optional[threading.Thread] = None
+        self._next_generation = 0.0
+
+        # Initialize document paths; the text document is an export view of the session store
         self.document_path = None
+        self.store: Optional[SessionStore] = None
         self.session_files = []
 
         # Initialize UI and parser
-        self.strategic_parser = StrategicAnalysisParser(llm=self.llm_wrapper)
+        self.strategic_parser = StrategicAnalysisParser(llm=self.research_llm)
+        self.summarizer = MapReduceSummarizer(
+            self.llm_wrapper,
+            n_ctx=self.llm_wrapper.llm_config.get('n_ctx', 2048)
+        )
+        self.rolling_summary = RollingSummarizer(
+            self.llm_wrapper,
+            n_ctx=self.llm_wrapper.llm_config.get('n_ctx', 2048)
+        )
+
+    def _emit(self, event: str, **data):
+        """Pass a progress event to the on_event callback, if one is set"""
+        if self.on_event is None:
+            return
+        try:
+            self.on_event(event, data)
+        except Exception as e:
+            logger.warning(f"Event handler failed for '{event}': {str(e)}")
 
     def print_thinking(self):
         """Display thinking indicator to user"""
@@ -276,6 +397,8 @@ class ResearchManager:
 
     def formulate_search_queries(self, focus_area: ResearchFocus) -> List[str]:
         """Generate search queries for a focus area"""
+        if self.queries_per_focus > 1:
+            return self.formulate_diverse_queries(focus_area, self.queries_per_focus)
         try:
 
             prompt = f"""
@@ -288,15 +411,19 @@ Base a search query to investigate the following research focus, which is relate
 Area: {focus_area.area}
 
 Create a search query that will yield specific, search results thare are directly relevant to your focus area.
-Format your response EXACTLY like this:
+{self._past_queries_note(focus_area)}Format your response EXACTLY like this:
 
 Search query: [Your 2-5 word query]
 Time range: [d/w/m/y/none]
 
 Do not provide any additional information or explanation, note that the time range allows you to see results within a time range (d is within the last day, w is within the last week, m is within the last month, y is within the last year, and none is results from anytime, only select one, using only the corresponding letter for whichever of these options you select as indicated in the response format) use your judgement as many searches will not require a time range and some may depending on what the research focus is.
 """
-            response_text = self.llm_wrapper.generate(prompt, max_tokens={"max_tokens": 50})
-            query, time_range = self.parse_query_response(response_text)
+            # Stop generating as soon as both fields are in
+            response_text = self.research_llm.generate_incremental(
+                prompt, StreamingParser(required_fields=('queries', 'time_range')), {"max_tokens": 50}
+            )
+            parsed = self.parse_search_query(response_text)
+            query, time_range = parsed['query'], parsed['time_range']
 
             if not query:
                 print("Error: Empty search query. Using focus area as query...")
@@ -312,47 +439,69 @@ Do not provide any additional information or explanation, note that the time ran
             logger.error(f"Error formulating query: {str(e)}")
             return [focus_area.area]
 
+    def _past_queries_note(self, focus_area: ResearchFocus) -> str:
+        """Prompt lines listing the queries of earlier passes over an area, so new ones differ"""
+        if not focus_area.past_queries:
+            return ""
+        searched = "\n".join(f"- {query}" for query in focus_area.past_queries)
+        return f"These queries were already searched for this area; use a different angle:\n{searched}\n"
+
+    def formulate_diverse_queries(self, focus_area: ResearchFocus, count: int) -> List[str]:
+        """Generate several different search queries for a focus area in a single LLM call"""
+        try:
+            format_lines = "\n".join(
+                f"Search query {i}: [Your 2-5 word query]" for i in range(1, count + 1)
+            )
+            prompt = f"""
+In order to research this query/topic:
+
+Context: {self.original_query}
+
+Create {count} different search queries to investigate the following research focus, which is related to the original query/topic:
+
+Area: {focus_area.area}
+
+Each query should approach the focus area from a different angle (for example different terminology, a specific sub-topic, data or statistics, expert analysis) so that together they find results a single query would miss.
+{self._past_queries_note(focus_area)}Format your response EXACTLY like this:
+
+{format_lines}
+
+Do not provide any additional information or explanation.
+"""
+            parser = StreamingParser(expected_queries=count)
+            self.research_llm.generate_incremental(prompt, parser, {"max_tokens": 30 * count})
+            queries = parser.finish().queries[:count]
+
+            if not queries:
+                print("Error: Empty search queries. Using focus area as query...")
+                return [focus_area.area]
+
+            print(f"Original focus: {focus_area.area}")
+            for query in queries:
+                print(f"Formulated query: {query}")
+            return queries
+
+        except Exception as e:
+            logger.error(f"Error formulating queries: {str(e)}")
+            return [focus_area.area]
+
+    def parse_search_queries(self, response: str) -> List[str]:
+        """Parse numbered 'Search query N:' lines, dropping duplicates"""
+        return parse_response(response).queries
+
     def parse_search_query(self, query_response: str) -> Dict[str, str]:
         """Parse search query formulation response with improved time range detection"""
+        record_response('query', query_response)
         try:
-            lines = query_response.strip().split('\n')
-            result = {
-                'query': '',
-                'time_range': 'none'
-            }
-
-            # First try to find standard format
-            for line in lines:
-                if ':' in line:
-                    key, value = line.split(':', 1)
-                    key = key.strip().lower()
-                    value = value.strip()
-
-                    if 'query' in key:
-                        result['query'] = self._clean_query(value)
-                    elif ('time' in key or 'range' in key) and value.strip().lower() in ['d', 'w', 'm', 'y', 'none']:
-                        result['time_range'] = value.strip().lower()
-
-            # If no time range found, look for individual characters
-            if result['time_range'] == 'none':
-                # Get all text except the query itself
+            parsed = parse_response(query_response)
+            result = {'query': parsed.query, 'time_range': parsed.time_range or 'none'}
+
+            # If no time range field was found, look for a single isolated d, w, m or y
+            if parsed.time_range is None:
                 full_text = query_response.lower()
                 if result['query']:
                     full_text = full_text.replace(result['query'].lower(), '')
-
-                # Look for isolated d, w, m, or y characters
-                time_chars = set()
-                for char in ['d', 'w', 'm', 'y']:
-                    # Check if char exists by itself (not part of another word)
-                    matches = re.finditer(r'\b' + char + r'\b', full_text)
-                    for match in matches:
-                        # Verify it's not part of a word
-                        start, end = match.span()
-                        if (start == 0 or not full_text[start-1].isalpha()) and \
-                           (end == len(full_text) or not full_text[end].isalpha()):
-                            time_chars.add(char)
-
-                # If exactly one time char found, use it
+                time_chars = set(ISOLATED_TIME_CHAR.findall(full_text))
                 if len(time_chars) == 1:
                     result['time_range'] = time_chars.pop()
 
@@ -360,8 +509,12 @@ Do not provide any additional information or explanation, note that the time ran
         except Exception as e:
             return {'query': '', 'time_range': 'none'}
 
+    def _clean_query(self, query: str) -> str:
+        """Clean and validate search query"""
+        return clean_query(query)
+
     def _initialize_document(self):
-        """Initialize research session document"""
+        """Initialize research session store and its document view"""
         try:
             # Get all existing research session files
             self.session_files = []
@@ -376,38 +529,79 @@ Do not provide any additional information or explanation, note that the time ran
             # Determine next session number
             next_session = 1 if not self.session_files else max(self.session_files) + 1
             self.document_path = f"research_session_{next_session}.txt"
-
-            # Initialize the new document
-            with open(self.document_path, 'w', encoding='utf-8') as f:
-                f.write(f"Research Session {next_session}\n")
-                f.write(f"Topic: {self.original_query}\n")
-                f.write(f"Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write("="*80 + "\n\n")
-                f.flush()
+            self._open_store(f"research_session_{next_session}.db", str(next_session))
 
         except Exception as e:
             logger.error(f"Error initializing document: {str(e)}")
             self.document_path = "research_findings.txt"
-            with open(self.document_path, 'w', encoding='utf-8') as f:
-                f.write("Research Findings:\n\n")
-                f.flush()
+            self._open_store("research_findings.db", "")
+
+    def _open_store(self, store_path: str, session_number: str):
+        """Open the session store and write the initial document view"""
+        self.store = SessionStore(store_path)
+        self._use_session_vectors(store_path)
+        self.store.set_meta('session_number', session_number)
+        self.store.set_meta('topic', self.original_query)
+        self.store.set_meta('started', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        self.store.export_text(self.document_path)
+
+    def _use_session_vectors(self, store_path: str, resume: bool = False) -> int:
+        """
+        Memory-map the semantic index's vectors to a file next to the session store. On resume
+        the vectors stored there are reopened; returns the number of chunks restored.
+        """
+        if self.semantic_index is None or len(self.semantic_index):
+            return 0
+        try:
+            return self.semantic_index.set_path(os.path.splitext(store_path)[0] + ".vectors.npy", resume)
+        except Exception as e:
+            logger.warning(f"Could not reopen the session's vectors: {str(e)}")
+            return 0
+
+    def add_to_document(self, content: str, source_url: str, focus_area: str) -> int:
+        """
+        Add research findings to the session store and its document view.
 
-    def add_to_document(self, content: str, source_url: str, focus_area: str):
-        """Add research findings to current session document"""
+        Returns the number of new tokens added, 0 if the content was skipped as a duplicate.
+        """
         try:
+            if source_url in self.searched_urls:
+                return 0
+            if self._is_duplicate_content(content):
+                self.searched_urls.add(source_url)
+                print(f"Skipped near-duplicate content from: {source_url}")
+                return 0
+
+            self.searched_urls.add(source_url)
+            if self.store.add_source(source_url, focus_area, content) is None:
+                return 0
+
+            # Keep the document view current without re-exporting the whole store
             with open(self.document_path, 'a', encoding='utf-8') as f:
-                if source_url not in self.searched_urls:
-                    f.write(f"\n{'='*80}\n")
-                    f.write(f"Research Focus: {focus_area}\n")
-                    f.write(f"Source: {source_url}\n")
-                    f.write(f"Content:\n{content}\n")
-                    f.write(f"{'='*80}\n")
-                    f.flush()
-                    self.searched_urls.add(source_url)
-                    print(f"Added content from: {source_url}")
+                f.write(render_section(focus_area, source_url, content))
+
+            self.rolling_summary.add_finding(focus_area, content, source_url)
+            self.findings_index.add(content, source_url, focus_area)
+            if self.semantic_index is not None:
+                self.semantic_index.add(content, source_url, focus_area)
+            print(f"Added content from: {source_url}")
+            tokens = estimate_tokens(content)
+            self._emit('source_added', url=source_url, focus_area=focus_area, tokens=tokens)
+            return tokens
         except Exception as e:
             logger.error(f"Error adding to document: {str(e)}")
             print(f"Error saving content: {str(e)}")
+            return 0
+
+    def _is_duplicate_content(self, content: str) -> bool:
+        """Check new content against the semantic index, if one is configured"""
+        if self.semantic_index is None:
+            return False
+        try:
+            return self.semantic_index.is_duplicate(content)
+        except Exception as e:
+            logger.warning(f"Semantic duplicate check failed: {str(e)}")
+            return False
 
     def _process_search_results(self, results: Dict[str, str], focus_area: str):
         """Process and store search results"""
@@ -418,97 +612,280 @@ Do not provide any additional information or explanation, note that the time ran
             if url not in self.searched_urls:
                 self.add_to_document(content, url, focus_area)
 
-    def _research_loop(self):
-        """Main research loop with comprehensive functionality"""
-        self.is_running = True
-        try:
-            self.research_started.set()
-
-            while not self.should_terminate.is_set() and not self.shutdown_event.is_set():
-                # Check if research is paused
-                if self.research_paused:
-                    time.sleep(1)
-                    continue
-
-                print("\nAnalyzing research progress...")
-
-                # Generate focus areas
-                print("\nGenerating research focus areas...")
-                analysis_result = self.strategic_parser.strategic_analysis(self.original_query)
-
-                if not analysis_result:
-                    print("\nFailed to generate analysis result. Retrying...")
-                    continue
+    def _build_pipeline(self) -> ResearchPipeline:
+        """Create the staged pipeline used by the research loop"""
+        handlers = [
+            ('formulate', self._stage_formulate),
+            ('search', self._stage_search),
+            ('select', self._stage_select),
+            ('scrape', self._stage_scrape),
+            ('write', self._stage_write),
+        ]
+        stages = [
+            PipelineStage(name, handler, self.stage_workers.get(name, 1))
+            for name, handler in handlers
+        ]
+        return ResearchPipeline(
+            stages,
+            stop_event=self.should_terminate,
+            pause_gate=self.pause_gate,
+            queue_size=self.pipeline_queue_size,
+            on_focus_complete=self._on_focus_complete
+        )
 
-                focus_areas = analysis_result.focus_areas
-                if not focus_areas:
-                    print("\nNo valid focus areas generated. Retrying...")
-                    continue
+    def _stage_formulate(self, focus_area: ResearchFocus, _payload) -> List[List[str]]:
+        """Pipeline stage: focus area -> batches of search queries"""
+        self.current_focus = focus_area
+        print(f"\nInvestigating: {focus_area.area}")
+        self._emit('focus_area_started', area=focus_area.area, priority=focus_area.priority, passes=focus_area.passes)
+        self.store.add_focus_area(focus_area.area, focus_area.priority)
+        if focus_area.search_queries:
+            # Queries restored from a checkpoint; no need to ask the LLM again
+            queries = list(focus_area.search_queries)
+        else:
+            queries = self.formulate_search_queries(focus_area)
+            focus_area.search_queries.extend(queries)
+            for query in queries:
+                self.store.add_query(focus_area.area, query)
+
+        # Fan-out queries travel together so their results are merged before selection
+        if self.queries_per_focus > 1:
+            return [queries]
+        return [[query] for query in queries]
+
+    def _stage_search(self, focus_area: ResearchFocus, queries: List[str]) -> List[Tuple[str, List[Dict]]]:
+        """Pipeline stage: search queries -> merged search results"""
+        print(f"\nSearching: {' | '.join(queries)}")
+        self._emit('searching', focus_area=focus_area.area, queries=queries)
+        if len(queries) == 1:
+            results = self.search_engine.perform_search(queries[0], time_range='none')
+        else:
+            results = self.search_engine.perform_searches(queries, time_range='none')
+        return [(' '.join(queries), results)] if results else []
+
+    def _stage_select(self, focus_area: ResearchFocus, payload: Tuple[str, List[Dict]]) -> List[str]:
+        """Pipeline stage: search results -> URLs not yet claimed by another worker"""
+        query, results = payload
+        selected_urls = self.search_engine.select_relevant_pages(
+            results, query, seen_urls=self.searched_urls, focus=focus_area.area,
+            remaining_pages=self._remaining_page_budget(focus_area)
+        )
+        with self._url_lock:
+            new_urls = [url for url in selected_urls
+                        if url not in self.searched_urls and url not in self._claimed_urls]
+            self._claimed_urls.update(new_urls)
+        return new_urls
+
+    def _stage_scrape(self, focus_area: ResearchFocus, url: str) -> List[Tuple[str, str]]:
+        """Pipeline stage: URL -> scraped content"""
+        print(f"\n⚙️ Scraping: {url}")
+        try:
+            scraped_content = self.search_engine.scrape_content([url])
+        except BaseException:
+            self._release_claim(url)
+            raise
+        if not scraped_content:
+            # A failed fetch still spent budget, so it counts as a fetch with no yield
+            self.yield_tracker.record(focus_area.area, 0)
+            self._release_claim(url)
+            return []
+        return list(scraped_content.items())
+
+    def _release_claim(self, url: str):
+        """Let a URL whose scrape failed be selected again, e.g. after a transient fetch error"""
+        with self._url_lock:
+            self._claimed_urls.discard(url)
+
+    def _stage_write(self, focus_area: ResearchFocus, payload: Tuple[str, str]) -> None:
+        """Pipeline stage: write scraped content to the session document"""
+        url, content = payload
+        new_tokens = self.add_to_document(content, url, focus_area.area) if url not in self.searched_urls else 0
+        self.yield_tracker.record(focus_area.area, new_tokens)
+
+        if self.check_document_size():
+            self._document_full.set()
+            self.pipeline.stop()
+
+        self._maybe_checkpoint()
+
+    def _remaining_page_budget(self, focus_area: ResearchFocus) -> Optional[int]:
+        """This area's share of the pages the budget can still pay for, if the budget is limited"""
+        open_areas = list(self._active_areas) + self.focus_scheduler.snapshot()
+        return self.budget_scheduler.page_allowance(focus_area, open_areas)
+
+    def _on_focus_complete(self, focus_area: ResearchFocus):
+        """Called by the pipeline once all work for a focus area has drained"""
+        with self._active_lock:
+            if focus_area in self._active_areas:
+                self._active_areas.remove(focus_area)
+        requeued = self.focus_scheduler.requeue(focus_area)
+        if requeued:
+            print(f"\nQueued another pass over: {focus_area.area}")
+        else:
+            self.completed_areas.add(focus_area.area)
+        self._emit('focus_area_finished', area=focus_area.area, requeued=requeued,
+                   sources=self.store.source_count() if self.store else 0,
+                   budget=self.budget_scheduler.report())
+        self._maybe_checkpoint(force=True)
+        self.focus_scheduler.notify()
+
+    def _generate_focus_areas(self, on_area: Optional[Callable[[ResearchFocus], None]] = None) -> Optional[List[ResearchFocus]]:
+        """
+        Run strategic analysis for a new cycle of focus areas.
 
-                print(f"\nGenerated {len(focus_areas)} research areas:")
-                for i, focus in enumerate(focus_areas, 1):
-                    print(f"\nArea {i}: {focus.area}")
-                    print(f"Priority: {focus.priority}")
+        With on_area, each novel area is handed over as soon as the model has written it, so
+        research on it starts while the remaining areas are still being generated.
+        """
+        print("\nAnalyzing research progress...")
+
+        offered: Set[str] = set()
+        accepted: List[ResearchFocus] = []
+
+        def accept(focus: ResearchFocus):
+            offered.add(focus.area)
+            if self.focus_history.filter([focus]):
+                self.focus_history.add([focus.area])
+                accepted.append(focus)
+                on_area(focus)
+
+        # Generate focus areas
+        print("\nGenerating research focus areas...")
+        analysis_result = self.strategic_parser.strategic_analysis(
+            self.original_query,
+            covered_areas=self.focus_history.covered_areas(),
+            on_area=accept if on_area else None
+        )
 
-                # Process each focus area in priority order
-                for focus_area in focus_areas:
-                    if self.should_terminate.is_set():
-                        break
+        if not analysis_result and not accepted:
+            print("\nFailed to generate analysis result. Retrying...")
+            return None
 
-                    # Check if research is paused
-                    while self.research_paused and not self.should_terminate.is_set():
-                        time.sleep(1)
+        focus_areas = analysis_result.focus_areas if analysis_result else []
+        if not focus_areas and not accepted:
+            print("\nNo valid focus areas generated. Retrying...")
+            return None
 
-                    if self.should_terminate.is_set():
-                        break
+        # Areas that were not streamed (or without on_area, all of them) are filtered as a batch
+        novel_areas = self.focus_history.filter([focus for focus in focus_areas if focus.area not in offered])
+        if not novel_areas and not accepted:
+            self._stale_generations += 1
+            if self._stale_generations < 3:
+                print("\nAll generated areas were already covered. Retrying...")
+                return None
+            # The model keeps returning covered ground; settle for the least similar area
+            focus = min(focus_areas, key=lambda f: self.focus_history.similarity(f.area)[0])
+            focus.novelty = round(1.0 - min(1.0, self.focus_history.similarity(focus.area)[0]), 3)
+            novel_areas = [focus]
+        self._stale_generations = 0
+        self.focus_history.add([focus.area for focus in novel_areas])
+        if on_area:
+            for focus in novel_areas:
+                on_area(focus)
+        focus_areas = accepted + novel_areas
+
+        print(f"\nGenerated {len(focus_areas)} research areas:")
+        for i, focus in enumerate(focus_areas, 1):
+            print(f"\nArea {i}: {focus.area}")
+            print(f"Priority: {focus.priority}")
+        return focus_areas
+
+    def _queue_focus_area(self, focus: ResearchFocus):
+        """Queue a newly generated focus area"""
+        self.focus_scheduler.push(focus)
+        self._emit('focus_area_queued', area=focus.area, priority=focus.priority)
+
+    def _start_focus_area(self, focus: ResearchFocus):
+        """Submit a queued focus area to the running pipeline"""
+        with self._active_lock:
+            self._active_areas.append(focus)
+        self.pipeline.submit(focus)
+
+    def _prefetch_focus_areas(self):
+        """
+        Generate new focus areas in the background while the queue still holds work.
 
-                    self.current_focus = focus_area
-                    print(f"\nInvestigating: {focus_area.area}")
+        Areas enter the queue one by one as the model writes them. After a failed generation
+        the next attempt waits a little, unless there is nothing else left to research.
+        """
+        if self._generation_thread and self._generation_thread.is_alive():
+            return
+        idle = not len(self.focus_scheduler) and not self._active_areas
+        if not idle and time.time() < self._next_generation:
+            return
 
-                    queries = self.formulate_search_queries(focus_area)
-                    if not queries:
-                        continue
+        def generate():
+            try:
+                if self._generate_focus_areas(on_area=self._queue_focus_area):
+                    self.cycle += 1
+                    self._maybe_checkpoint(force=True)
+                else:
+                    self._next_generation = time.time() + 10
+            except Cancelled:
+                pass
+            except Exception as e:
+                logger.error(f"Error generating focus areas: {str(e)}")
+                self._next_generation = time.time() + 10
+            finally:
+                self.focus_scheduler.notify()
 
-                    for query in queries:
-                        if self.should_terminate.is_set():
-                            break
+        self._generation_thread = threading.Thread(target=generate, name="focus-generation", daemon=True)
+        self._generation_thread.start()
 
-                        # Check if research is paused
-                        while self.research_paused and not self.should_terminate.is_set():
-                            time.sleep(1)
+    def _research_loop(self):
+        """
+        Main research loop: keep the pipeline fed with the best queued focus areas.
 
-                        if self.should_terminate.is_set():
-                            break
+        Areas persist in the scheduler across generation rounds, and a new round is generated
+        in the background as soon as the queue runs low rather than once it is empty.
+        """
+        self.is_running = True
+        try:
+            self.research_started.set()
+            self.pipeline = self._build_pipeline()
+            self.budget_scheduler.start()
 
-                        try:
-                            print(f"\nSearching: {query}")
-                            results = self.search_engine.perform_search(query, time_range='none')
+            if self._resume_focus_areas:
+                print(f"\nResuming {len(self._resume_focus_areas)} unfinished research areas...")
+                self.focus_scheduler.extend(self._resume_focus_areas)
+                self._resume_focus_areas = []
 
-                            if results:
-                                # self.search_engine.display_search_results(results)
-                                selected_urls = self.search_engine.select_relevant_pages(results, query)
+            while not self.should_terminate.is_set() and not self.shutdown_event.is_set():
+                # Check if research is paused
+                if self.research_paused:
+                    self.pause_gate.wait_while_paused(self.should_terminate)
+                    continue
 
-                                if selected_urls:
-                                    print("\n⚙️ Scraping selected pages...")
-                                    scraped_content = self.search_engine.scrape_content(selected_urls)
-                                    if scraped_content:
-                                        for url, content in scraped_content.items():
-                                            if url not in self.searched_urls:
-                                                self.add_to_document(content, url, focus_area.area)
+                reason = self.budget_scheduler.exhausted()
+                if reason or self._document_full.is_set():
+                    self.budget_exhausted = reason or 'document_tokens'
+                    print(f"\nResearch budget exhausted ({self.budget_exhausted.replace('_', ' ')}). Finalizing research.")
+                    self._emit('budget_exhausted', resource=self.budget_exhausted, budget=self.budget_scheduler.report())
+                    return
 
-                        except Exception as e:
-                            print(f"Error during search: {str(e)}")
+                if self.focus_scheduler.needs_areas():
+                    self._prefetch_focus_areas()
 
-                    if self.check_document_size():
-                        print("\nDocument size limit reached. Finalizing research.")
-                        return
+                while len(self._active_areas) < self.max_active_areas:
+                    focus = self.focus_scheduler.pop()
+                    if focus is None:
+                        break
+                    self._start_focus_area(focus)
 
-                # After processing all areas, cycle back to generate new ones
-                print("\nAll current focus areas investigated. Generating new areas...")
+                # Woken by new areas, finished areas and finished generation rounds
+                self.focus_scheduler.wait(timeout=0.5)
 
         except Exception as e:
             print(f"Error in research process: {str(e)}")
         finally:
+            # Cancel the research calls and fetches still in progress and wait for every worker
+            # to exit, so nothing writes to the store while the research is summarized
+            self.should_terminate.set()
+            self.focus_scheduler.notify()
+            if self.pipeline:
+                self.pipeline.stop()
+                self.pipeline.join(timeout=None)
+            if self._generation_thread:
+                self._generation_thread.join()
             self.is_running = False
 
     def start_research(self, topic: str):
@@ -516,62 +893,190 @@ Do not provide any additional information or explanation, note that the time ran
         try:
             self.original_query = topic
             self._initialize_document()
+            self.checkpoint_path = checkpoint_path(self.document_path)
+            self.rolling_summary.start(topic)
 
             print(f"Starting research on: {topic}")
-            print(f"Session document: {self.document_path}")
-            print("\nCommands available during research:")
-            print("'s' = Show status")
-            print("'f' = Show current focus")
-            print("'p' = Pause and assess the research progress")  # New command
-            print("'q' = Quit research\n")
-
-            # Reset events
-            self.should_terminate.clear()
-            self.research_started.clear()
-            self.research_paused = False  # Ensure research is not paused at the start
-            self.awaiting_user_decision = False
-
-            # Start research thread
-            self.research_thread = threading.Thread(target=self._research_loop, daemon=True)
-            self.research_thread.start()
-
-            # Wait for research to actually start
-            if not self.research_started.wait(timeout=10):
-                print("Error: Research failed to start within timeout period")
-                self.should_terminate.set()
-                return
-
-            while not self.should_terminate.is_set():
-                cmd = input("Enter command: ")
-                if cmd is None or self.shutdown_event.is_set():
-                    if self.should_terminate.is_set() and not self.research_complete:
-                        print("\nGenerating research summary... please wait...")
-                        summary = self.terminate_research()
-                        print("\nFinal Research Summary:")
-                        print(summary)
-                    break
-                if cmd:
-                    self._handle_command(cmd)
+            self._run_interactive()
 
         except Exception as e:
             logger.error(f"Error in research process: {str(e)}")
         finally:
             self._cleanup()
 
+    def resume_research(self, session: str):
+        """Resume an interrupted session from its store and latest checkpoint"""
+        try:
+            self.document_path, store_path, self.checkpoint_path = find_session(session)
+            self.store = SessionStore(store_path)
+            self.original_query = self.store.get_meta('topic')
+            self._restore_checkpoint(load_checkpoint(self.checkpoint_path) or {}, store_path)
+            self.rolling_summary.start(self.original_query)
+
+            # The document is a view of the store, so re-export it in case the crash cut it short
+            self.store.export_text(self.document_path)
+
+            print(f"Resuming research on: {self.original_query}")
+            print(f"Sources already collected: {self.store.source_count()}")
+            self._run_interactive()
+
+        except Exception as e:
+            logger.error(f"Error resuming research: {str(e)}")
+            print(f"Error resuming research: {str(e)}")
+        finally:
+            self._cleanup()
+
+    def _run_interactive(self):
+        """Run the research thread while reading commands from the terminal"""
+        print(f"Session document: {self.document_path}")
+        print("\nCommands available during research:")
+        print("'s' = Show status")
+        print("'f' = Show current focus")
+        print("'p' = Pause and assess the research progress")  # New command
+        print("'q' = Quit research\n")
+
+        # Reset events
+        self.should_terminate.clear()
+        self.research_started.clear()
+        self.research_paused = False  # Ensure research is not paused at the start
+        self.awaiting_user_decision = False
+
+        # Start research thread
+        self.research_thread = threading.Thread(target=self._research_until_done, daemon=True)
+        self.research_thread.start()
+
+        # Wait for research to actually start
+        if not self.research_started.wait(timeout=10):
+            print("Error: Research failed to start within timeout period")
+            self.should_terminate.set()
+            return
+
+        while not self.should_terminate.is_set():
+            cmd = input("Enter command: ")
+            if cmd is None or self.shutdown_event.is_set():
+                if self.should_terminate.is_set() and not self.research_complete:
+                    print("\nGenerating research summary... please wait...")
+                    summary = self.terminate_research()
+                    print("\nFinal Research Summary:")
+                    print(summary)
+                break
+            if cmd:
+                self._handle_command(cmd)
+
+        # After the budget ran out the research thread may still be writing the summary
+        self.research_thread.join()
+
+    def _research_until_done(self):
+        """Research thread for interactive sessions: summarize on its own if the budget runs out"""
+        self._research_loop()
+        if self.budget_exhausted and not self.research_complete:
+            print("\nGenerating research summary... please wait...")
+            summary = self.terminate_research()
+            print("\nFinal Research Summary:")
+            print(summary)
+            self.should_terminate.set()
+            print("\nPress Enter to continue.")
+
+    def run_budgeted(self, topic: str, document_path: Optional[str] = None) -> str:
+        """
+        Research a topic without a terminal until the budget runs out, then summarize.
+
+        Args:
+            topic (str): The research query.
+            document_path (str): Where to write the session document; its store goes next to it.
+                By default the next numbered research_session file in the working directory.
+
+        Returns:
+            str: The formatted research summary.
+        """
+        if not self.budget.is_limited():
+            raise ValueError("An unattended research run needs at least one budget limit")
+        try:
+            self.original_query = topic
+            if document_path:
+                self.document_path = document_path
+                self._open_store(os.path.splitext(document_path)[0] + ".db", "")
+            else:
+                self._initialize_document()
+            self.checkpoint_path = checkpoint_path(self.document_path)
+            self.rolling_summary.start(topic)
+            print(f"Starting research on: {topic}")
+            self._emit('started', topic=topic, document=self.document_path)
+            self._research_loop()
+            return self.terminate_research()
+        finally:
+            self._cleanup()
+
+    def _checkpoint_state(self) -> Dict:
+        """Everything needed to continue this session without repeating completed work"""
+        return {
+            'original_query': self.original_query,
+            'cycle': self.cycle,
+            'searched_urls': sorted(self.searched_urls),
+            'completed_areas': sorted(self.completed_areas),
+            # Areas in the pipeline and the queue, in the order they should be resumed
+            'pending_focus_areas': [
+                asdict(focus) for focus in list(self._active_areas) + self.focus_scheduler.snapshot()
+            ],
+            'rolling_summary': self.rolling_summary.get_state(),
+            'research_summary': self.research_summary,
+            'saved': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+    def _maybe_checkpoint(self, force: bool = False):
+        """Save a checkpoint if forced or if the checkpoint interval has elapsed"""
+        if not self.checkpoint_path:
+            return
+        if not force and time.time() - self._last_checkpoint < self.checkpoint_interval:
+            return
+        try:
+            with self._checkpoint_lock:
+                save_checkpoint(self.checkpoint_path, self._checkpoint_state())
+                self._last_checkpoint = time.time()
+        except Exception as e:
+            logger.error(f"Error saving checkpoint: {str(e)}")
+
+    def _restore_checkpoint(self, state: Dict, store_path: Optional[str] = None):
+        """Rebuild in-memory state from a checkpoint and the session store"""
+        self.cycle = state.get('cycle', 0)
+        self.completed_areas = set(state.get('completed_areas', []))
+        self.research_summary = state.get('research_summary', "")
+
+        # Everything in the store was fetched already; the checkpoint adds skipped duplicates
+        self.searched_urls = self.store.source_urls() | set(state.get('searched_urls', []))
+        self._resume_focus_areas = [ResearchFocus(**focus) for focus in state.get('pending_focus_areas', [])]
+        self.rolling_summary.restore_state(state.get('rolling_summary', {}))
+        self.focus_history.add([stats['area'] for stats in self.store.focus_area_stats()])
+        self.focus_history.add([focus.area for focus in self._resume_focus_areas])
+
+        # Rebuild the retrieval indexes from stored chunks instead of re-fetching anything.
+        # The semantic index reopens its vectors file; only a session without one is re-embedded
+        self._index_document()
+        restored = self._use_session_vectors(store_path, resume=True) if store_path else 0
+        if self.semantic_index is not None and not restored:
+            for text, source_url, focus_area in self.store.iter_chunks():
+                self.semantic_index.add(text, source_url, focus_area or "")
+
+    def _cleanup(self):
+        """Stop background work and leave a final checkpoint behind"""
+        self.should_terminate.set()
+        if self.pipeline:
+            self.pipeline.stop()
+        self._maybe_checkpoint(force=True)
+        self.rolling_summary.stop()
+
     def check_document_size(self) -> bool:
-        """Check if document size is approaching context limit"""
+        """Check if the document has reached the optional max_document_tokens limit"""
+        if not self.max_document_tokens:
+            return False
         try:
-            with open(self.document_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            estimated_tokens = len(content.split()) * 1.3
-            max_tokens = self.llm_wrapper.llm_config.get('n_ctx', 2048)
-            current_ratio = estimated_tokens / max_tokens
+            current_ratio = self.store.total_tokens() / self.max_document_tokens
 
-            if current_ratio > 0.8:
-                logger.warning(f"Document size at {current_ratio*100:.1f}% of context limit")
-                print(f"Warning: Document size at {current_ratio*100:.1f}% of context limit")
+            if current_ratio > 0.9:
+                logger.warning(f"Document size at {current_ratio*100:.1f}% of limit")
+                print(f"Warning: Document size at {current_ratio*100:.1f}% of limit")
 
-            return current_ratio > 0.9
+            return current_ratio >= 1.0
         except Exception as e:
             return True
 
@@ -579,35 +1084,31 @@ Do not provide any additional information or explanation, note that the time ran
         """Pause the research and assess if the collected content is sufficient."""
         print("\nPausing research for assessment...")
 
-        # Read the current research content
-        if not os.path.exists(self.document_path):
+        # Prefer the rolling per-area summaries over re-sending the full document; either way the
+        # content is fitted to the same budget as a summarizer prompt
+        budget = min(self.summarizer.chunk_tokens, content_budget(
+            int(self.llm_wrapper.llm_config.get('n_ctx', 2048)), ASSESSMENT_PROMPT, max_output_tokens=200
+        ))
+        partial_summaries = self.rolling_summary.flush(timeout=60)
+        if partial_summaries:
+            builder = PromptBuilder(budget, per_source_tokens=max(budget // len(partial_summaries), 100),
+                                    section_format="Research Focus: {source}\n{text}", separator="\n\n")
+            builder.extend((area, summary) for area, summary in partial_summaries.items())
+        elif not self.store or not self.store.source_count():
             print("No research data found to assess.")
             return
-
-        with open(self.document_path, 'r', encoding='utf-8') as f:
-            content = f.read().strip()
+        else:
+            builder = PromptBuilder(budget, per_source_tokens=max(budget // self.store.source_count(), 100))
+            builder.extend((url, content) for _, url, content in self.store.iter_sources())
+        content = builder.build().strip()
 
         if not content:
             print("No research data was collected to assess.")
             return
 
-        # Prepare the prompt for the AI assessment
-        assessment_prompt = f"""
-Based on the following research content, please assess whether the original query "{self.original_query}" can be answered sufficiently with the collected information.
-
-Research Content:
-{content}
-
-Instructions:
-1. If the research content provides enough information to answer the original query in detail, respond with: "The research is sufficient to answer the query."
-2. If not, respond with: "The research is insufficient and it would be advisable to continue gathering information."
-3. Do not provide any additional information or details.
-
-Assessment:
-"""
-
-        # Generate the assessment
-        assessment = self.llm_wrapper.generate(assessment_prompt, {"max_tokens": 200})
+        assessment = self.llm_wrapper.generate(
+            ASSESSMENT_PROMPT.format(original_query=self.original_query, content=content), {"max_tokens": 200}
+        )
 
         # Display the assessment
         print("\nAssessment Result:")
@@ -622,51 +1123,128 @@ Assessment:
         return f"""
 Research Progress:
 - Original Query: {self.original_query}
-- Sources analyzed: {len(self.searched_urls)}
+- Sources analyzed: {self.store.source_count() if self.store else 0}
+- Fetch yield: {self.yield_tracker.report()}
+- Page knowledge base: {self.search_engine.knowledge_base.report()}
+- Focus areas: {len(self._active_areas)} active, {len(self.focus_scheduler)} queued
+- Budget: {self.budget_scheduler.report()}
 - Status: {'Active' if self.is_running else 'Stopped'}
 - Current focus: {self.current_focus.area if self.current_focus else 'Initializing'}
 """
 
+    def get_status(self) -> Dict:
+        """Current research progress as a dict, for front ends other than the terminal"""
+        with self._active_lock:
+            active = [focus.area for focus in self._active_areas]
+        return {
+            'query': self.original_query,
+            'document': self.document_path,
+            'running': self.is_running,
+            'paused': self.research_paused,
+            'complete': self.research_complete,
+            'budget_exhausted': self.budget_exhausted,
+            'sources': self.store.source_count() if self.store else 0,
+            'document_tokens': self.store.total_tokens() if self.store else 0,
+            'pages_fetched': self.yield_tracker.fetches,
+            'llm_tokens': self.llm_wrapper.usage.total_tokens,
+            'active_areas': active,
+            'queued_areas': [focus.area for focus in self.focus_scheduler.snapshot()],
+            'completed_areas': sorted(self.completed_areas),
+            'budget': self.budget_scheduler.report(),
+        }
+
+    @property
+    def research_paused(self) -> bool:
+        return self.pause_gate.paused
+
+    @research_paused.setter
+    def research_paused(self, paused: bool):
+        if paused:
+            self.pause_gate.pause()
+        else:
+            self.pause_gate.resume()
+
+    def pause(self):
+        """Hold the pipeline; calls already in progress finish, nothing new starts"""
+        self.research_paused = True
+        self._emit('paused')
+
+    def unpause(self):
+        self.research_paused = False
+        self.awaiting_user_decision = False
+        self._emit('resumed')
+
+    def stop(self):
+        """Stop researching and cancel the work in progress; the caller summarizes what was collected"""
+        self.should_terminate.set()
+        self.focus_scheduler.notify()
+        self._emit('stopping')
+
+    def ask(self, question: str) -> str:
+        """Answer a question about the finished research from its findings and summary"""
+        if not self.research_complete:
+            raise RuntimeError("Research has not been summarized yet")
+        return self._generate_conversation_response(question)
+
+    def _handle_command(self, cmd: str):
+        """Terminal front end for the control methods above"""
+        cmd = cmd.strip().lower()
+        if cmd == 's':
+            print(self.get_progress())
+        elif cmd == 'f':
+            print(f"\nCurrent focus: {self.current_focus.area if self.current_focus else 'Initializing'}")
+        elif cmd == 'p':
+            self.pause()
+            self.pause_and_assess()
+        elif cmd == 'c':
+            if self.research_paused or self.awaiting_user_decision:
+                self.unpause()
+                print("\nContinuing research...")
+        elif cmd == 'q':
+            self.stop()
+            self.research_thread.join(timeout=30)
+            if not self.research_complete:
+                print("\nGenerating research summary... please wait...")
+                summary = self.terminate_research()
+                print("\nFinal Research Summary:")
+                print(summary)
+        else:
+            print(f"Unknown command '{cmd}'. Use 's', 'f', 'p' or 'q'.")
+
     def terminate_research(self) -> str:
 
         print("Initiating research termination...")
+        self._emit('summarizing', sources=self.store.source_count() if self.store else 0)
 
-
-        if not os.path.exists(self.document_path):
+        if not self.store or not self.store.source_count():
             self.summary_ready = True
-            indicator_thread.join(timeout=1.0)
             self._cleanup()
             return "No research data found to summarize."
 
-        with open(self.document_path, 'r', encoding='utf-8') as f:
-            content = f.read().strip()
-            self.research_content = content  # Store for conversation mode
-
-
-        # Generate summary using LLM
-        summary_prompt = f"""
-        Analyze the following content to provide a comprehensive research summary and a response to the user's original query "{self.original_query}" ensuring that you conclusively answer the query in detail:
-
-        Research Content:
-        {content}
-
-        Important Instructions:
-        > Summarize the research findings that are relevant to the Original topic/question: "{self.original_query}"
-        > Ensure that in your summary you directly answer the original question/topic conclusively to the best of your ability in detail.
-        > Read the original topic/question again "{self.original_query}" and abide by any additional instructions that it contains, exactly as instructed in your summary otherwise provide it normally should it not have any specific instructions
-
-        Summary:
-        """
-
-        summary = self.llm_wrapper.generate(summary_prompt, max_tokens=4000)
+        # Merge the rolling per-area summaries; only fall back to summarizing the stored sources
+        # when none were produced during research
+        partial_summaries = self.rolling_summary.flush()
+        # Findings whose rolling update failed are merged as they are
+        pending = self.rolling_summary.pending_findings()
+        self.rolling_summary.stop()
+        if partial_summaries:
+            notes = [f"Research Focus: {area}\n{notes}" for area, notes in partial_summaries.items()]
+            notes += [f"Research Focus: {area}\n{finding}"
+                      for area, findings in pending.items() for finding in findings]
+            summary = self.summarizer.summarize_notes(notes, self.original_query)
+        else:
+            summary = self.summarizer.summarize_sections(
+                (render_section(area or "", url, content) for area, url, content in self.store.iter_sources()),
+                self.original_query
+            )
 
         # Signal that summary is complete to stop the progress indicator
         self.summary_ready = True
-        indicator_thread.join(timeout=1.0)
 
         # Store summary and mark research as complete
         self.research_summary = summary
         self.research_complete = True
+        self._emit('summary', summary=summary)
 
         # Format summary
         formatted_summary = f"""
@@ -690,53 +1268,70 @@ Research Progress:
 
         return formatted_summary
 
+    def _index_document(self):
+        """Rebuild the findings index from the session store"""
+        if not self.store:
+            return
+        for text, source_url, focus_area in self.store.iter_chunks():
+            self.findings_index.add(text, source_url, focus_area or "")
+
+    def _retrieve_chunks(self, user_query: str) -> list:
+        """Top-k chunks for a question, fusing BM25 and semantic rankings when both exist"""
+        rankings = [self.findings_index.search(user_query, k=self.retrieval_top_k)]
+        if self.semantic_index is not None and len(self.semantic_index):
+            try:
+                rankings.append(self.semantic_index.search(user_query, k=self.retrieval_top_k))
+            except Exception as e:
+                logger.warning(f"Semantic retrieval failed: {str(e)}")
+
+        # Reciprocal rank fusion, keyed on the chunk text since the indexes number chunks separately
+        fused: Dict[str, float] = {}
+        chunks = {}
+        for ranking in rankings:
+            for rank, (chunk, _score) in enumerate(ranking):
+                fused[chunk.text] = fused.get(chunk.text, 0.0) + 1.0 / (60 + rank)
+                chunks.setdefault(chunk.text, chunk)
+        best = sorted(fused, key=fused.get, reverse=True)[:self.retrieval_top_k]
+        return [chunks[text] for text in best]
+
+    def _retrieve_context(self, user_query: str, max_tokens: int = 1500) -> str:
+        """Format the chunks most relevant to the question, with their sources, within max_tokens"""
+        results = self._retrieve_chunks(user_query)
+        if not results:
+            return "No relevant research content found."
+        builder = PromptBuilder(
+            max_tokens, per_source_tokens=max(max_tokens // 2, 200),
+            section_format="[{index}] Source: {source}\n{text}", separator="\n\n"
+        )
+        # Chunks arrive best first; the priority keeps that order and evicts the weakest first
+        for rank, chunk in enumerate(results):
+            builder.add(chunk.text, chunk.source_url, priority=-rank, normalize=False)
+        return builder.build()
+
     def _generate_conversation_response(self, user_query: str) -> str:
 
-        # First verify we have content
-        if not self.research_content and not self.research_summary:
-            # Try to reload from file if available
+        # First verify we have indexed content
+        if not len(self.findings_index):
+            # Try to rebuild the index from file if available
             try:
-                if os.path.exists(self.document_path):
-                    with open(self.document_path, 'r', encoding='utf-8') as f:
-                        self.research_content = f.read().strip()
+                self._index_document()
             except Exception as e:
-                logger.error(f"Failed to reload research content: {str(e)}")
+                logger.error(f"Failed to index research content: {str(e)}")
 
-        # Prepare context, ensuring we have content
+        # Split the context budget between the summary and the chunks relevant to this question
+        budget = content_budget(
+            int(self.llm_wrapper.llm_config.get('n_ctx', 2048)), CONVERSATION_PROMPT, max_output_tokens=1000
+        )
+        summary = truncate_to_tokens(self.research_summary, budget // 3) if self.research_summary else 'No summary available'
         context = f"""
 Research Content:
-{self.research_content}
+{self._retrieve_context(user_query, budget - estimate_tokens(summary))}
 
 Research Summary:
-{self.research_summary if self.research_summary else 'No summary available'}
+{summary}
 """
 
-        prompt = f"""
-Based on the following research content and summary, please answer this question:
-
-{context}
-
-Question: {user_query}
-
-you have 2 sets of instructions the applied set and the unapplied set, the applied set should be followed if the question is directly relating to the research content whereas anything else other then direct questions about the content of the research will result in you instead following the unapplied ruleset
-
-Applied:
-
-Instructions:
-1. Answer based ONLY on the research content provided above if asked a question about your research or that content.
-2. If the information requested isn't in the research, clearly state that it isn't in the content you gathered.
-3. Be direct and specific in your response, DO NOT directly cite research unless specifically asked to, be concise and give direct answers to questions based on the research, unless instructed otherwise.
-
-Unapplied:
-
-Instructions:
-
-1. Do not make up anything that isn't actually true.
-2. Respond directly to the user's question in an honest and thoughtful manner.
-3. disregard rules in the applied set for queries not DIRECTLY related to the research, including queries about the research process or what you remember about the research should result in the unapplied ruleset being used.
-
-Answer:
-"""
+        prompt = CONVERSATION_PROMPT.format(context=context, user_query=user_query)
 
         response = self.llm_wrapper.generate(
             prompt,
@@ -0,0 +1,186 @@
+import itertools
+import logging
+import threading
+from dataclasses import dataclass, field
+from queue import PriorityQueue, Empty, Full
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .cancellation import Cancelled, CancellationToken, PauseGate
+
+logger = logging.getLogger(__name__)
+
+# Default number of workers per stage. Scraping is dominated by network waits so it gets the
+# most workers; writing appends to a single document and must stay serial.
+DEFAULT_STAGE_WORKERS = {
+    'formulate': 2,
+    'search': 2,
+    'select': 2,
+    'scrape': 4,
+    'write': 1,
+}
+
+@dataclass(order=True)
+class WorkItem:
+    """A unit of work flowing between pipeline stages, ordered by focus area priority"""
+    sort_key: tuple
+    focus: Any = field(compare=False)
+    payload: Any = field(compare=False, default=None)
+
+@dataclass
+class PipelineStage:
+    """A named stage: takes one item's payload and returns the payloads for the next stage"""
+    name: str
+    handler: Callable[[Any, Any], Optional[Iterable[Any]]]
+    workers: int = 1
+
+class ResearchPipeline:
+    """
+    Runs research work through a chain of stages connected by bounded priority queues.
+
+    Every stage has its own worker threads, so while one focus area is being scraped the next
+    one can already be searched and a third formulated. Items are ordered by the priority of
+    the focus area they belong to (highest first), then by arrival order. Bounded queues give
+    back-pressure: a fast stage blocks instead of piling up work for a slow one.
+
+    When stop_event is a CancellationToken that the handlers also pass to their LLM calls and
+    fetches, setting it cancels work in progress instead of waiting for it to finish.
+    """
+
+    def __init__(self, stages: List[PipelineStage], stop_event: threading.Event,
+                 pause_gate: Optional[PauseGate] = None, queue_size: int = 8,
+                 on_focus_complete: Optional[Callable[[Any], None]] = None):
+        self.stages = stages
+        self.stop_event = stop_event
+        self._stopped = CancellationToken()
+        self.pause_gate = pause_gate or PauseGate()
+        self.queues = [PriorityQueue(maxsize=queue_size) for _ in stages]
+        self._sequence = itertools.count()
+        self.on_focus_complete = on_focus_complete
+        self._in_flight = 0
+        self._focus_in_flight: Dict[int, int] = {}
+        self._in_flight_lock = threading.Condition()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        """Start the worker threads for every stage"""
+        if self._threads:
+            return
+        for index, stage in enumerate(self.stages):
+            for worker in range(max(1, stage.workers)):
+                thread = threading.Thread(
+                    target=self._worker,
+                    args=(index,),
+                    name=f"pipeline-{stage.name}-{worker}",
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self):
+        """Stop the pipeline without signalling the owner's stop event"""
+        self._stopped.set()
+
+    def is_stopped(self) -> bool:
+        return self._stopped.is_set() or self.stop_event.is_set()
+
+    def join(self, timeout: Optional[float] = 5.0):
+        """Wait for worker threads to exit after the pipeline has been stopped; None waits for good"""
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def run_cycle(self, focus_areas: List[Any]) -> bool:
+        """
+        Feed focus areas into the first stage and block until all resulting work has drained.
+
+        Returns:
+            bool: True if the cycle completed, False if it was interrupted by the stop event.
+        """
+        for focus in focus_areas:
+            if not self.submit(focus):
+                return False
+        return self.wait()
+
+    def submit(self, focus: Any) -> bool:
+        """Feed one focus area into the first stage; areas may arrive while earlier ones are running"""
+        self.start()
+        return self._put(0, focus, focus)
+
+    def wait(self) -> bool:
+        """
+        Block until all submitted work has drained.
+
+        Returns:
+            bool: True if the work completed, False if it was interrupted by the stop event.
+        """
+        with self._in_flight_lock:
+            while self._in_flight > 0:
+                if self.is_stopped():
+                    return False
+                self._in_flight_lock.wait(timeout=0.5)
+        return not self.is_stopped()
+
+    def stats(self) -> Dict[str, int]:
+        """Current queue depth of every stage"""
+        return {stage.name: queue.qsize() for stage, queue in zip(self.stages, self.queues)}
+
+    def _sort_key(self, focus: Any) -> tuple:
+        return (-getattr(focus, 'priority', 0), next(self._sequence))
+
+    def _put(self, index: int, focus: Any, payload: Any) -> bool:
+        """Put an item on a stage queue, blocking while it is full unless the pipeline stops"""
+        item = WorkItem(self._sort_key(focus), focus, payload)
+        with self._in_flight_lock:
+            self._in_flight += 1
+            self._focus_in_flight[id(focus)] = self._focus_in_flight.get(id(focus), 0) + 1
+        while not self.is_stopped():
+            try:
+                self.queues[index].put(item, timeout=0.5)
+                return True
+            except Full:
+                continue
+        self._task_done(focus)
+        return False
+
+    def _task_done(self, focus: Any):
+        with self._in_flight_lock:
+            self._in_flight -= 1
+            remaining = self._focus_in_flight.get(id(focus), 1) - 1
+            if remaining > 0:
+                self._focus_in_flight[id(focus)] = remaining
+            else:
+                self._focus_in_flight.pop(id(focus), None)
+            if self._in_flight <= 0:
+                self._in_flight_lock.notify_all()
+
+        # All work derived from this focus area has drained
+        if remaining <= 0 and self.on_focus_complete and not self.is_stopped():
+            try:
+                self.on_focus_complete(focus)
+            except Exception as e:
+                logger.error(f"Error in focus completion callback: {str(e)}")
+
+    def _worker(self, index: int):
+        stage = self.stages[index]
+        is_last = index == len(self.stages) - 1
+        while not self.is_stopped():
+            try:
+                item = self.queues[index].get(timeout=0.5)
+            except Empty:
+                continue
+
+            try:
+                if not self.pause_gate.wait_while_paused(self.stop_event, self._stopped):
+                    break
+                outputs = stage.handler(item.focus, item.payload)
+                if not is_last:
+                    for output in outputs or []:
+                        if not self._put(index + 1, item.focus, output):
+                            break
+            except Cancelled:
+                continue  # Stopped mid-stage; the loop condition sees the stop
+            except Exception as e:
+                logger.error(f"Error in pipeline stage '{stage.name}': {str(e)}", exc_info=True)
+                print(f"Error during {stage.name}: {str(e)}")
+            finally:
+                self._task_done(item.focus)
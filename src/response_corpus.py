@@ -0,0 +1,75 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+DEFAULT_CORPUS_DIR = "fixtures/parser_corpus"
+
+class ResponseRecorder:
+    """
+    Appends raw LLM responses to a JSONL corpus file, one record per distinct response and model.
+
+    Each record holds the parser kind ('analysis', 'focus_areas', 'llm_response', 'query',
+    'page_selection' or 'evaluation'), the model that produced it and the response text.
+    """
+
+    def __init__(self, path: str, model: str = ""):
+        self.path = path
+        self.model = model
+        self._lock = threading.Lock()
+        self._seen = set()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        for record in load_corpus(path) if os.path.exists(path) else []:
+            self._seen.add(self._key(record.get('model', ''), record['kind'], record['response']))
+
+    @staticmethod
+    def _key(model: str, kind: str, response: str) -> str:
+        return hashlib.sha1(f"{model}\0{kind}\0{response}".encode('utf-8')).hexdigest()
+
+    def record(self, kind: str, response: str):
+        key = self._key(self.model, kind, response)
+        with self._lock:
+            if key in self._seen:
+                return
+            self._seen.add(key)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({
+                    'kind': kind,
+                    'model': self.model,
+                    'recorded': time.strftime("%Y-%m-%d %H:%M:%S"),
+                    'response': response,
+                }) + "\n")
+
+_recorder: Optional[ResponseRecorder] = None
+
+def enable_recording(path: str, model: str = "") -> ResponseRecorder:
+    """Start recording every response that passes through the parsers"""
+    global _recorder
+    _recorder = ResponseRecorder(path, model)
+    return _recorder
+
+def record_response(kind: str, response: str):
+    """Record a response if recording is enabled; a no-op otherwise"""
+    if _recorder is not None and response:
+        try:
+            _recorder.record(kind, response)
+        except OSError:
+            pass  # Recording must never break a research session
+
+def load_corpus(path: str = DEFAULT_CORPUS_DIR) -> List[Dict]:
+    """Load records from a JSONL file, or from every .jsonl file in a directory"""
+    target = Path(path)
+    files = sorted(target.glob('*.jsonl')) if target.is_dir() else [target]
+    records = []
+    for file in files:
+        with open(file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    record = json.loads(line)
+                    record.setdefault('source', file.name)
+                    records.append(record)
+    return records
@@ -0,0 +1,239 @@
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+# All patterns are compiled once at import; parse_response scans a response line by line in one pass
+FIELD_LINE = re.compile(
+    r'^(?:[-*#>]+\s*|\d+[.)]\s*)?\**\s*'
+    r'(?P<key>decision|evaluation|reasoning|selected results?|response|'
+    r'(?:search )?query(?:\s*\d+)?|time\s*range|priority(?: level)?|importance)'
+    r'\s*\**\s*[:=]\s*\**(?P<value>.*)$',
+    re.IGNORECASE
+)
+NUMBERED_LINE = re.compile(r'^(\d+)[.)]\s*(.*)$')
+INLINE_PRIORITY = re.compile(r'\(?\b(?:priority|importance)\b\s*[:=]?\s*(\d+)\)?', re.IGNORECASE)
+NUMBER = re.compile(r'\d+')
+RESULT_NUMBER = re.compile(r'\b(?:10|[1-9])\b')
+QUERY_NOISE = re.compile(r'["\'\[\]*]')
+WHITESPACE = re.compile(r'\s+')
+JSON_OBJECT = re.compile(r'\{.*\}', re.DOTALL)
+
+TIME_RANGES = ('d', 'w', 'm', 'y', 'none')
+DEFAULT_PRIORITY = 3
+
+@dataclass
+class ParsedResponse:
+    """Every field the researcher asks the LLM for, extracted in one scan of the response"""
+    decision: Optional[str] = None
+    evaluation: Optional[str] = None
+    reasoning: Optional[str] = None
+    response: Optional[str] = None
+    selected_results: List[int] = field(default_factory=list)
+    queries: List[str] = field(default_factory=list)
+    time_range: Optional[str] = None
+    # Numbered list items with their priority, e.g. research focus areas
+    areas: List[Tuple[str, int]] = field(default_factory=list)
+
+    @property
+    def query(self) -> str:
+        return self.queries[0] if self.queries else ""
+
+    def as_dict(self) -> Dict:
+        return {
+            'decision': self.decision,
+            'evaluation': self.evaluation,
+            'reasoning': self.reasoning,
+            'response': self.response,
+            'selected_results': self.selected_results,
+            'query': self.query,
+            'queries': self.queries,
+            'time_range': self.time_range,
+            'areas': self.areas,
+        }
+
+def clean_query(query: str) -> str:
+    """Strip quotes, brackets and markup from a search query and limit its length"""
+    return WHITESPACE.sub(' ', QUERY_NOISE.sub('', query)).strip()[:100]
+
+def normalize_time_range(value: str) -> Optional[str]:
+    value = value.strip().strip('.[]()\'"').lower()
+    return value if value in TIME_RANGES else None
+
+def normalize_decision(value: str) -> Optional[str]:
+    value = value.lower()
+    if 'refine' in value:
+        return 'refine'
+    if 'answer' in value:
+        return 'answer'
+    return value.strip(' .[]*') or None
+
+def _canonical_key(key: str) -> str:
+    key = key.lower()
+    if key.startswith('selected'):
+        return 'selected_results'
+    if 'query' in key:
+        return 'query'
+    if key.startswith('time'):
+        return 'time_range'
+    if key.startswith(('priority', 'importance')):
+        return 'priority'
+    return key
+
+def _clamp_priority(value: str) -> int:
+    return max(1, min(5, int(value)))
+
+class StreamingParser:
+    """
+    Incremental form of parse_response for responses that arrive token by token.
+
+    feed() accepts text fragments of any size and processes every line as soon as it is
+    complete, so fields become available while the model is still generating. A numbered item
+    counts as complete once its priority is known or the next item starts; on_area is called at
+    that point, and on_query for every new search query line. is_complete() tells the caller
+    when everything it expects has arrived, so generation can be stopped early.
+    """
+
+    def __init__(self, expected_areas: Optional[int] = None, expected_queries: Optional[int] = None,
+                 required_fields: Tuple[str, ...] = (),
+                 on_area: Optional[Callable[[str, int], None]] = None,
+                 on_query: Optional[Callable[[str], None]] = None):
+        self.expected_areas = expected_areas
+        self.expected_queries = expected_queries
+        self.required_fields = required_fields
+        self.on_area = on_area
+        self.on_query = on_query
+        self.parsed = ParsedResponse()
+        self._buffer = ""
+        self._text_field: Optional[str] = None
+        self._area: Optional[str] = None
+        self._area_priority: Optional[int] = None
+        self._seen_queries = set()
+        self._finished = False
+
+    def feed(self, fragment: str):
+        """Add a fragment of the response and parse every line it completes"""
+        self._buffer += fragment
+        if '\n' not in fragment:
+            return
+        *lines, self._buffer = self._buffer.split('\n')
+        for line in lines:
+            self._feed_line(line)
+
+    def get_partial(self) -> ParsedResponse:
+        """Everything parsed from the complete lines received so far"""
+        return self.parsed
+
+    def is_complete(self) -> bool:
+        """Whether all expected areas, queries and required fields have been parsed"""
+        if self.expected_areas is None and self.expected_queries is None and not self.required_fields:
+            return False  # Nothing to wait for; only the end of the response completes it
+        if self.expected_areas is not None and len(self.parsed.areas) < self.expected_areas:
+            return False
+        if self.expected_queries is not None and len(self.parsed.queries) < self.expected_queries:
+            return False
+        return all(getattr(self.parsed, name) for name in self.required_fields)
+
+    def finish(self) -> ParsedResponse:
+        """Parse the trailing partial line and close the last open item"""
+        if not self._finished:
+            self._finished = True
+            if self._buffer:
+                self._feed_line(self._buffer)
+                self._buffer = ""
+            self._close_area()
+        return self.parsed
+
+    def _close_area(self):
+        if self._area:
+            priority = self._area_priority or DEFAULT_PRIORITY
+            self.parsed.areas.append((self._area, priority))
+            if self.on_area:
+                self.on_area(self._area, priority)
+        self._area = None
+        self._area_priority = None
+
+    def _feed_line(self, line: str):
+        line = line.strip()
+        if not line:
+            return
+        parsed = self.parsed
+
+        match = FIELD_LINE.match(line)
+        if match:
+            key = _canonical_key(match.group('key'))
+            value = match.group('value').strip().strip('*').strip()
+            self._text_field = None
+            if key == 'priority':
+                digits = NUMBER.search(value)
+                if digits and self._area is not None:
+                    # The priority is the last part of an item, so the item is complete
+                    self._area_priority = _clamp_priority(digits.group())
+                    self._close_area()
+            elif key == 'decision':
+                parsed.decision = normalize_decision(value)
+            elif key == 'selected_results':
+                parsed.selected_results = [int(n) for n in NUMBER.findall(value)]
+            elif key == 'query':
+                query = clean_query(value)
+                if query and query.lower() not in self._seen_queries:
+                    self._seen_queries.add(query.lower())
+                    parsed.queries.append(query)
+                    if self.on_query:
+                        self.on_query(query)
+            elif key == 'time_range':
+                parsed.time_range = normalize_time_range(value) or parsed.time_range
+            else:
+                setattr(parsed, key, value)
+                self._text_field = key
+            return
+
+        match = NUMBERED_LINE.match(line)
+        if match:
+            self._close_area()
+            self._text_field = None
+            item = match.group(2)
+            inline = INLINE_PRIORITY.search(item)
+            if inline:
+                item = item[:inline.start()] + item[inline.end():]
+            self._area = item.strip(' -:*[]') or None
+            if inline:
+                self._area_priority = _clamp_priority(inline.group(1))
+                self._close_area()
+            return
+
+        if self._text_field:
+            setattr(parsed, self._text_field, f"{getattr(parsed, self._text_field)} {line}".strip())
+
+def parse_response(text: str) -> ParsedResponse:
+    """
+    Tokenize an LLM response line by line and emit every recognized field in a single pass.
+
+    Recognized lines are 'Key: value' fields (decision, evaluation, reasoning, selected results,
+    response, search query, time range, priority) and numbered list items. A priority either
+    sits inline on an item line or on the line after it. Free text after a text field
+    continues that field.
+    """
+    parser = StreamingParser()
+    parser.feed(text)
+    return parser.finish()
+
+if __name__ == "__main__":
+    # Micro-benchmark: per-response parsing cost for the response shapes the researcher sees
+    import timeit
+
+    samples = {
+        'evaluation': "Evaluation: The content covers the main causes and recent data.\nDecision: answer",
+        'page selection': "Selected Results: [2, 5, 7]\nReasoning: Result 2 is an official report,\n"
+                          "result 5 has recent statistics and result 7 explains the methodology.",
+        'query': "Search query: global lithium supply 2024\nTime range: y",
+        'query fan-out': "\n".join(f"Search query {i}: lithium supply angle {i}" for i in range(1, 6)),
+        'strategic analysis': "\n\n".join(
+            f"{i}. Research topic number {i} about supply chains and pricing\nPriority: {6 - i}"
+            for i in range(1, 6)
+        ),
+    }
+    number = 20000
+    print(f"{'response':<20} {'chars':>6} {'us/response':>12}")
+    for name, sample in samples.items():
+        seconds = timeit.timeit(lambda: parse_response(sample), number=number)
+        print(f"{name:<20} {len(sample):>6} {seconds / number * 1e6:>12.1f}")
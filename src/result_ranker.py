@@ -0,0 +1,193 @@
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+from .retrieval import BM25Index, tokenize
+
+# Additive score adjustments by domain suffix. Reference sources get a small boost; social
+# media, video and aggregator pages rarely yield scrapeable text and get penalized.
+DEFAULT_DOMAIN_PRIORS = {
+    'wikipedia.org': 0.15,
+    '.gov': 0.15,
+    '.edu': 0.1,
+    '.int': 0.1,
+    'arxiv.org': 0.1,
+    'nature.com': 0.1,
+    'sciencedirect.com': 0.05,
+    'reuters.com': 0.05,
+    'reddit.com': -0.05,
+    'quora.com': -0.1,
+    'youtube.com': -0.3,
+    'tiktok.com': -0.3,
+    'facebook.com': -0.3,
+    'instagram.com': -0.3,
+    'pinterest.com': -0.3,
+    'twitter.com': -0.2,
+    'x.com': -0.2,
+}
+
+# File types the scraper cannot extract text from
+UNSCRAPEABLE_EXTENSIONS = ('.pdf', '.doc', '.docx', '.ppt', '.pptx', '.xls', '.xlsx', '.zip', '.mp4', '.mp3')
+
+@dataclass
+class RankedResult:
+    """A search result with its local relevance score"""
+    result: Dict
+    score: float
+    # Share of the query's terms found in the title and snippet; unlike score it is absolute
+    coverage: float = 0.0
+
+    @property
+    def url(self) -> str:
+        return self.result.get('href', '')
+
+class ResultRanker:
+    """
+    Scores search results against a focus area without calling the LLM.
+
+    The score combines BM25 relevance of the title and snippet (normalized to the best result
+    in the set), a domain prior, and penalties for pages already seen in the session. When
+    the top results clearly stand apart from the rest and cover most of the query's terms,
+    the ranking is considered confident and can replace the LLM selection; otherwise it
+    provides a shortlist for the LLM. A uniformly weak result set is never confident, since
+    normalization alone would still give its best result a score near 1.
+    """
+
+    def __init__(self, domain_priors: Optional[Dict[str, float]] = None, min_score: float = 0.5,
+                 confidence_margin: float = 0.15, shortlist_size: int = 5, min_coverage: float = 0.6):
+        self.domain_priors = DEFAULT_DOMAIN_PRIORS if domain_priors is None else domain_priors
+        self.min_score = min_score
+        self.confidence_margin = confidence_margin
+        self.shortlist_size = shortlist_size
+        self.min_coverage = min_coverage
+
+    def domain_prior(self, url: str) -> float:
+        parsed = urlparse(url)
+        domain = parsed.netloc.lower().split(':')[0]
+        prior = 0.0
+        for suffix, value in self.domain_priors.items():
+            if domain == suffix.lstrip('.') or domain.endswith(suffix if suffix.startswith('.') else '.' + suffix):
+                prior += value
+        if parsed.path.lower().endswith(UNSCRAPEABLE_EXTENSIONS):
+            prior -= 0.3
+        return prior
+
+    def rank(self, results: List[Dict], query: str, seen_urls: Iterable[str] = ()) -> List[RankedResult]:
+        """Score and sort results, best first. Already seen URLs score below every unseen one."""
+        if not results:
+            return []
+
+        index = BM25Index(chunk_words=10000)
+        for result in results:
+            index.add(f"{result.get('title', '')} {result.get('body', '')}", result.get('href', ''))
+        relevance = index.score(query)
+        best = max(relevance.values(), default=0.0) or 1.0
+
+        query_terms = set(tokenize(query))
+        seen_urls = set(seen_urls)
+        seen_domains = Counter(urlparse(url).netloc for url in seen_urls)
+
+        ranked = []
+        for i, result in enumerate(results):
+            url = result.get('href', '')
+            score = relevance.get(i, 0.0) / best + self.domain_prior(url)
+            score -= min(0.2, 0.05 * seen_domains[urlparse(url).netloc])
+            if url in seen_urls:
+                score -= 2.0
+            terms = set(tokenize(f"{result.get('title', '')} {result.get('body', '')}"))
+            coverage = len(query_terms & terms) / len(query_terms) if query_terms else 0.0
+            ranked.append(RankedResult(result, score, coverage))
+
+        ranked.sort(key=lambda r: r.score, reverse=True)
+        return ranked
+
+    def is_confident(self, ranked: List[RankedResult], count: int) -> bool:
+        """Whether the top `count` results clearly beat the rest and match the query on their own"""
+        if len(ranked) < count or count <= 0:
+            return False
+        if any(r.score < self.min_score or r.coverage < self.min_coverage for r in ranked[:count]):
+            return False
+        if len(ranked) == count:
+            return True
+        return ranked[count - 1].score - ranked[count].score >= self.confidence_margin
+
+    def shortlist(self, ranked: List[RankedResult]) -> List[Dict]:
+        """The best results to send to the LLM, keeping their original result numbers"""
+        return [r.result for r in ranked[:self.shortlist_size] if r.score > -1.0]
+
+class YieldTracker:
+    """
+    Tracks the yield of page fetches: new, non-duplicate tokens added per fetch.
+
+    Failed fetches and skipped duplicates count as fetches with zero yield, so the figures
+    reflect what the fetch budget actually bought, overall and per focus area.
+    """
+
+    def __init__(self, window: int = 10, target_tokens: int = 300):
+        self.window = window
+        self.target_tokens = target_tokens
+        self.fetches = 0
+        self.new_tokens = 0
+        self.by_focus: Dict[str, List[int]] = {}
+        self._recent: List[int] = []
+        self._lock = threading.Lock()
+
+    def record(self, focus_area: str, new_tokens: int):
+        with self._lock:
+            self.fetches += 1
+            self.new_tokens += new_tokens
+            stats = self.by_focus.setdefault(focus_area, [0, 0])
+            stats[0] += 1
+            stats[1] += new_tokens
+            self._recent.append(new_tokens)
+            del self._recent[:-self.window]
+
+    def yield_per_fetch(self, focus_area: Optional[str] = None) -> float:
+        with self._lock:
+            if focus_area is not None:
+                fetches, tokens = self.by_focus.get(focus_area, (0, 0))
+            else:
+                fetches, tokens = self.fetches, self.new_tokens
+        return tokens / fetches if fetches else 0.0
+
+    def novelty_factor(self) -> float:
+        """Recent yield relative to the target, between 0 and 1. 1.0 until there is data."""
+        with self._lock:
+            if not self._recent:
+                return 1.0
+            recent = sum(self._recent) / len(self._recent)
+        return min(1.0, recent / self.target_tokens)
+
+    def report(self) -> str:
+        return f"{self.fetches} fetches, {self.new_tokens} new tokens, {self.yield_per_fetch():.0f} tokens/fetch"
+
+class PageSelectionPolicy:
+    """
+    Decides how many pages to fetch for one result set, from 0 up to max_pages.
+
+    Results count as worth fetching when their ranker score passes min_score and is within
+    relative_cutoff of the best result. The count shrinks when recent fetches brought little
+    new material (novelty) and never exceeds the remaining fetch budget.
+    """
+
+    def __init__(self, max_pages: int = 4, min_pages: int = 1, min_score: float = 0.35,
+                 relative_cutoff: float = 0.6):
+        self.max_pages = max_pages
+        self.min_pages = min_pages
+        self.min_score = min_score
+        self.relative_cutoff = relative_cutoff
+
+    def choose_count(self, ranked: List[RankedResult], remaining_budget: Optional[int] = None,
+                     novelty: float = 1.0) -> int:
+        if not ranked or ranked[0].score < self.min_score:
+            return 0  # Nothing in this result set is worth a fetch
+
+        cutoff = max(self.min_score, ranked[0].score * self.relative_cutoff)
+        worthwhile = sum(1 for r in ranked if r.score >= cutoff)
+        count = max(self.min_pages, round(worthwhile * max(0.0, min(1.0, novelty))))
+        count = min(count, self.max_pages, worthwhile)
+        if remaining_budget is not None:
+            count = min(count, max(0, remaining_budget))
+        return count
@@ -0,0 +1,97 @@
+import heapq
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+STOP_WORDS = {
+    'the', 'be', 'to', 'of', 'and', 'a', 'in', 'that', 'have', 'i',
+    'it', 'for', 'not', 'on', 'with', 'he', 'as', 'you', 'do', 'at',
+    'is', 'are', 'was', 'were', 'this', 'by', 'an', 'or', 'from', 'what',
+    'which', 'how', 'its', 'their', 'they', 'will', 'can', 'has', 'been'
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stop words"""
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOP_WORDS]
+
+def chunk_text(text: str, max_words: int = 120, overlap: int = 20) -> List[str]:
+    """Split text into overlapping windows of at most max_words words"""
+    words = text.split()
+    if len(words) <= max_words:
+        return [" ".join(words)] if words else []
+    step = max(1, max_words - overlap)
+    return [" ".join(words[i:i + max_words]) for i in range(0, len(words) - overlap, step)]
+
+@dataclass
+class Chunk:
+    """A piece of a research finding together with where it came from"""
+    chunk_id: int
+    text: str
+    source_url: str
+    focus_area: str = ""
+
+class BM25Index:
+    """
+    In-process inverted index with Okapi BM25 scoring over chunks of research findings.
+
+    Chunks are indexed as they are added, so retrieval cost depends on the posting lists of
+    the query terms and on k rather than on re-reading the whole document.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, chunk_words: int = 120):
+        self.k1 = k1
+        self.b = b
+        self.chunk_words = chunk_words
+        self.chunks: List[Chunk] = []
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self.doc_lengths: List[int] = []
+        self.total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def add(self, text: str, source_url: str, focus_area: str = "") -> List[int]:
+        """Chunk and index a finding, returning the ids of the new chunks"""
+        chunk_ids = []
+        for piece in chunk_text(text, self.chunk_words):
+            terms = Counter(tokenize(piece))
+            with self._lock:
+                chunk_id = len(self.chunks)
+                self.chunks.append(Chunk(chunk_id, piece, source_url, focus_area))
+                for term, frequency in terms.items():
+                    self.postings[term][chunk_id] = frequency
+                length = sum(terms.values())
+                self.doc_lengths.append(length)
+                self.total_length += length
+            chunk_ids.append(chunk_id)
+        return chunk_ids
+
+    def score(self, query: str) -> Dict[int, float]:
+        """BM25 score of every chunk that shares at least one term with the query"""
+        scores: Dict[int, float] = defaultdict(float)
+        with self._lock:
+            num_chunks = len(self.chunks)
+            if not num_chunks:
+                return {}
+            average_length = self.total_length / num_chunks or 1.0
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (num_chunks - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, frequency in postings.items():
+                    length_norm = 1 - self.b + self.b * self.doc_lengths[chunk_id] / average_length
+                    scores[chunk_id] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+        return scores
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[Chunk, float]]:
+        """Return the k best matching chunks with their scores, best first"""
+        scores = self.score(query)
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(self.chunks[chunk_id], score) for chunk_id, score in best]
@@ -0,0 +1,119 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+# Results limited to a recent time range go stale faster than unrestricted ones
+TIME_RANGE_TTL = {
+    'd': 60 * 60,
+    'w': 6 * 60 * 60,
+    'm': 24 * 60 * 60,
+    'y': 3 * 24 * 60 * 60,
+}
+
+def normalize_query(query: str) -> str:
+    """Normalize a query so trivially different phrasings share a cache entry"""
+    query = re.sub(r'["\'\[\]]', '', query.lower())
+    return re.sub(r'\s+', ' ', query).strip()
+
+class SearchCache:
+    """
+    TTL-bounded cache of search results keyed by provider, normalized query and time range.
+
+    Lookups hit a small in-memory LRU first and fall back to a SQLite file, which is shared by
+    every session run from the same directory.
+    """
+
+    def __init__(self, path: Optional[str] = "cache/search_cache.db", ttl: int = 7 * 24 * 60 * 60,
+                 max_memory_entries: int = 1024):
+        self.ttl = ttl
+        self.max_memory_entries = max_memory_entries
+        self._memory: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self.conn = None
+        if path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(search_results)")}
+            if columns and 'provider' not in columns:
+                # Cache file from before results were keyed by provider; it is safe to discard
+                self.conn.execute("DROP TABLE search_results")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS search_results (
+                    provider TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    time_range TEXT NOT NULL,
+                    results TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (provider, query, time_range)
+                )
+            """)
+            self.conn.commit()
+
+    def ttl_for(self, time_range: str) -> int:
+        return min(self.ttl, TIME_RANGE_TTL.get(time_range, self.ttl))
+
+    def get(self, query: str, time_range: str = 'none', provider: str = 'duckduckgo') -> Optional[List[Dict]]:
+        """Cached results for the query, or None if missing or expired"""
+        key = (provider, normalize_query(query), time_range or 'none')
+        now = time.time()
+        max_age = self.ttl_for(key[2])
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry[1] < max_age:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+            if self.conn is not None:
+                row = self.conn.execute(
+                    "SELECT results, created_at FROM search_results "
+                    "WHERE provider = ? AND query = ? AND time_range = ?",
+                    key
+                ).fetchone()
+                if row and now - row[1] < max_age:
+                    results = json.loads(row[0])
+                    self._remember(key, results, row[1])
+                    self.hits += 1
+                    return results
+
+            self.misses += 1
+            return None
+
+    def put(self, query: str, time_range: str, results: List[Dict], provider: str = 'duckduckgo'):
+        """Store results; empty result sets are not cached so they get retried"""
+        if not results:
+            return
+        key = (provider, normalize_query(query), time_range or 'none')
+        now = time.time()
+        with self._lock:
+            self._remember(key, results, now)
+            if self.conn is not None:
+                with self.conn:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO search_results (provider, query, time_range, results, created_at) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (*key, json.dumps(results), now)
+                    )
+
+    def purge_expired(self):
+        """Delete on-disk entries older than the maximum TTL"""
+        if self.conn is None:
+            return
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM search_results WHERE created_at < ?", (time.time() - self.ttl,))
+
+    def _remember(self, key: tuple, results: List[Dict], created_at: float):
+        self._memory[key] = (results, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
@@ -0,0 +1,223 @@
+import logging
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from queue import Queue
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Maximum result age in seconds for each time range option, used by providers that filter locally
+TIME_RANGE_SECONDS = {
+    'd': 24 * 60 * 60,
+    'w': 7 * 24 * 60 * 60,
+    'm': 31 * 24 * 60 * 60,
+    'y': 366 * 24 * 60 * 60,
+}
+
+class SearchProvider:
+    """
+    Interface of a search backend.
+
+    search() returns results in the format the rest of the researcher expects from
+    DuckDuckGo: dicts with 'title', 'href' and 'body' keys. Implementations must be safe to
+    call from several threads at once.
+    """
+
+    name = "base"
+    # Whether results are worth keeping in the SearchCache
+    cacheable = True
+
+    def search(self, query: str, time_range: str = 'none', max_results: int = 10) -> List[Dict]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class DuckDuckGoProvider(SearchProvider):
+    """DuckDuckGo text search through a pool of reusable DDGS clients"""
+
+    name = "duckduckgo"
+
+    def __init__(self, pool_size: int = 4, timeout: int = 10):
+        from duckduckgo_search import DDGS
+
+        self._client_class = DDGS
+        self.timeout = timeout
+        self._pool: Queue = Queue(maxsize=pool_size)
+        for _ in range(pool_size):
+            self._pool.put(None)  # Clients are created lazily on first use
+
+    @contextmanager
+    def _client(self):
+        client = self._pool.get()
+        try:
+            if client is None:
+                client = self._client_class(timeout=self.timeout)
+            yield client
+        except Exception:
+            # Drop a client that failed mid-request; a fresh one is created next time
+            client = None
+            raise
+        finally:
+            self._pool.put(client)
+
+    def search(self, query: str, time_range: str = 'none', max_results: int = 10) -> List[Dict]:
+        with self._client() as ddgs:
+            if time_range and time_range != 'none':
+                return list(ddgs.text(query, timelimit=time_range, max_results=max_results) or [])
+            return list(ddgs.text(query, max_results=max_results) or [])
+
+class SearxNGProvider(SearchProvider):
+    """Search through the JSON API of a SearxNG instance, using a pooled HTTP session"""
+
+    name = "searxng"
+    time_ranges = {'d': 'day', 'w': 'week', 'm': 'month', 'y': 'year'}
+
+    def __init__(self, base_url: str = "http://localhost:8888", pool_size: int = 8, timeout: int = 10):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def search(self, query: str, time_range: str = 'none', max_results: int = 10) -> List[Dict]:
+        params = {'q': query, 'format': 'json'}
+        if time_range in self.time_ranges:
+            params['time_range'] = self.time_ranges[time_range]
+        response = self.session.get(f"{self.base_url}/search", params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return [
+            {'title': r.get('title', ''), 'href': r.get('url', ''), 'body': r.get('content', '')}
+            for r in response.json().get('results', [])[:max_results]
+            if r.get('url')
+        ]
+
+    def close(self):
+        self.session.close()
+
+class LocalIndexProvider(SearchProvider):
+    """
+    Offline full-text search over a directory of HTML, text and Markdown files.
+
+    Files are indexed into an SQLite FTS5 table (re-indexed when their modification time
+    changes) and ranked with FTS5's built-in BM25. Result URLs are file:// URIs, which the web
+    scraper reads from disk, so a whole research session can run without network access.
+    """
+
+    name = "local"
+    cacheable = False
+    extensions = {'.html', '.htm', '.txt', '.md'}
+
+    def __init__(self, corpus_dir: str, index_path: Optional[str] = None):
+        self.corpus_dir = Path(corpus_dir).resolve()
+        self.index_path = index_path or str(self.corpus_dir / ".search_index.db")
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5(path UNINDEXED, title, body)")
+        conn.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime REAL NOT NULL)")
+        conn.commit()
+        self.refresh()
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread, so concurrent searches never share a cursor"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.index_path)
+            self._local.conn = conn
+        return conn
+
+    def refresh(self) -> int:
+        """Index new and modified files and drop deleted ones. Returns the number indexed."""
+        conn = self._connection()
+        with self._write_lock:
+            known = dict(conn.execute("SELECT path, mtime FROM files"))
+            seen = set()
+            indexed = 0
+            for path in self.corpus_dir.rglob('*'):
+                if path.suffix.lower() not in self.extensions or not path.is_file():
+                    continue
+                key = str(path)
+                seen.add(key)
+                mtime = path.stat().st_mtime
+                if known.get(key) == mtime:
+                    continue
+                title, body = self._extract(path)
+                with conn:
+                    conn.execute("DELETE FROM documents WHERE path = ?", (key,))
+                    conn.execute("INSERT INTO documents (path, title, body) VALUES (?, ?, ?)", (key, title, body))
+                    conn.execute("INSERT OR REPLACE INTO files (path, mtime) VALUES (?, ?)", (key, mtime))
+                indexed += 1
+
+            with conn:
+                for key in set(known) - seen:
+                    conn.execute("DELETE FROM documents WHERE path = ?", (key,))
+                    conn.execute("DELETE FROM files WHERE path = ?", (key,))
+        if indexed:
+            logger.info(f"Indexed {indexed} local documents from {self.corpus_dir}")
+        return indexed
+
+    @staticmethod
+    def _extract(path: Path):
+        text = path.read_text(encoding='utf-8', errors='ignore')
+        if path.suffix.lower() in ('.html', '.htm'):
+            from bs4 import BeautifulSoup
+
+            soup = BeautifulSoup(text, 'html.parser')
+            for element in soup(["script", "style", "nav", "footer", "header"]):
+                element.decompose()
+            title = soup.title.string if soup.title and soup.title.string else path.stem
+            text = soup.get_text(" ")
+        else:
+            title = path.stem
+        return title.strip(), re.sub(r'\s+', ' ', text).strip()
+
+    def search(self, query: str, time_range: str = 'none', max_results: int = 10) -> List[Dict]:
+        # Quote every term so user input can never be interpreted as FTS5 query syntax
+        terms = re.findall(r'\w+', query)
+        if not terms:
+            return []
+        match = " OR ".join(f'"{term}"' for term in terms)
+
+        sql = """
+            SELECT d.path, d.title, snippet(documents, 2, '', '', '...', 40)
+            FROM documents d JOIN files f ON f.path = d.path
+            WHERE documents MATCH ?
+        """
+        params: list = [match]
+        if time_range in TIME_RANGE_SECONDS:
+            sql += " AND f.mtime >= ?"
+            params.append(time.time() - TIME_RANGE_SECONDS[time_range])
+        sql += " ORDER BY bm25(documents) LIMIT ?"
+        params.append(max_results)
+
+        rows = self._connection().execute(sql, params).fetchall()
+        return [{'title': title, 'href': Path(path).as_uri(), 'body': body} for path, title, body in rows]
+
+def get_search_provider(name: str = "duckduckgo", **options) -> SearchProvider:
+    """
+    Create a search provider by name.
+
+    Args:
+        name (str): 'duckduckgo', 'searxng' or 'local'.
+        **options: Passed to the provider, e.g. base_url for SearxNG or corpus_dir for local.
+    """
+    providers = {
+        'duckduckgo': DuckDuckGoProvider,
+        'ddg': DuckDuckGoProvider,
+        'searxng': SearxNGProvider,
+        'local': LocalIndexProvider,
+    }
+    if name not in providers:
+        raise ValueError(f"Unknown search provider '{name}'. Choose from: {', '.join(providers)}")
+    return providers[name](**options)
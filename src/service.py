@@ -0,0 +1,476 @@
+"""
+Research service: a long-lived local HTTP API in front of a bounded job queue and worker pool.
+
+The search cache, search provider, scraper and LLM connection pools are created once when the
+service starts and shared by every job, and LLM presets are read once, so a job only pays for
+its own ResearchManager. Finished jobs stay in memory so questions can be asked about them.
+
+  POST /jobs                   {"query": ..., "preset", "queries_per_focus", "max_minutes",
+                               "max_llm_tokens", "max_pages", "max_document_tokens"}
+                               -> 202 with the job; 503 when the queue is full
+  GET  /jobs                   all jobs the service remembers
+  GET  /jobs/<id>              status and progress
+  GET  /jobs/<id>/events       progress events as server-sent events; resume with ?since=N
+                               or a Last-Event-ID header
+  GET  /jobs/<id>/document     the research document as plain text
+  GET  /jobs/<id>/summary      the summary once research is complete
+  POST /jobs/<id>/ask          {"question": ...} -> {"answer": ...} about a summarized job
+  POST /jobs/<id>/pause        hold research
+  POST /jobs/<id>/resume       continue held research
+  POST /jobs/<id>/cancel       drop a queued job, or stop a running one and summarize it
+  GET  /health                 queue and worker counts
+
+Usage: python -m src.service --port 8765 --workers 2 --queue-size 16 --max-minutes 30
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from .research_manager import ResearchManager
+from .session_factory import (
+    BUDGET_FIELDS, SharedResources, budget_from_options, build_research_manager,
+    create_shared_resources, load_preset, parse_provider_options
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 1024 * 1024
+FINISHED_STATES = ('done', 'failed', 'cancelled')
+
+class Job:
+    """One research job and the progress events it has produced"""
+
+    def __init__(self, job_id: str, query: str, llm_config: Dict, budget: Dict, queries_per_focus: int,
+                 document_path: str):
+        self.id = job_id
+        self.query = query
+        self.llm_config = llm_config
+        self.budget = budget
+        self.queries_per_focus = queries_per_focus
+        self.document_path = document_path
+        self.status = 'queued'
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.manager: Optional[ResearchManager] = None
+        self.summary: Optional[str] = None
+        self.cancel_requested = False
+        self.events: List[Dict] = []
+        # Notified on every new event, so event streams wait instead of polling
+        self.changed = threading.Condition()
+        # Questions share the manager's retrieval indexes, so they are answered one at a time
+        self.ask_lock = threading.Lock()
+
+    def add_event(self, event: str, data: Optional[Dict] = None):
+        with self.changed:
+            self.events.append({'id': len(self.events) + 1, 'event': event, 'time': time.time(),
+                                'data': data or {}})
+            self.changed.notify_all()
+
+    def finish(self, status: str):
+        with self.changed:
+            self.status = status
+            self.finished = time.time()
+        self.add_event('finished', {'status': status, 'error': self.error})
+
+    def is_finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def wait_events(self, since: int, timeout: float) -> Tuple[List[Dict], bool]:
+        """Events after id since, waiting up to timeout for one. Returns (events, job finished)."""
+        with self.changed:
+            if len(self.events) <= since and not self.is_finished():
+                self.changed.wait(timeout)
+            return self.events[since:], self.is_finished()
+
+    def to_dict(self) -> Dict:
+        record = {
+            'id': self.id,
+            'query': self.query,
+            'status': self.status,
+            'error': self.error,
+            'budget': self.budget,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'events': len(self.events),
+            'document': self.document_path,
+        }
+        if self.manager is not None:
+            record['progress'] = self.manager.get_status()
+        return record
+
+class ResearchService:
+    """Bounded job queue and worker threads running research jobs on shared resources"""
+
+    def __init__(self, resources: SharedResources, output_dir: str, defaults: Dict, workers: int = 2,
+                 queue_size: int = 16, keep_jobs: int = 100):
+        self.resources = resources
+        self.output_dir = output_dir
+        self.defaults = defaults
+        self.keep_jobs = keep_jobs
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue(maxsize=queue_size)
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        self._configs: Dict[str, Dict] = {}
+        self._workers = [
+            threading.Thread(target=self._work, name=f"research-worker-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        os.makedirs(output_dir, exist_ok=True)
+
+    def start(self):
+        for worker in self._workers:
+            worker.start()
+
+    def shutdown(self):
+        """Stop running jobs and let the workers exit once they have summarized them"""
+        for job in self.jobs():
+            if job.status == 'running' and job.manager is not None:
+                job.manager.stop()
+        for _ in self._workers:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break  # Workers are daemon threads; they end with the process
+
+    def _llm_config(self, preset: str) -> Dict:
+        with self._jobs_lock:
+            if preset not in self._configs:
+                self._configs[preset] = load_preset(preset)
+            return self._configs[preset]
+
+    def submit(self, options: Dict) -> Job:
+        """
+        Queue a research job.
+
+        Raises:
+            ValueError: The options are invalid.
+            queue.Full: The queue holds queue_size jobs already.
+        """
+        query = options.get('query')
+        if not isinstance(query, str) or not query.strip():
+            raise ValueError("'query' must be a non-empty string")
+        budget = {field: options.get(field, self.defaults[field]) for field in BUDGET_FIELDS}
+        for field, value in budget.items():
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0):
+                raise ValueError(f"'{field}' must be a positive number")
+        if not any(budget.values()):
+            raise ValueError("a job needs at least one budget limit")
+        queries_per_focus = options.get('queries_per_focus', self.defaults['queries_per_focus'])
+        if isinstance(queries_per_focus, bool) or not isinstance(queries_per_focus, int) or queries_per_focus < 1:
+            raise ValueError("'queries_per_focus' must be a positive integer")
+
+        preset = options.get('preset', self.defaults['preset'])
+        if not isinstance(preset, str):
+            raise ValueError("'preset' must be a string")
+
+        job_id = uuid.uuid4().hex[:12]
+        job = Job(job_id, query.strip(), self._llm_config(preset),
+                  budget, queries_per_focus, os.path.join(self.output_dir, f"{job_id}.txt"))
+        job.add_event('queued', {'query': job.query})
+        self._queue.put_nowait(job)
+        with self._jobs_lock:
+            self._jobs[job.id] = job
+            self._forget_old_jobs()
+        return job
+
+    def _forget_old_jobs(self):
+        """Drop the oldest finished jobs beyond keep_jobs; their files stay in the output directory"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.is_finished()]
+        for job_id in finished[:max(0, len(finished) - self.keep_jobs)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._jobs_lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        with self._jobs_lock:
+            return list(self._jobs.values())
+
+    def stats(self) -> Dict:
+        jobs = self.jobs()
+        return {
+            'workers': len(self._workers),
+            'queued': sum(1 for job in jobs if job.status == 'queued'),
+            'running': sum(1 for job in jobs if job.status == 'running'),
+            'finished': sum(1 for job in jobs if job.is_finished()),
+            'queue_capacity': self._queue.maxsize,
+        }
+
+    def cancel(self, job: Job):
+        with job.changed:
+            job.cancel_requested = True
+            queued = job.status == 'queued'
+        if queued:
+            # The worker that takes it from the queue skips it
+            job.finish('cancelled')
+        elif job.manager is not None:
+            job.manager.stop()
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            try:
+                self._run(job)
+            except Exception:
+                logger.exception(f"Worker failed on job {job.id}")
+
+    def _run(self, job: Job):
+        with job.changed:
+            if job.cancel_requested:
+                return
+            job.status = 'running'
+            job.started = time.time()
+        try:
+            job.manager = build_research_manager(
+                job.llm_config, self.resources, budget_from_options(job.budget),
+                queries_per_focus=job.queries_per_focus, on_event=job.add_event
+            )
+            if job.cancel_requested:
+                job.manager.stop()
+            formatted = job.manager.run_budgeted(job.query, document_path=job.document_path)
+            # The plain summary; the document holds the formatted one
+            job.summary = job.manager.research_summary or formatted.strip()
+            job.finish('cancelled' if job.cancel_requested else 'done')
+        except Exception as e:
+            logger.exception(f"Research job {job.id} failed")
+            job.error = f"{type(e).__name__}: {e}"
+            job.finish('failed')
+
+_JOB_PATH = re.compile(r'^/jobs/([0-9a-f]+)(?:/(events|document|summary|ask|pause|resume|cancel))?/?$')
+
+class ResearchRequestHandler(BaseHTTPRequestHandler):
+    server_version = "ResearchService/1.0"
+
+    @property
+    def service(self) -> ResearchService:
+        return self.server.service
+
+    def log_message(self, format, *args):
+        logger.info("%s %s", self.address_string(), format % args)
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload, headers: Optional[Dict] = None):
+        self._send(status, json.dumps(payload).encode('utf-8'), "application/json", headers)
+
+    def _send_error(self, status: int, message: str, headers: Optional[Dict] = None):
+        self._send_json(status, {'error': message}, headers)
+
+    def _read_json(self) -> Optional[Dict]:
+        """The request body as a JSON object; sends an error response and returns None if it is not one"""
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # rfile.read(-1) would block until the client closes the connection
+            self._send_error(400, "invalid Content-Length")
+            return None
+        if length > MAX_BODY_BYTES:
+            self._send_error(413, "request body too large")
+            return None
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send_error(400, "request body is not valid JSON")
+            return None
+        if not isinstance(body, dict):
+            self._send_error(400, "request body must be a JSON object")
+            return None
+        return body
+
+    def _route(self) -> Tuple[Optional[Job], Optional[str], bool]:
+        """Match /jobs/<id>[/<action>]. Returns (job, action, matched); sends a 404 for unknown jobs."""
+        match = _JOB_PATH.match(urlparse(self.path).path)
+        if not match:
+            return None, None, False
+        job = self.service.get(match.group(1))
+        if job is None:
+            self._send_error(404, f"no job {match.group(1)}")
+        return job, match.group(2), True
+
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip('/')
+        if path == '/health':
+            return self._send_json(200, {'status': 'ok', **self.service.stats()})
+        if path == '/jobs':
+            return self._send_json(200, {'jobs': [job.to_dict() for job in self.service.jobs()]})
+
+        job, action, matched = self._route()
+        if not matched:
+            return self._send_error(404, "not found")
+        if job is None:
+            return
+        if action is None:
+            return self._send_json(200, job.to_dict())
+        if action == 'events':
+            return self._stream_events(job)
+        if action == 'document':
+            if not os.path.exists(job.document_path):
+                return self._send_error(404, "the job has not started its document yet")
+            with open(job.document_path, 'rb') as f:
+                return self._send(200, f.read(), "text/plain; charset=utf-8")
+        if action == 'summary':
+            if job.summary is None:
+                return self._send_error(409, f"job is {job.status}; the summary is not ready")
+            return self._send_json(200, {'id': job.id, 'query': job.query, 'summary': job.summary})
+        self._send_error(405, f"use POST for /{action}")
+
+    def do_POST(self):
+        if urlparse(self.path).path.rstrip('/') == '/jobs':
+            options = self._read_json()
+            if options is None:
+                return
+            try:
+                job = self.service.submit(options)
+            except ValueError as e:
+                return self._send_error(400, str(e))
+            except queue.Full:
+                return self._send_error(503, "the job queue is full", {'Retry-After': '60'})
+            return self._send_json(202, job.to_dict(), {'Location': f"/jobs/{job.id}"})
+
+        job, action, matched = self._route()
+        if not matched:
+            return self._send_error(404, "not found")
+        if job is None:
+            return
+        if action == 'cancel':
+            if not job.is_finished():
+                self.service.cancel(job)
+            return self._send_json(202, job.to_dict())
+        if action in ('pause', 'resume'):
+            if job.status != 'running' or job.manager is None:
+                return self._send_error(409, f"job is {job.status}")
+            if action == 'pause':
+                job.manager.pause()
+            else:
+                job.manager.unpause()
+            return self._send_json(200, job.to_dict())
+        if action == 'ask':
+            body = self._read_json()
+            if body is None:
+                return
+            question = body.get('question')
+            if not isinstance(question, str) or not question.strip():
+                return self._send_error(400, "'question' must be a non-empty string")
+            if job.manager is None or not job.manager.research_complete:
+                return self._send_error(409, f"job is {job.status}; questions can be asked once it is summarized")
+            with job.ask_lock:
+                answer = job.manager.ask(question.strip())
+            return self._send_json(200, {'question': question.strip(), 'answer': answer})
+        self._send_error(405, "use GET for this resource")
+
+    def _stream_events(self, job: Job):
+        """Send events as server-sent events until the job finishes or the client goes away"""
+        query = parse_qs(urlparse(self.path).query)
+        try:
+            since = int(query.get('since', [self.headers.get('Last-Event-ID') or 0])[0])
+        except ValueError:
+            since = -1
+        if since < 0:
+            return self._send_error(400, "'since' must be an event id")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            while True:
+                events, finished = job.wait_events(since, timeout=15)
+                for event in events:
+                    self.wfile.write(
+                        f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event)}\n\n".encode('utf-8')
+                    )
+                    since = event['id']
+                if not events:
+                    self.wfile.write(b": keep-alive\n\n")
+                self.wfile.flush()
+                if finished and since >= len(job.events):
+                    return
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+class ResearchHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], service: ResearchService):
+        super().__init__(address, ResearchRequestHandler)
+        self.service = service
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Run the researcher as a local HTTP service")
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8765)
+    arg_parser.add_argument("--workers", type=int, default=2, help="research jobs run at once")
+    arg_parser.add_argument("--queue-size", type=int, default=16, help="jobs that may wait for a worker")
+    arg_parser.add_argument("--keep-jobs", type=int, default=100, help="finished jobs kept in memory for questions")
+    arg_parser.add_argument("--output-dir", default="service_results")
+    arg_parser.add_argument("--preset", default="default", help="LLM preset for jobs without one")
+    arg_parser.add_argument("--queries-per-focus", type=int, default=1)
+    arg_parser.add_argument("--search-provider", default="duckduckgo", help="duckduckgo, searxng or local")
+    arg_parser.add_argument("--provider-option", action="append", default=[], metavar="KEY=VALUE",
+                            help="search provider option, e.g. base_url=http://localhost:8888")
+    arg_parser.add_argument("--pool-size", type=int, default=16, help="HTTP connections per host")
+    budget_args = arg_parser.add_argument_group("default research budget", "used by jobs that set no limit of their own")
+    budget_args.add_argument("--max-minutes", type=float, default=30.0)
+    budget_args.add_argument("--max-llm-tokens", type=int)
+    budget_args.add_argument("--max-pages", type=int)
+    budget_args.add_argument("--max-document-tokens", type=int)
+    args = arg_parser.parse_args()
+
+    try:
+        provider_options = parse_provider_options(args.provider_option)
+        load_preset(args.preset)
+    except ValueError as e:
+        arg_parser.error(str(e))
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s", stream=sys.stderr)
+    defaults = {field: getattr(args, field) for field in BUDGET_FIELDS}
+    defaults.update(preset=args.preset, queries_per_focus=args.queries_per_focus)
+    service = ResearchService(
+        create_shared_resources(args.search_provider, provider_options, args.pool_size),
+        args.output_dir, defaults, workers=args.workers, queue_size=args.queue_size, keep_jobs=args.keep_jobs
+    )
+    server = ResearchHTTPServer((args.host, args.port), service)
+
+    # Jobs print their progress as they go; it goes to a log file, the API serves it as events
+    log_path = os.path.join(args.output_dir, "sessions.log")
+    print(f"Research service on http://{args.host}:{args.port} with {args.workers} workers, "
+          f"output in {args.output_dir}, session output in {log_path}")
+    sys.stdout = open(log_path, 'a', encoding='utf-8', buffering=1)
+
+    service.start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Building blocks shared by every front end that runs research sessions: the terminal, batch
+mode and the HTTP service. Connection pools and caches live in SharedResources, created once
+per process, so only the per-session objects are built for each new session.
+"""
+import json
+import os
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import openai
+import requests
+
+from .budget import ResearchBudget
+from .llm_response_parser import UltimateLLMResponseParser
+from .llm_wrapper import LLMWrapper, track_response
+from .page_knowledge import PageKnowledgeBase, get_shared_knowledge_base
+from .research_manager import ResearchManager
+from .search_cache import SearchCache
+from .search_providers import SearchProvider, get_search_provider
+from .Self_Improving_Search import EnhancedSelfImprovingSearch
+from .web_scraper import get_shared_scraper
+
+BUDGET_FIELDS = ('max_minutes', 'max_llm_tokens', 'max_pages', 'max_document_tokens')
+PRESET_DIR = "config/model_presets"
+
+@dataclass
+class SharedResources:
+    """Connection pools and caches shared by every session a process runs"""
+    search_cache: SearchCache
+    search_provider: SearchProvider
+    parser: UltimateLLMResponseParser
+    knowledge_base: PageKnowledgeBase
+
+def create_shared_resources(provider_name: str = "duckduckgo", provider_options: Optional[Dict] = None,
+                            pool_size: int = 16) -> SharedResources:
+    """Create this process's shared resources and warm its connection pools"""
+    # The openai client sends every request of this process through one pooled session
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    # Lets cancelled LLM streams abort their connection
+    session.hooks['response'].append(track_response)
+    openai.requestssession = session
+
+    get_shared_scraper()
+    return SharedResources(
+        search_cache=SearchCache(),
+        search_provider=get_search_provider(provider_name, **(provider_options or {})),
+        parser=UltimateLLMResponseParser(),
+        knowledge_base=get_shared_knowledge_base(),
+    )
+
+def available_presets() -> List[str]:
+    """Names of the LLM presets in PRESET_DIR"""
+    if not os.path.isdir(PRESET_DIR):
+        return []
+    return sorted(os.path.splitext(name)[0] for name in os.listdir(PRESET_DIR) if name.endswith('.json'))
+
+def load_preset(preset: str) -> Dict:
+    """Read an LLM preset without prompting; get_llm_config asks the terminal when one is missing"""
+    # Only names listed in PRESET_DIR are accepted, so a preset can never name another path
+    if preset not in available_presets():
+        raise ValueError(f"LLM preset '{preset}' not found in {PRESET_DIR}")
+    preset_path = os.path.join(PRESET_DIR, f"{preset}.json")
+    with open(preset_path, 'r') as f:
+        return json.load(f)
+
+def parse_provider_options(options) -> Dict:
+    """Turn KEY=VALUE command line options into search provider keyword arguments"""
+    parsed = {}
+    for option in options:
+        key, separator, value = option.partition('=')
+        if not separator:
+            raise ValueError(f"--provider-option expects KEY=VALUE, got '{option}'")
+        parsed[key] = value
+    return parsed
+
+def budget_from_options(options: Dict) -> ResearchBudget:
+    """Build a budget from max_minutes, max_llm_tokens, max_pages and max_document_tokens"""
+    return ResearchBudget(
+        max_seconds=options['max_minutes'] * 60 if options.get('max_minutes') else None,
+        max_llm_tokens=options.get('max_llm_tokens'),
+        max_pages=options.get('max_pages'),
+        max_document_tokens=options.get('max_document_tokens')
+    )
+
+def build_research_manager(llm_config: Dict, resources: SharedResources,
+                           budget: Optional[ResearchBudget] = None, queries_per_focus: int = 1,
+                           on_event: Optional[Callable[[str, Dict], None]] = None) -> ResearchManager:
+    """Create the per-session search engine and manager on top of the shared resources"""
+    search_engine = EnhancedSelfImprovingSearch(
+        LLMWrapper(llm_config), resources.parser,
+        search_cache=resources.search_cache,
+        search_provider=resources.search_provider,
+        knowledge_base=resources.knowledge_base
+    )
+    return ResearchManager(llm_config, search_engine, budget=budget,
+                           queries_per_focus=queries_per_focus, on_event=on_event)
@@ -0,0 +1,201 @@
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from .retrieval import chunk_text
+from .summarizer import estimate_tokens, SECTION_SEPARATOR
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS focus_areas (
+    id INTEGER PRIMARY KEY,
+    area TEXT NOT NULL UNIQUE,
+    priority INTEGER NOT NULL DEFAULT 3,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS queries (
+    id INTEGER PRIMARY KEY,
+    focus_area_id INTEGER REFERENCES focus_areas(id),
+    query TEXT NOT NULL,
+    time_range TEXT NOT NULL DEFAULT 'none',
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    focus_area_id INTEGER REFERENCES focus_areas(id),
+    content TEXT NOT NULL,
+    token_count INTEGER NOT NULL,
+    added_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    source_id INTEGER NOT NULL REFERENCES sources(id),
+    seq INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    token_count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_queries_focus ON queries(focus_area_id);
+CREATE INDEX IF NOT EXISTS idx_sources_focus ON sources(focus_area_id);
+CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks(source_id);
+"""
+
+def render_section(focus_area: str, source_url: str, content: str) -> str:
+    """Render one finding the way it appears in the research session document"""
+    return (
+        f"\n{SECTION_SEPARATOR}\n"
+        f"Research Focus: {focus_area}\n"
+        f"Source: {source_url}\n"
+        f"Content:\n{content}\n"
+        f"{SECTION_SEPARATOR}\n"
+    )
+
+class SessionStore:
+    """
+    SQLite store holding the state of one research session.
+
+    Focus areas, queries, sources and content chunks (with precomputed token counts) are kept
+    in indexed tables, so status, budget and retrieval checks are queries rather than full
+    reads of the session document. The text document is an export view of this store.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def set_meta(self, key: str, value: str):
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def get_meta(self, key: str, default: str = "") -> str:
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _focus_area_id(self, area: str, priority: int = 3) -> int:
+        """Id of a focus area, inserting it if needed. Caller must hold the lock."""
+        self.conn.execute(
+            "INSERT OR IGNORE INTO focus_areas (area, priority, created_at) VALUES (?, ?, ?)",
+            (area, priority, _now())
+        )
+        return self.conn.execute("SELECT id FROM focus_areas WHERE area = ?", (area,)).fetchone()[0]
+
+    def add_focus_area(self, area: str, priority: int) -> int:
+        with self._lock, self.conn:
+            focus_id = self._focus_area_id(area, priority)
+            self.conn.execute("UPDATE focus_areas SET priority = ? WHERE id = ?", (priority, focus_id))
+            return focus_id
+
+    def add_query(self, focus_area: str, query: str, time_range: str = 'none') -> int:
+        with self._lock, self.conn:
+            focus_id = self._focus_area_id(focus_area)
+            cursor = self.conn.execute(
+                "INSERT INTO queries (focus_area_id, query, time_range, created_at) VALUES (?, ?, ?, ?)",
+                (focus_id, query, time_range, _now())
+            )
+            return cursor.lastrowid
+
+    def add_source(self, url: str, focus_area: str, content: str) -> Optional[int]:
+        """Store a scraped source and its chunks. Returns None if the URL is already stored."""
+        with self._lock, self.conn:
+            focus_id = self._focus_area_id(focus_area)
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO sources (url, focus_area_id, content, token_count, added_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (url, focus_id, content, estimate_tokens(content), _now())
+            )
+            if not cursor.rowcount:
+                return None
+            source_id = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT INTO chunks (source_id, seq, text, token_count) VALUES (?, ?, ?, ?)",
+                [(source_id, seq, piece, estimate_tokens(piece))
+                 for seq, piece in enumerate(chunk_text(content))]
+            )
+            return source_id
+
+    def has_source(self, url: str) -> bool:
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM sources WHERE url = ?", (url,)).fetchone() is not None
+
+    def source_urls(self) -> Set[str]:
+        with self._lock:
+            return {row[0] for row in self.conn.execute("SELECT url FROM sources")}
+
+    def source_count(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM sources").fetchone()[0]
+
+    def total_tokens(self) -> int:
+        """Estimated token count of all stored content"""
+        with self._lock:
+            return self.conn.execute("SELECT COALESCE(SUM(token_count), 0) FROM sources").fetchone()[0]
+
+    def focus_area_stats(self) -> List[Dict]:
+        """Per focus area: priority, number of queries, sources and tokens collected"""
+        with self._lock:
+            rows = self.conn.execute("""
+                SELECT f.area, f.priority,
+                       (SELECT COUNT(*) FROM queries q WHERE q.focus_area_id = f.id),
+                       (SELECT COUNT(*) FROM sources s WHERE s.focus_area_id = f.id),
+                       (SELECT COALESCE(SUM(token_count), 0) FROM sources s WHERE s.focus_area_id = f.id)
+                FROM focus_areas f ORDER BY f.id
+            """).fetchall()
+        return [
+            {'area': area, 'priority': priority, 'queries': queries, 'sources': sources, 'tokens': tokens}
+            for area, priority, queries, sources, tokens in rows
+        ]
+
+    def iter_sources(self) -> Iterator[Tuple[str, str, str]]:
+        """(focus area, url, content) of every stored source, in insertion order"""
+        with self._lock:
+            rows = self.conn.execute("""
+                SELECT f.area, s.url, s.content FROM sources s
+                LEFT JOIN focus_areas f ON f.id = s.focus_area_id ORDER BY s.id
+            """).fetchall()
+        yield from rows
+
+    def iter_chunks(self) -> Iterator[Tuple[str, str, str]]:
+        """(text, url, focus area) of every stored chunk"""
+        with self._lock:
+            rows = self.conn.execute("""
+                SELECT c.text, s.url, f.area FROM chunks c
+                JOIN sources s ON s.id = c.source_id
+                LEFT JOIN focus_areas f ON f.id = s.focus_area_id ORDER BY c.id
+            """).fetchall()
+        yield from rows
+
+    def render_header(self) -> str:
+        return (
+            f"Research Session {self.get_meta('session_number', '')}\n"
+            f"Topic: {self.get_meta('topic')}\n"
+            f"Started: {self.get_meta('started')}\n"
+            + "=" * 80 + "\n\n"
+        )
+
+    def render_document(self) -> str:
+        """The full text view of the session"""
+        parts = [self.render_header()]
+        parts.extend(render_section(area or "", url, content) for area, url, content in self.iter_sources())
+        return "".join(parts)
+
+    def export_text(self, path: str):
+        """Write the text view of the session to path"""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.render_document())
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -3,6 +3,9 @@ import re
 from dataclasses import dataclass
 from datetime import datetime
 
+from .response_parsing import parse_response
+from .response_corpus import record_response
+
 @dataclass
 class ResearchFocus:
     """Represents a specific area of research focus"""
@@ -32,30 +35,30 @@ class AnalysisResult:
             self.timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
 
+# Compiled once at import rather than on every parse
 patterns = {
-    'original_question': [
-        r"(?i)original question analysis:\s*(.*?)(?=research gap|$)",
-        r"(?i)original query:\s*(.*?)(?=research gap|$)",
-        r"(?i)research question:\s*(.*?)(?=research gap|$)",
-        r"(?i)topic analysis:\s*(.*?)(?=research gap|$)"
-    ],
-    'research_gaps': [
-        r"(?i)research gaps?:\s*",
-        r"(?i)gaps identified:\s*",
-        r"(?i)areas for research:\s*",
-        r"(?i)investigation areas:\s*"
-    ],
-    'priority': [
-        r"(?i)priority:\s*(\d+)",
-        r"(?i)priority level:\s*(\d+)",
-        r"(?i)\(priority:\s*(\d+)\)",
-        r"(?i)importance:\s*(\d+)"
-    ]
+    'original_question': [re.compile(p, re.DOTALL) for p in (
+        r"(?i)original question analysis\s*:\s*(.*?)(?=research gap|$)",
+        r"(?i)original query\s*:\s*(.*?)(?=research gap|$)",
+        r"(?i)research question\s*:\s*(.*?)(?=research gap|$)",
+        r"(?i)topic analysis\s*:\s*(.*?)(?=research gap|$)"
+    )],
+    'research_gaps': [re.compile(p) for p in (
+        r"(?i)research gaps?\s*:\s*",
+        r"(?i)gaps identified\s*:\s*",
+        r"(?i)areas for research\s*:\s*",
+        r"(?i)investigation areas\s*:\s*"
+    )],
 }
 
+_BLANK_LINES = re.compile(r'\n{3,}')
+_SPACES = re.compile(r'\s{2,}')
+_PAREN_NUMBER = re.compile(r'(\d+\))')
+
 
 def parse_analysis(llm_response: str) -> Optional[AnalysisResult]:
     """Main parsing method with improved validation"""
+    record_response('analysis', llm_response)
     try:
         # Clean and normalize the response
         cleaned_response = _clean_text(llm_response)
@@ -66,8 +69,8 @@ def parse_analysis(llm_response: str) -> Optional[AnalysisResult]:
             # logger.warning("Failed to extract original question")
             original_question = "Original question extraction failed"
 
-        # Extract and validate research areas
-        focus_areas = _extract_research_areas(cleaned_response)
+        # Areas are read from the raw response, since cleaning joins the lines of the numbered list
+        focus_areas = _extract_research_areas(llm_response)
         focus_areas = _normalize_focus_areas(focus_areas)
 
         # Calculate confidence score
@@ -86,64 +89,30 @@ def parse_analysis(llm_response: str) -> Optional[AnalysisResult]:
 
 def _clean_text(text: str) -> str:
     """Clean and normalize text for parsing"""
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    text = re.sub(r'\s{2,}', ' ', text)
-    text = re.sub(r'(\d+\))', r'\1.', text)
+    text = _BLANK_LINES.sub('\n\n', text)
+    text = _SPACES.sub(' ', text)
+    text = _PAREN_NUMBER.sub(r'\1.', text)
     return text.strip()
 
 def _extract_original_question(text: str) -> str:
     """Extract original question with improved matching"""
     for pattern in patterns['original_question']:
-        match = re.search(pattern, text, re.DOTALL)
+        match = pattern.search(text)
         if match:
             return _clean_text(match.group(1))
     return ""
 
 def _extract_research_areas(text: str) -> List[ResearchFocus]:
-    """Extract research areas with enhanced validation"""
-    areas = []
+    """Extract the numbered research areas listed after the research gaps heading"""
     for pattern in patterns['research_gaps']:
-        gap_match = re.search(pattern, text)
+        gap_match = pattern.search(text)
         if gap_match:
-            sections = re.split(r'\n\s*\d+[\.)]\s+', text[gap_match.end():])
-            sections = [s for s in sections if s.strip()]
-
-            for section in sections:
-                focus = _parse_research_focus(section)
-                if focus and _is_valid_focus(focus):
-                    areas.append(focus)
-            break
-    return areas
-
-def _parse_research_focus(text: str) -> Optional[ResearchFocus]:
-    """Parse research focus with improved validation without reasoning."""
-    try:
-        # Extract area
-        area = text.split('\n')[0].strip()
-
-        # Extract and validate priority
-        priority = _extract_priority(text)
-
-        # Return ResearchFocus without reasoning
-        return ResearchFocus(
-            area=area,
-            priority=priority
-        )
-
-    except Exception as e:
-        return None
-
-def _extract_priority(text: str) -> int:
-    """Extract priority with validation"""
-    for pattern in patterns['priority']:
-        priority_match = re.search(pattern, text)
-        if priority_match:
-            try:
-                priority = int(priority_match.group(1))
-                return max(1, min(5, priority))
-            except ValueError:
-                continue
-        return 3  # Default priority
+            areas = [
+                ResearchFocus(area=area, priority=priority)
+                for area, priority in parse_response(text[gap_match.end():]).areas
+            ]
+            return [focus for focus in areas if _is_valid_focus(focus)]
+    return []
 
 def _is_valid_focus(focus: ResearchFocus) -> bool:
     """Validate research focus completeness and quality"""
@@ -162,7 +131,7 @@ def _normalize_focus_areas(areas: List[ResearchFocus]) -> List[ResearchFocus]:
 
         area.priority = max(1, min(5, area.priority))
 
-    if _is_valid_focus(area):
+        if _is_valid_focus(area):
             normalized.append(area)
 
     # Sort by priority (highest first) but don't add any filler areas
@@ -0,0 +1,372 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .prompt_builder import PromptBuilder, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+SECTION_SEPARATOR = "=" * 80
+
+def pack_sections(sections: Iterable[str], max_tokens: int) -> Iterator[str]:
+    """
+    Pack document sections into chunks of at most max_tokens estimated tokens.
+
+    Sections may still contain the separators written by add_to_document; they are split on
+    them. A section is only split when it is larger than a whole chunk on its own. Sections are
+    consumed lazily, so the full document never has to exist as one string.
+    """
+    current: List[str] = []
+    current_tokens = 0
+    words_per_chunk = max(1, int(max_tokens / 1.3))
+
+    for text in sections:
+        for section in text.split(SECTION_SEPARATOR):
+            section = section.strip()
+            if not section:
+                continue
+            section_tokens = estimate_tokens(section)
+            if section_tokens > max_tokens:
+                # Flush what we have, then split the oversized section by words
+                if current:
+                    yield "\n\n".join(current)
+                    current, current_tokens = [], 0
+                words = section.split()
+                for i in range(0, len(words), words_per_chunk):
+                    yield " ".join(words[i:i + words_per_chunk])
+                continue
+
+            if current and current_tokens + section_tokens > max_tokens:
+                yield "\n\n".join(current)
+                current, current_tokens = [], 0
+            current.append(section)
+            current_tokens += section_tokens
+
+    if current:
+        yield "\n\n".join(current)
+
+def split_into_chunks(text: str, max_tokens: int) -> List[str]:
+    """Split a research document into chunks of at most max_tokens estimated tokens"""
+    return list(pack_sections([text], max_tokens))
+
+class MapReduceSummarizer:
+    """
+    Summarizes documents of any size with a bounded context window.
+
+    The document is split into chunks that fit the context, every chunk is summarized in
+    parallel (map), and the partial summaries are merged in groups, also in parallel, until
+    they fit into a single final prompt (tree reduce).
+    """
+
+    def __init__(self, llm, n_ctx: int = 2048, max_workers: int = 4, fan_in: int = 4,
+                 chunk_max_tokens: int = 500, final_max_tokens: int = 4000):
+        self.llm = llm
+        self.max_workers = max_workers
+        self.fan_in = max(2, fan_in)
+        self.chunk_max_tokens = chunk_max_tokens
+        self.final_max_tokens = final_max_tokens
+        # Leave roughly half of the context for instructions and the generated output
+        self.chunk_tokens = max(256, int(n_ctx * 0.5))
+
+    def summarize(self, content: str, original_query: str) -> str:
+        """Produce the final research summary for the given document content"""
+        return self.summarize_sections([content], original_query)
+
+    def summarize_sections(self, sections: Iterable[str], original_query: str) -> str:
+        """Produce the final research summary from document sections, consumed as a stream"""
+        chunks = list(pack_sections(sections, self.chunk_tokens))
+        if not chunks:
+            return ""
+
+        notes = chunks
+        if len(chunks) > 1:
+            print(f"Summarizing {len(chunks)} document chunks...")
+            notes = self._parallel(lambda chunk: self._summarize_chunk(chunk, original_query), chunks)
+
+        return self.summarize_notes(notes, original_query)
+
+    def summarize_notes(self, notes: List[str], original_query: str) -> str:
+        """Produce the final research summary from already summarized notes"""
+        notes = self.reduce(notes, original_query)
+        return self._final_summary("\n\n".join(notes), original_query)
+
+    def reduce(self, notes: List[str], original_query: str) -> List[str]:
+        """Merge partial summaries level by level until they fit into one prompt"""
+        notes = [n for n in notes if n and n.strip()]
+        while len(notes) > 1 and estimate_tokens("\n\n".join(notes)) > self.chunk_tokens:
+            groups = self._group(notes)
+            if len(groups) == len(notes):
+                # Every note is already too large to be grouped; merging cannot shrink further
+                break
+            print(f"Merging {len(notes)} partial summaries into {len(groups)}...")
+            notes = self._parallel(lambda group: self._merge_notes(group, original_query), groups)
+        return notes
+
+    def _group(self, notes: List[str]) -> List[List[str]]:
+        """Group notes so that every group fits the chunk budget and has at most fan_in members"""
+        groups: List[List[str]] = []
+        current: List[str] = []
+        current_tokens = 0
+        for note in notes:
+            note_tokens = estimate_tokens(note)
+            if current and (len(current) >= self.fan_in or current_tokens + note_tokens > self.chunk_tokens):
+                groups.append(current)
+                current, current_tokens = [], 0
+            current.append(note)
+            current_tokens += note_tokens
+        if current:
+            groups.append(current)
+        return groups
+
+    def _parallel(self, func, items: list) -> List[str]:
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return [result for result in executor.map(func, items) if result]
+
+    def _summarize_chunk(self, chunk: str, original_query: str) -> Optional[str]:
+        prompt = f"""
+Extract and summarize the findings in the following research content that are relevant to the research question "{original_query}".
+Keep concrete facts, figures, dates and the source URLs they came from. Leave out anything irrelevant.
+
+Research Content:
+{chunk}
+
+Relevant Findings:
+"""
+        return self._generate(prompt, self.chunk_max_tokens)
+
+    def _merge_notes(self, notes: List[str], original_query: str) -> Optional[str]:
+        if len(notes) == 1:
+            return notes[0]
+        joined = "\n\n".join(f"Notes {i}:\n{note}" for i, note in enumerate(notes, 1))
+        prompt = f"""
+Combine the following sets of research notes about "{original_query}" into a single set of notes.
+Remove duplicate information, keep concrete facts, figures, dates and source URLs, and note any disagreements between sources.
+
+{joined}
+
+Combined Notes:
+"""
+        return self._generate(prompt, self.chunk_max_tokens)
+
+    def _final_summary(self, notes: str, original_query: str) -> str:
+        # Notes that could not be merged any further are clipped rather than overflowing the context
+        builder = PromptBuilder(self.chunk_tokens, section_format="{text}")
+        builder.add(notes, normalize=False)
+        notes = builder.build()
+        prompt = f"""
+        Analyze the following content to provide a comprehensive research summary and a response to the user's original query "{original_query}" ensuring that you conclusively answer the query in detail:
+
+        Research Content:
+        {notes}
+
+        Important Instructions:
+        > Summarize the research findings that are relevant to the Original topic/question: "{original_query}"
+        > Ensure that in your summary you directly answer the original question/topic conclusively to the best of your ability in detail.
+        > Read the original topic/question again "{original_query}" and abide by any additional instructions that it contains, exactly as instructed in your summary otherwise provide it normally should it not have any specific instructions
+
+        Summary:
+        """
+        return self._generate(prompt, self.final_max_tokens) or ""
+
+    def _generate(self, prompt: str, max_tokens: int) -> Optional[str]:
+        try:
+            response = self.llm.generate(prompt, {"max_tokens": max_tokens})
+            return response.strip() if response else None
+        except Exception as e:
+            logger.error(f"Error generating summary: {str(e)}")
+            return None
+
+
+class RollingSummarizer:
+    """
+    Keeps a running summary per focus area, updated in the background as findings arrive.
+
+    Findings are buffered per focus area and folded into that area's summary once enough new
+    text has accumulated, so at the end of a session only a handful of short partial
+    summaries are left to merge instead of the whole document. Findings whose update fails
+    stay pending and are retried after retry_delay seconds.
+    """
+
+    def __init__(self, llm, n_ctx: int = 2048, update_tokens: Optional[int] = None,
+                 summary_max_tokens: int = 500, retry_delay: float = 30.0):
+        self.llm = llm
+        self.original_query = ""
+        self.summary_max_tokens = summary_max_tokens
+        self.retry_delay = retry_delay
+        self.chunk_tokens = max(256, int(n_ctx * 0.5))
+        # The current notes and the new findings share the chunk budget of an update prompt
+        self.notes_tokens = self.chunk_tokens // 2
+        self.findings_tokens = self.chunk_tokens - self.notes_tokens
+        self.update_tokens = update_tokens or max(200, int(n_ctx * 0.25))
+        self._summaries: Dict[str, str] = {}
+        self._pending: Dict[str, List[str]] = {}
+        # Areas whose last update failed, with the time they may be retried
+        self._held: Dict[str, float] = {}
+        self._condition = threading.Condition()
+        self._busy = False
+        self._flushing = False
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, original_query: str):
+        """Start the background update thread"""
+        self.original_query = original_query
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="rolling-summary", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+
+    def add_finding(self, focus_area: str, content: str, source_url: str):
+        """Queue a new finding to be folded into its focus area's summary"""
+        header = f"Source: {source_url}\n"
+        # A finding larger than an update's findings budget is queued in parts
+        parts = [header + part for part in
+                 pack_sections([content], max(1, self.findings_tokens - estimate_tokens(header)))]
+        with self._condition:
+            self._pending.setdefault(focus_area, []).extend(parts)
+            self._condition.notify_all()
+
+    def partial_summaries(self) -> Dict[str, str]:
+        """Current summary of every focus area that has one"""
+        with self._condition:
+            return dict(self._summaries)
+
+    def pending_findings(self) -> Dict[str, List[str]]:
+        """Findings not yet folded into a summary, e.g. because their update failed"""
+        with self._condition:
+            return {area: list(findings) for area, findings in self._pending.items() if findings}
+
+    def get_state(self) -> Dict[str, Dict]:
+        """Summaries and not yet summarized findings, for checkpointing"""
+        with self._condition:
+            return {
+                'summaries': dict(self._summaries),
+                'pending': {area: list(findings) for area, findings in self._pending.items() if findings}
+            }
+
+    def restore_state(self, state: Dict[str, Dict]):
+        """Restore summaries and pending findings saved with get_state"""
+        with self._condition:
+            self._summaries.update(state.get('summaries', {}))
+            for area, findings in state.get('pending', {}).items():
+                self._pending.setdefault(area, []).extend(findings)
+            self._condition.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> Dict[str, str]:
+        """
+        Fold all pending findings into the summaries and return them. Every area gets one more
+        attempt; findings whose update fails again stay pending (see pending_findings).
+        """
+        with self._condition:
+            self._held.clear()
+        if not self._thread or not self._thread.is_alive():
+            # No background thread to hand the work to, so update synchronously
+            while True:
+                with self._condition:
+                    batch = self._next_batch(force=True)
+                if not batch:
+                    break
+                self._update(*batch)
+            return self.partial_summaries()
+
+        with self._condition:
+            self._flushing = True
+            self._condition.notify_all()
+            self._condition.wait_for(
+                lambda: not self._busy and not any(findings for area, findings in self._pending.items()
+                                                   if area not in self._held),
+                timeout=timeout
+            )
+            self._flushing = False
+            return dict(self._summaries)
+
+    def _next_batch(self, force: bool) -> Optional[Tuple[str, List[str]]]:
+        """Pop the findings for the area with the most pending text, if there is enough of it"""
+        now = time.time()
+        for area in [area for area, retry_at in self._held.items() if retry_at <= now and not self._flushing]:
+            del self._held[area]
+        best_area, best_tokens = None, 0
+        for area, findings in self._pending.items():
+            if area in self._held:
+                continue
+            tokens = sum(estimate_tokens(f) for f in findings)
+            if findings and tokens > best_tokens:
+                best_area, best_tokens = area, tokens
+        if best_area is None or (best_tokens < self.update_tokens and not force):
+            return None
+
+        findings = self._pending[best_area]
+        batch, batch_tokens = [], 0
+        while findings and (not batch or batch_tokens + estimate_tokens(findings[0]) <= self.findings_tokens):
+            finding = findings.pop(0)
+            batch.append(finding)
+            batch_tokens += estimate_tokens(finding)
+        return best_area, batch
+
+    def _run(self):
+        while True:
+            with self._condition:
+                batch = None
+                while not self._stopped:
+                    batch = self._next_batch(force=self._flushing)
+                    if batch:
+                        break
+                    self._condition.notify_all()
+                    self._condition.wait(timeout=1.0)
+                if self._stopped:
+                    return
+                self._busy = True
+            try:
+                self._update(*batch)
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+    def _update(self, focus_area: str, findings: List[str]):
+        current = self._summaries.get(focus_area, "")
+        # Notes and findings are clipped to their share of the budget, e.g. findings restored
+        # from a checkpoint written before they were split
+        notes_builder = PromptBuilder(self.notes_tokens, section_format="{text}")
+        notes_builder.add(current, normalize=False)
+        findings_builder = PromptBuilder(self.findings_tokens, section_format="{text}", separator="\n\n")
+        for finding in findings:
+            findings_builder.add(finding, normalize=False)
+        new_findings = findings_builder.build()
+        prompt = f"""
+You are maintaining running research notes on the focus area "{focus_area}" for the research question "{self.original_query}".
+
+Current Notes:
+{notes_builder.build() or 'None yet.'}
+
+New Findings:
+{new_findings}
+
+Rewrite the notes so they include the relevant new findings. Keep concrete facts, figures, dates and source URLs, remove duplicate information and leave out anything irrelevant to the research question.
+
+Updated Notes:
+"""
+        try:
+            updated = self.llm.generate(prompt, {"max_tokens": self.summary_max_tokens})
+            updated = updated.strip() if updated else ""
+        except Exception as e:
+            logger.error(f"Error updating rolling summary for '{focus_area}': {str(e)}")
+            updated = ""
+
+        with self._condition:
+            if updated:
+                self._summaries[focus_area] = updated
+            else:
+                # Keep the current notes and put the findings back for a later attempt
+                self._pending.setdefault(focus_area, [])[:0] = findings
+                self._held[focus_area] = time.time() + self.retry_delay
@@ -1,64 +1,172 @@
 import requests
 from bs4 import BeautifulSoup
 from urllib.robotparser import RobotFileParser
-from urllib.parse import urlparse, urljoin
+from urllib.parse import urlparse, urljoin, unquote
 import time
 import logging
+import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
-import re
+
+from .cancellation import UNCANCELLABLE, abort_response
+from .page_knowledge import PageKnowledgeBase, get_shared_knowledge_base
+from .prompt_builder import normalize_whitespace
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# robots.txt rules per site, shared by every scraper so each site's file is read once per hour
+ROBOTS_CACHE_TTL = 60 * 60
+_robots_cache = {}
+_robots_lock = threading.Lock()
+
+def get_robot_parser(url):
+    """Return a cached RobotFileParser for the site of the given URL, or None if unreadable"""
+    parsed_url = urlparse(url)
+    robots_url = f"{parsed_url.scheme}://{parsed_url.netloc}/robots.txt"
+    now = time.time()
+    with _robots_lock:
+        entry = _robots_cache.get(robots_url)
+    if entry and now - entry[1] < ROBOTS_CACHE_TTL:
+        return entry[0]
+
+    rp = RobotFileParser()
+    rp.set_url(robots_url)
+    try:
+        rp.read()
+    except Exception as e:
+        logger.warning(f"Error reading robots.txt for {url}: {e}")
+        rp = None
+    with _robots_lock:
+        _robots_cache[robots_url] = (rp, now)
+    return rp
+
 class WebScraper:
     def __init__(self, user_agent="WebLLMAssistant/1.0 (+https://github.com/YourUsername/Web-LLM-Assistant-Llama-cpp)",
-                 rate_limit=1, timeout=10, max_retries=3):
+                 rate_limit=1, timeout=10, max_retries=3, pool_size=16,
+                 knowledge_base: PageKnowledgeBase = None):
         self.session = requests.Session()
         self.session.headers.update({"User-Agent": user_agent})
-        self.robot_parser = RobotFileParser()
+        # Keep enough connections per host for every scraping thread that shares this scraper
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         self.rate_limit = rate_limit
         self.timeout = timeout
         self.max_retries = max_retries
         self.last_request_time = {}
+        self._rate_lock = threading.Lock()
+        # Pages extracted in earlier sessions are served from here instead of being fetched again
+        self.knowledge_base = knowledge_base
 
     def can_fetch(self, url):
         parsed_url = urlparse(url)
-        robots_url = f"{parsed_url.scheme}://{parsed_url.netloc}/robots.txt"
-        self.robot_parser.set_url(robots_url)
-        try:
-            self.robot_parser.read()
-            return self.robot_parser.can_fetch(self.session.headers["User-Agent"], url)
-        except Exception as e:
-            logger.warning(f"Error reading robots.txt for {url}: {e}")
+        if parsed_url.scheme == 'file':
+            return True
+        rp = get_robot_parser(url)
+        if rp is None:
             return True  # Assume allowed if robots.txt can't be read
+        return rp.can_fetch(self.session.headers["User-Agent"], url)
 
-    def respect_rate_limit(self, url):
+    def respect_rate_limit(self, url, cancel_token=None):
         domain = urlparse(url).netloc
-        current_time = time.time()
-        if domain in self.last_request_time:
-            time_since_last_request = current_time - self.last_request_time[domain]
-            if time_since_last_request < self.rate_limit:
-                time.sleep(self.rate_limit - time_since_last_request)
-        self.last_request_time[domain] = time.time()
-
-    def scrape_page(self, url):
+        # Reserve the next request slot for the domain under the lock, then wait for it outside,
+        # so threads sharing the scraper never hit a domain at the same moment
+        with self._rate_lock:
+            current_time = time.time()
+            slot = max(current_time, self.last_request_time.get(domain, 0) + self.rate_limit)
+            self.last_request_time[domain] = slot
+        if slot > current_time:
+            (cancel_token or UNCANCELLABLE).sleep(slot - current_time)
+
+    @staticmethod
+    def _iter_body(response, chunk_size=16384):
+        """
+        Body chunks as they arrive. iter_content blocks until a whole chunk is in, which on a
+        slow server delays noticing cancellation; urllib3 2's read1 returns whatever is there.
+        """
+        read1 = getattr(response.raw, 'read1', None)
+        if read1 is None:
+            yield from response.iter_content(chunk_size=chunk_size)
+            return
+        while True:
+            chunk = read1(chunk_size, decode_content=True)
+            if not chunk:
+                return
+            yield chunk
+
+    def fetch(self, url, cancel_token=None):
+        """
+        GET a page's text. The body is read in chunks and the response is aborted if the token
+        is set, so a cancelled fetch stops at once instead of finishing the download.
+        """
+        token = cancel_token or UNCANCELLABLE
+        with self.session.get(url, timeout=self.timeout, stream=True) as response:
+            with token.on_cancel(lambda: abort_response(response)):
+                response.raise_for_status()
+                chunks = []
+                try:
+                    for chunk in self._iter_body(response):
+                        token.raise_if_cancelled()
+                        chunks.append(chunk)
+                except Exception:
+                    # Closing the response under a read fails it in ways that depend on timing
+                    token.raise_if_cancelled()
+                    raise
+            return b"".join(chunks).decode(response.encoding or 'utf-8', errors='replace')
+
+    def scrape_local_file(self, url):
+        """Read a file:// result from an offline corpus instead of fetching it"""
+        try:
+            with open(unquote(urlparse(url).path), 'r', encoding='utf-8', errors='ignore') as f:
+                return self.extract_content(f.read(), url)
+        except OSError as e:
+            logger.error(f"Failed to read local file {url}: {e}")
+            return None
+
+    def scrape_page(self, url, cancel_token=None, knowledge_base: PageKnowledgeBase = None):
+        """
+        Fetch and extract a page; raises Cancelled once cancel_token is set. knowledge_base
+        replaces the scraper's own, e.g. for a session with a knowledge base of its own.
+        """
+        token = cancel_token or UNCANCELLABLE
+        token.raise_if_cancelled()
+        if urlparse(url).scheme == 'file':
+            return self.scrape_local_file(url)
+
+        knowledge_base = knowledge_base if knowledge_base is not None else self.knowledge_base
+        if knowledge_base is not None:
+            try:
+                page = knowledge_base.get(url)
+            except Exception as e:
+                logger.warning(f"Page knowledge base lookup failed for {url}: {e}")
+                page = None
+            if page:
+                logger.info(f"Served from the page knowledge base: {url}")
+                return page
+
         if not self.can_fetch(url):
             logger.info(f"Robots.txt disallows scraping: {url}")
             return None
 
         for attempt in range(self.max_retries):
             try:
-                self.respect_rate_limit(url)
-                response = self.session.get(url, timeout=self.timeout)
-                response.raise_for_status()
-                return self.extract_content(response.text, url)
+                self.respect_rate_limit(url, token)
+                page = self.extract_content(self.fetch(url, token), url)
+                if knowledge_base is not None:
+                    try:
+                        knowledge_base.put(url, page)
+                    except Exception as e:
+                        # e.g. the database is locked by another process; the page is still good
+                        logger.warning(f"Could not store {url} in the page knowledge base: {e}")
+                return page
             except requests.RequestException as e:
+                token.raise_if_cancelled()
                 logger.warning(f"Error scraping {url} (attempt {attempt + 1}/{self.max_retries}): {e}")
                 if attempt == self.max_retries - 1:
                     logger.error(f"Failed to scrape {url} after {self.max_retries} attempts")
                     return None
-                time.sleep(2 ** attempt)  # Exponential backoff
+                token.sleep(2 ** attempt)  # Exponential backoff
 
     def extract_content(self, html, url):
         soup = BeautifulSoup(html, 'html.parser')
@@ -86,7 +194,7 @@ class WebScraper:
             text = soup.get_text()
 
         # Clean up whitespace
-        text = re.sub(r'\s+', ' ', text).strip()
+        text = normalize_whitespace(text)
 
         # Extract and resolve links
         links = [urljoin(url, a['href']) for a in soup.find_all('a', href=True)]
@@ -98,12 +206,24 @@ class WebScraper:
             "links": links[:10]  # Limit to first 10 links
         }
 
-def scrape_multiple_pages(urls, max_workers=5):
-    scraper = WebScraper()
+_shared_scraper = None
+_shared_scraper_lock = threading.Lock()
+
+def get_shared_scraper():
+    """The scraper shared by everything in this process, so page fetches reuse its connections"""
+    global _shared_scraper
+    with _shared_scraper_lock:
+        if _shared_scraper is None:
+            _shared_scraper = WebScraper(knowledge_base=get_shared_knowledge_base())
+        return _shared_scraper
+
+def scrape_multiple_pages(urls, max_workers=5, cancel_token=None, knowledge_base=None):
+    scraper = get_shared_scraper()
     results = {}
 
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_url = {executor.submit(scraper.scrape_page, url): url for url in urls}
+        future_to_url = {executor.submit(scraper.scrape_page, url, cancel_token, knowledge_base): url
+                         for url in urls}
         for future in as_completed(future_to_url):
             url = future_to_url[future]
             try:
@@ -119,22 +239,24 @@ def scrape_multiple_pages(urls, max_workers=5):
     return results
 
 # Function to integrate with your main system
-def get_web_content(urls):
-    scraped_data = scrape_multiple_pages(urls)
+def get_web_content(urls, cancel_token=None, knowledge_base=None):
+    scraped_data = scrape_multiple_pages(urls, cancel_token=cancel_token, knowledge_base=knowledge_base)
     return {url: data['content'] for url, data in scraped_data.items() if data}
 
 # Standalone can_fetch function
-def can_fetch(url):
+def can_fetch(url, knowledge_base=None):
     parsed_url = urlparse(url)
-    robots_url = f"{parsed_url.scheme}://{parsed_url.netloc}/robots.txt"
-    rp = RobotFileParser()
-    rp.set_url(robots_url)
-    try:
-        rp.read()
-        return rp.can_fetch("*", url)
-    except Exception as e:
-        logger.warning(f"Error reading robots.txt for {url}: {e}")
+    if parsed_url.scheme == 'file':
+        return True
+    # A page the knowledge base holds is served without fetching it, so robots.txt is not read
+    if knowledge_base is None:
+        knowledge_base = get_shared_knowledge_base()
+    if knowledge_base.contains(url):
+        return True
+    rp = get_robot_parser(url)
+    if rp is None:
         return True  # Assume allowed if robots.txt can't be read
+    return rp.can_fetch("*", url)
 
 if __name__ == "__main__":
     test_urls = [
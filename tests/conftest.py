@@ -0,0 +1,138 @@
+"""
+Shared fixtures: a scripted stand-in for the LLM server, an offline search provider over a
+corpus of local files, and a working directory of its own for each test, so the caches and
+session files the researcher writes never leave tmp_path.
+"""
+import itertools
+import logging
+import os
+import sys
+import zlib
+from types import SimpleNamespace
+
+import numpy as np
+import openai
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import Self_Improving_Search, page_knowledge, web_scraper
+from src.llm_response_parser import UltimateLLMResponseParser
+from src.page_knowledge import PageKnowledgeBase
+from src.search_cache import SearchCache
+from src.search_providers import SearchProvider
+from src.session_factory import SharedResources
+
+class FakeLLM:
+    """Answers openai.Completion.create calls by recognising the researcher's prompts"""
+
+    def __init__(self):
+        self.prompts = []
+        self._counter = itertools.count()
+
+    def respond(self, prompt: str) -> str:
+        n = next(self._counter)
+        if 'areas to investigate' in prompt:
+            return "\n".join(f"{i}. solar storage topic{n}x{i}\nPriority: {6 - i}" for i in range(1, 6))
+        if 'Search query' in prompt:
+            return f"Search query: solar storage q{n}\nTime range: none"
+        if 'Selected Results' in prompt:
+            return "Selected Results: 1, 2\nReasoning: both are relevant"
+        if 'Search Snippets' in prompt:
+            return "Evaluation: the snippets are too short\nDecision: refine"
+        if 'Decision' in prompt:
+            return "Evaluation: the content answers the question\nDecision: answer"
+        return f"Summary {n}: solar storage findings."
+
+    def create(self, prompt, stream=False, **parameters):
+        self.prompts.append(prompt)
+        text = self.respond(prompt)
+        if not stream:
+            return SimpleNamespace(choices=[SimpleNamespace(text=text)])
+        return iter([SimpleNamespace(choices=[SimpleNamespace(text=text[i:i + 8])])
+                     for i in range(0, len(text), 8)])
+
+class FakeSearchProvider(SearchProvider):
+    """Returns a page of file:// results per query, written on demand into a corpus directory"""
+
+    name = "fake"
+    cacheable = False
+
+    def __init__(self, corpus_dir, results_per_query: int = 4):
+        self.corpus_dir = corpus_dir
+        self.results_per_query = results_per_query
+        self.queries = []
+        self._counter = itertools.count()
+
+    def search(self, query, time_range='none', max_results=10):
+        self.queries.append(query)
+        results = []
+        for _ in range(min(self.results_per_query, max_results)):
+            n = next(self._counter)
+            path = os.path.join(self.corpus_dir, f"page{n}.html")
+            words = " ".join(f"fact{n}w{i}" for i in range(200))
+            with open(path, 'w') as f:
+                f.write(f"<html><head><title>Page {n}</title></head><body><p>Solar storage {n}. {words}</p></body></html>")
+            results.append({'title': f"Page {n}", 'href': f"file://{path}", 'body': f"Solar storage page {n} covers batteries, pumped hydro and thermal storage for grids."})
+        return results
+
+class HashEmbedder:
+    """Deterministic bag-of-words vectors, so tests need no embedding model; records what it embeds"""
+
+    def __init__(self):
+        self.embedded = []
+
+    def embed(self, texts):
+        self.embedded.extend(texts)
+        vectors = np.zeros((len(texts), 64), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, zlib.crc32(word.encode()) % 64] += 1.0
+        return vectors
+
+@pytest.fixture(autouse=True)
+def search_log(tmp_path, monkeypatch):
+    """The search engine logs into the test's directory instead of the repository's logs/"""
+    handler = logging.FileHandler(tmp_path / "llama_output.log", delay=True)
+    handler.setFormatter(Self_Improving_Search.formatter)
+    monkeypatch.setattr(Self_Improving_Search.logger, 'handlers', [handler])
+    yield handler
+    handler.close()
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # Process-wide singletons would otherwise keep their files in the first test's directory
+    monkeypatch.setattr(page_knowledge, '_shared_knowledge_base', None)
+    monkeypatch.setattr(web_scraper, '_shared_scraper', None)
+    return tmp_path
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    llm = FakeLLM()
+    monkeypatch.setattr(openai, 'Completion', SimpleNamespace(create=llm.create), raising=False)
+    return llm
+
+@pytest.fixture
+def fake_provider(workdir):
+    corpus_dir = workdir / "corpus"
+    corpus_dir.mkdir()
+    return FakeSearchProvider(str(corpus_dir))
+
+@pytest.fixture
+def hash_embedder():
+    return HashEmbedder()
+
+@pytest.fixture
+def llm_config():
+    return {'model': 'fake', 'n_ctx': 2048}
+
+@pytest.fixture
+def resources(fake_provider):
+    """Shared resources with in-memory caches around the fake provider"""
+    return SharedResources(
+        search_cache=SearchCache(path=None),
+        search_provider=fake_provider,
+        parser=UltimateLLMResponseParser(),
+        knowledge_base=PageKnowledgeBase(path=None),
+    )
@@ -0,0 +1,43 @@
+import json
+
+from src import batch
+from src.session_store import SessionStore
+
+DEFAULTS = {'preset': 'default', 'queries_per_focus': 1, 'max_minutes': None,
+            'max_llm_tokens': None, 'max_pages': 4, 'max_document_tokens': None}
+
+def write_preset(workdir, llm_config):
+    preset_dir = workdir / "config" / "model_presets"
+    preset_dir.mkdir(parents=True)
+    (preset_dir / "default.json").write_text(json.dumps(llm_config))
+
+def test_job_ids_cannot_leave_the_output_directory(workdir, llm_config):
+    write_preset(workdir, llm_config)
+    queries = workdir / "queries.jsonl"
+    queries.write_text("\n".join(json.dumps(line) for line in [
+        {'id': '../escape', 'query': 'a'},
+        {'id': '/etc/passwd', 'query': 'b'},
+        {'id': '..', 'query': 'c'},
+        {'id': 'plain-id_1.2', 'query': 'd'},
+    ]))
+
+    jobs = batch.load_jobs(str(queries), DEFAULTS, "out")
+
+    assert [job.id for job in jobs] == ['_escape', '_etc_passwd', '0003-c', 'plain-id_1.2']
+
+def test_rerun_starts_a_fresh_store(workdir, fake_llm, resources, llm_config, monkeypatch):
+    monkeypatch.setattr(batch, '_resources', resources)
+    output_dir = workdir / "out"
+    output_dir.mkdir()
+    stale = SessionStore(str(output_dir / "job.db"))
+    stale.add_source("https://stale.example/page", "old area", "Content from the failed attempt.")
+    stale.close()
+    job = batch.BatchJob(id="job", query="How is solar power stored?", llm_config=llm_config,
+                         budget={'max_pages': 4}, queries_per_focus=1, output_dir=str(output_dir))
+
+    record = batch.run_job(job)
+
+    assert record['status'] == 'ok'
+    urls = SessionStore(record['store']).source_urls()
+    assert urls
+    assert "https://stale.example/page" not in urls
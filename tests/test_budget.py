@@ -0,0 +1,105 @@
+import time
+
+import pytest
+
+from src.budget import BudgetScheduler, ResearchBudget
+from src.llm_wrapper import TokenUsage
+from src.research_manager import ResearchFocus
+from src.result_ranker import YieldTracker
+from src.session_factory import build_research_manager
+
+def make_scheduler(budget, document_tokens=0):
+    usage, tracker = TokenUsage(), YieldTracker(target_tokens=100)
+    scheduler = BudgetScheduler(budget, usage, tracker, lambda: document_tokens)
+    scheduler.start()
+    return scheduler, usage, tracker
+
+def test_unlimited_budget_never_runs_out():
+    scheduler, usage, tracker = make_scheduler(ResearchBudget())
+    usage.record(10000, 10000)
+    tracker.record("a", 0)
+
+    assert not ResearchBudget().is_limited()
+    assert scheduler.exhausted() is None
+    assert scheduler.remaining_pages() is None
+    assert scheduler.page_allowance(ResearchFocus(area="a", priority=3), []) is None
+
+def test_time_and_token_limits_keep_a_reserve_for_the_summary():
+    scheduler, usage, _ = make_scheduler(ResearchBudget(max_seconds=100, max_llm_tokens=1000))
+
+    usage.record(850, 0)
+    assert scheduler.exhausted() is None
+    usage.record(50, 0)
+    assert scheduler.exhausted() == 'llm_tokens'
+
+    scheduler, _, _ = make_scheduler(ResearchBudget(max_seconds=100))
+    scheduler.started = time.time() - 91
+    assert scheduler.exhausted() == 'time'
+
+def test_spending_before_start_is_not_counted():
+    usage, tracker = TokenUsage(), YieldTracker()
+    usage.record(500, 500)
+    tracker.record("a", 100)
+    scheduler = BudgetScheduler(ResearchBudget(max_llm_tokens=2000, max_pages=5), usage, tracker, lambda: 0)
+
+    scheduler.start()
+
+    assert scheduler.spent()['llm_tokens'] == 0 and scheduler.spent()['pages'] == 0
+    assert scheduler.remaining_pages() == 5
+
+def test_remaining_pages_follow_the_tightest_limit_at_the_observed_cost():
+    scheduler, usage, tracker = make_scheduler(ResearchBudget(max_llm_tokens=10000, max_pages=20,
+                                                              max_document_tokens=3000), document_tokens=1000)
+    # Token cost per page is unknown until the first fetch
+    assert scheduler.remaining_pages() == 2
+
+    tracker.record("a", 100)
+    tracker.record("a", 300)
+    usage.record(3000, 0)
+
+    # Tokens: (9000 - 3000) / 1500 = 4; document: (3000 - 1000) / 200 = 10; pages: 18
+    assert scheduler.remaining_pages() == 4
+    assert scheduler.exhausted() is None
+    usage.record(6000, 0)
+    assert scheduler.remaining_pages() == 0
+    # Not a single page more can be paid for, so research must stop rather than idle
+    assert scheduler.exhausted() == 'llm_tokens'
+
+def test_a_limit_too_small_for_one_page_is_exhausted_from_the_start():
+    scheduler, _, _ = make_scheduler(ResearchBudget(max_document_tokens=600))
+
+    assert scheduler.remaining_pages() == 0
+    assert scheduler.exhausted() == 'document_tokens'
+
+def test_pages_are_shared_by_priority_weighted_with_yield():
+    scheduler, _, tracker = make_scheduler(ResearchBudget(max_pages=10))
+    strong = ResearchFocus(area="strong", priority=2)
+    weak = ResearchFocus(area="weak", priority=4)
+    fresh = ResearchFocus(area="fresh", priority=4)
+    tracker.record("strong", 400)
+    tracker.record("weak", 0)
+    tracker.record("weak", 0)
+
+    # Weights: strong 2 * 2.0, weak 4 * 0.25, fresh 4 over 7 remaining pages
+    assert scheduler.remaining_pages() == 7
+    assert scheduler.page_allowance(strong, [strong, weak, fresh]) == 4
+    assert scheduler.page_allowance(weak, [strong, weak, fresh]) == 1
+    assert scheduler.page_allowance(fresh, [strong, weak]) == 4
+    assert scheduler.report() == "time 0, llm tokens 0, pages 3/10, document tokens 0"
+
+@pytest.mark.parametrize("budget, resource", [
+    (ResearchBudget(max_llm_tokens=6000), 'llm_tokens'),
+    (ResearchBudget(max_document_tokens=2500), 'document_tokens'),
+])
+def test_an_exhausted_budget_ends_research_with_a_summary(workdir, fake_llm, resources, llm_config, budget, resource):
+    events = []
+    manager = build_research_manager(llm_config, resources, budget=budget,
+                                     on_event=lambda event, data: events.append((event, data)))
+
+    summary = manager.run_budgeted("How is solar power stored?", str(workdir / "session.txt"))
+
+    assert manager.budget_exhausted == resource
+    assert summary
+    assert ('budget_exhausted', resource) in [(event, data.get('resource')) for event, data in events]
+    assert manager.get_status()['sources'] > 0
+    assert 'summary' in [event for event, _ in events]
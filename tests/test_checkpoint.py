@@ -0,0 +1,100 @@
+"""Resuming a research session from its store, checkpoint and vectors file"""
+import json
+
+import pytest
+
+from src.checkpoint import checkpoint_path, find_session, load_checkpoint, save_checkpoint
+from src.embeddings import SemanticIndex
+from src.novelty import FocusHistory
+from src.research_manager import ResearchFocus
+from src.session_factory import build_research_manager
+
+FINDINGS = [
+    ("https://example.com/batteries", "Batteries", "Lithium batteries store solar power for the night."),
+    ("https://example.com/hydro", "Pumped hydro", "Pumped hydro moves water uphill when power is cheap."),
+    ("https://example.com/thermal", "Thermal", "Molten salt keeps concentrated solar heat for hours."),
+]
+
+def make_manager(llm_config, resources, embedder):
+    manager = build_research_manager(llm_config, resources)
+    manager.semantic_index = SemanticIndex(embedder)
+    manager.focus_history = FocusHistory(manager.semantic_index)
+    # The terminal loop is not part of resuming
+    manager._run_interactive = lambda: None
+    return manager
+
+def test_resume_reopens_the_session_vectors_without_embedding(workdir, fake_llm, resources, llm_config, hash_embedder):
+    first = make_manager(llm_config, resources, hash_embedder)
+    first.original_query = "How is solar power stored?"
+    first.document_path = "research_session_1.txt"
+    first._open_store("research_session_1.db", "1")
+    for url, area, content in FINDINGS[:2]:
+        first.add_to_document(content, url, area)
+    first.store.close()
+
+    resumed_embedder = type(hash_embedder)()
+    resumed = make_manager(llm_config, resources, resumed_embedder)
+    resumed.resume_research("1")
+
+    assert resumed_embedder.embedded == []
+    assert len(resumed.semantic_index) == len(first.semantic_index)
+    # The reopened rows still line up with their chunks, and new findings are appended to them
+    resumed.add_to_document(FINDINGS[2][2], FINDINGS[2][0], FINDINGS[2][1])
+    chunk, _ = resumed.semantic_index.search("pumped hydro water uphill", k=1)[0]
+    assert chunk.source_url == "https://example.com/hydro"
+    chunk, _ = resumed.semantic_index.search("molten salt heat", k=1)[0]
+    assert chunk.source_url == "https://example.com/thermal"
+
+def test_checkpoint_round_trip_and_version_check(tmp_path):
+    path = str(tmp_path / "research_session_1.checkpoint.json")
+
+    save_checkpoint(path, {'cycle': 3, 'searched_urls': ["https://example.com/a"]})
+
+    assert load_checkpoint(path)['cycle'] == 3
+    assert not (tmp_path / "research_session_1.checkpoint.json.tmp").exists()
+    (tmp_path / "old.json").write_text(json.dumps({'version': 0, 'cycle': 1}))
+    assert load_checkpoint(str(tmp_path / "old.json")) is None
+    (tmp_path / "torn.json").write_text('{"version": 1, "cyc')
+    assert load_checkpoint(str(tmp_path / "torn.json")) is None
+    assert load_checkpoint(str(tmp_path / "missing.json")) is None
+
+@pytest.mark.parametrize("session", ["4", "research_session_4", "research_session_4.txt",
+                                     "research_session_4.db", "research_session_4.checkpoint.json"])
+def test_find_session_accepts_any_session_file(workdir, session):
+    (workdir / "research_session_4.db").write_bytes(b"")
+
+    assert find_session(session) == ("research_session_4.txt", "research_session_4.db",
+                                     checkpoint_path("research_session_4.txt"))
+
+def test_find_session_without_a_store_fails(workdir):
+    with pytest.raises(FileNotFoundError):
+        find_session("9")
+
+def test_resume_continues_without_repeating_llm_or_network_work(workdir, fake_llm, fake_provider, resources, llm_config):
+    first = build_research_manager(llm_config, resources)
+    first.original_query = "How is solar power stored?"
+    first.document_path = "research_session_2.txt"
+    first.checkpoint_path = checkpoint_path(first.document_path)
+    first._open_store("research_session_2.db", "2")
+    first.add_to_document(FINDINGS[0][2], FINDINGS[0][0], FINDINGS[0][1])
+    first.searched_urls.add("https://example.com/duplicate")
+    first.cycle = 2
+    first.completed_areas.add("Batteries")
+    first.focus_scheduler.extend([ResearchFocus(area="Pumped hydro", priority=4, search_queries=["pumped hydro storage"])])
+    first._maybe_checkpoint(force=True)
+    first.store.close()
+
+    resumed = build_research_manager(llm_config, resources)
+    resumed._run_interactive = lambda: None
+    resumed.resume_research("2")
+
+    assert resumed.cycle == 2
+    assert resumed.completed_areas == {"Batteries"}
+    assert resumed.searched_urls == {FINDINGS[0][0], "https://example.com/duplicate"}
+    assert [focus.area for focus in resumed._resume_focus_areas] == ["Pumped hydro"]
+    assert len(resumed.findings_index) > 0
+    # The pending area keeps its queries, so continuing it needs no new query formulation
+    focus = resumed._resume_focus_areas[0]
+    assert resumed._stage_formulate(focus, None) == [["pumped hydro storage"]]
+    assert fake_llm.prompts == []
+    assert fake_provider.queries == []
@@ -0,0 +1,48 @@
+import threading
+
+import numpy as np
+
+from src.embeddings import SemanticIndex
+from src.session_factory import build_research_manager
+
+def test_index_is_memory_mapped_to_its_path(tmp_path, hash_embedder):
+    path = tmp_path / "session.vectors.npy"
+    index = SemanticIndex(hash_embedder, path=str(path))
+    index.add("Batteries store solar power for the night.", "https://example.com/a")
+    index.add("Pumped hydro moves water uphill.", "https://example.com/b")
+
+    assert path.exists()
+    assert isinstance(index.vectors.matrix, np.memmap)
+    best, _ = index.search("solar batteries", k=1)[0]
+    assert best.source_url == "https://example.com/a"
+
+def test_search_while_adding_never_sees_rows_without_chunks(hash_embedder):
+    index = SemanticIndex(hash_embedder, chunk_words=5, initial_capacity=8)
+    errors = []
+
+    def add():
+        for i in range(300):
+            index.add(f"solar storage finding number {i} with more words", f"https://example.com/{i}")
+
+    def search():
+        try:
+            for _ in range(300):
+                index.search("solar storage finding", k=3)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=add), threading.Thread(target=search)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+
+def test_session_vectors_are_kept_next_to_the_store(workdir, fake_llm, resources, llm_config, hash_embedder):
+    manager = build_research_manager(llm_config, resources)
+    manager.semantic_index = SemanticIndex(hash_embedder)
+    manager.document_path = str(workdir / "session.txt")
+
+    manager._open_store(str(workdir / "session.db"), "1")
+
+    assert manager.semantic_index.vectors.path == str(workdir / "session.vectors.npy")
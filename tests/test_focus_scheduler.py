@@ -0,0 +1,73 @@
+import threading
+import time
+
+from src.focus_scheduler import FocusScheduler
+from src.research_manager import ResearchFocus
+from src.result_ranker import YieldTracker
+from src.session_factory import build_research_manager
+
+def test_areas_are_taken_by_priority_novelty_and_yield():
+    tracker = YieldTracker(target_tokens=100)
+    scheduler = FocusScheduler(tracker)
+    scheduler.extend([
+        ResearchFocus(area="battery costs", priority=3),
+        ResearchFocus(area="pumped hydro", priority=5, novelty=0.4),
+        ResearchFocus(area="thermal storage", priority=4),
+        ResearchFocus(area="battery costs", priority=5),
+    ])
+
+    assert len(scheduler) == 3
+    assert [focus.area for focus in scheduler.snapshot()] == ["thermal storage", "pumped hydro", "battery costs"]
+
+    # Scores are computed when an area is taken, so a poor yield demotes it
+    tracker.record("thermal storage", 0)
+    assert scheduler.pop().area == "pumped hydro"
+    assert scheduler.pop().area == "battery costs"
+    assert scheduler.pop().area == "thermal storage"
+    assert scheduler.pop() is None
+
+def test_areas_still_yielding_are_requeued_with_new_queries_until_max_passes():
+    tracker = YieldTracker()
+    scheduler = FocusScheduler(tracker, max_passes=2, requeue_yield=150)
+    focus = ResearchFocus(area="battery costs", priority=5, search_queries=["battery prices"])
+    tracker.record(focus.area, 400)
+    first_score = scheduler.score(focus)
+
+    assert scheduler.requeue(focus)
+    assert focus.passes == 1 and focus.search_queries == [] and focus.past_queries == ["battery prices"]
+    assert scheduler.score(focus) == first_score * scheduler.pass_discount
+    assert scheduler.pop() is focus
+
+    assert not scheduler.requeue(focus)
+    assert len(scheduler) == 0
+
+def test_areas_that_stopped_yielding_are_not_requeued():
+    tracker = YieldTracker()
+    scheduler = FocusScheduler(tracker)
+    focus = ResearchFocus(area="battery costs", priority=5)
+    tracker.record(focus.area, 100)
+
+    assert not scheduler.requeue(focus)
+    assert focus.passes == 1
+
+def test_a_low_queue_asks_for_areas_and_pushes_wake_waiters():
+    scheduler = FocusScheduler(YieldTracker(), low_water=1)
+    assert scheduler.needs_areas()
+
+    threading.Timer(0.1, scheduler.extend, [[ResearchFocus(area="a", priority=1),
+                                              ResearchFocus(area="b", priority=1)]]).start()
+    started = time.monotonic()
+    scheduler.wait(timeout=5)
+
+    assert time.monotonic() - started < 2
+    assert not scheduler.needs_areas()
+
+def test_another_pass_is_told_to_avoid_the_queries_already_searched(workdir, fake_llm, resources, llm_config):
+    manager = build_research_manager(llm_config, resources)
+    manager.original_query = "How is solar power stored?"
+    focus = ResearchFocus(area="battery costs", priority=5, past_queries=["battery prices", "lithium cost"])
+
+    manager.formulate_search_queries(focus)
+
+    assert "already searched for this area" in fake_llm.prompts[-1]
+    assert "- battery prices\n- lithium cost" in fake_llm.prompts[-1]
@@ -0,0 +1,114 @@
+import http.server
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import openai
+import pytest
+import requests
+
+from src.cancellation import Cancelled, CancellationToken
+from src.llm_wrapper import LLMWrapper, track_response
+from src.response_parsing import StreamingParser
+
+class NonStreamingServer:
+    """A completion endpoint that rejects stream=True"""
+
+    def __init__(self):
+        self.stream_requests = 0
+        self.requests = 0
+
+    def create(self, prompt, stream=False, **parameters):
+        if stream:
+            self.stream_requests += 1
+            raise ValueError("stream is not supported")
+        self.requests += 1
+        return SimpleNamespace(choices=[SimpleNamespace(text="Search query: solar storage\nTime range: none")])
+
+def test_incremental_generation_stops_trying_to_stream(monkeypatch, llm_config):
+    server = NonStreamingServer()
+    monkeypatch.setattr(openai, 'Completion', SimpleNamespace(create=server.create), raising=False)
+    llm = LLMWrapper(llm_config)
+
+    for _ in range(3):
+        parser = StreamingParser(required_fields=('query',))
+        llm.generate_incremental("Search query:", parser)
+        assert parser.parsed.query == "solar storage"
+
+    assert not llm.can_stream
+    assert server.stream_requests == 1
+    assert server.requests == 3
+
+def test_embedding_preset_keys_are_not_sent_with_completions(monkeypatch, fake_llm, llm_config):
+    sent = []
+    monkeypatch.setattr(openai.Completion, 'create',
+                        lambda prompt, **parameters: sent.append(parameters) or fake_llm.create(prompt, **parameters))
+    llm = LLMWrapper({**llm_config, 'embedding_model': 'nomic-embed-text', 'embedding_backend': 'api',
+                      'embedding_hnsw': True})
+
+    llm.generate("Summarize", max_tokens=20)
+    llm.cancel_token = CancellationToken()
+    llm.generate("Summarize")
+
+    assert len(sent) == 2
+    for parameters in sent:
+        assert not any(key.startswith('embedding_') for key in parameters)
+        assert parameters['model'] == 'fake'
+
+class StalledStreamHandler(http.server.BaseHTTPRequestHandler):
+    """Streams one fragment, then stalls like a server generating slowly"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        event = b'data: {"text": "Solar"}\n\n'
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(event), event))
+        self.wfile.flush()
+        time.sleep(5)
+        self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stalled_server():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StalledStreamHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1/completions"
+    server.shutdown()
+
+def test_cancel_aborts_a_stalled_stream(monkeypatch, llm_config, stalled_server):
+    # Stands in for openai 0.x: a streamed POST through openai.requestssession
+    session = requests.Session()
+    session.hooks['response'].append(track_response)
+
+    def create(prompt, stream=False, **parameters):
+        response = session.post(stalled_server, json={'prompt': prompt}, stream=True)
+        return (SimpleNamespace(choices=[SimpleNamespace(text=json.loads(line[6:])['text'])])
+                for line in response.iter_lines() if line.startswith(b'data: '))
+
+    monkeypatch.setattr(openai, 'Completion', SimpleNamespace(create=create), raising=False)
+    token = CancellationToken()
+    llm = LLMWrapper(llm_config, cancel_token=token)
+    outcome = []
+
+    def generate():
+        try:
+            outcome.append(llm.generate("Search query:"))
+        except Cancelled:
+            outcome.append("cancelled")
+
+    thread = threading.Thread(target=generate)
+    thread.start()
+    time.sleep(0.3)
+    cancelled_at = time.time()
+    token.set()
+    thread.join(timeout=5)
+
+    assert outcome == ["cancelled"]
+    assert time.time() - cancelled_at < 1
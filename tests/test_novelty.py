@@ -0,0 +1,62 @@
+from src.novelty import FocusHistory, lexical_similarity
+from src.research_manager import ResearchFocus
+from src.session_factory import build_research_manager
+
+def test_lexical_similarity_ignores_plurals_and_stop_words():
+    assert lexical_similarity("battery storage costs", "the cost of battery storage") == 1.0
+    assert lexical_similarity("battery storage costs", "pumped hydro reservoirs") == 0.0
+    assert lexical_similarity("", "battery storage") == 0.0
+
+def test_filter_drops_covered_areas_and_demotes_partial_overlaps():
+    history = FocusHistory()
+    history.add(["battery storage costs"])
+    focus_areas = [
+        ResearchFocus(area="costs of battery storage", priority=5),
+        ResearchFocus(area="battery storage safety rules", priority=4),
+        ResearchFocus(area="pumped hydro reservoirs", priority=3),
+    ]
+
+    kept = history.filter(focus_areas)
+
+    assert [focus.area for focus in kept] == ["pumped hydro reservoirs", "battery storage safety rules"]
+    assert kept[0].priority == 3 and kept[0].novelty == 1.0
+    # Two of three words overlap: kept, but two priority levels lower
+    assert kept[1].priority == 2 and 0 < kept[1].novelty < 0.5
+
+def test_filter_drops_near_duplicates_within_one_batch():
+    history = FocusHistory()
+
+    kept = history.filter([
+        ResearchFocus(area="grid scale battery storage", priority=5),
+        ResearchFocus(area="battery storage at grid scale", priority=4),
+    ])
+
+    assert [focus.area for focus in kept] == ["grid scale battery storage"]
+
+def test_covered_areas_are_embedded_once_and_only_when_compared(hash_embedder):
+    history = FocusHistory(hash_embedder)
+    history.add(["lithium cells", "molten salt"])
+    assert hash_embedder.embedded == []
+
+    score, match = history.similarity("lithium cells lithium cells")
+
+    assert match == "lithium cells" and score >= history.drop_threshold
+    assert hash_embedder.embedded[:2] == ["lithium cells", "molten salt"]
+    history.similarity("molten salt")
+    # Covered areas are embedded once, only the candidate is embedded again
+    assert hash_embedder.embedded[2:] == ["lithium cells lithium cells", "molten salt"]
+
+def test_covered_areas_are_fed_back_into_focus_area_generation(workdir, fake_llm, resources, llm_config):
+    manager = build_research_manager(llm_config, resources)
+    manager.original_query = "How is solar power stored?"
+
+    first = manager._generate_focus_areas()
+    second = manager._generate_focus_areas()
+
+    assert first and second
+    assert len(manager.focus_history) == len(first) + len(second)
+    generation_prompts = [prompt for prompt in fake_llm.prompts if 'areas to investigate' in prompt]
+    assert "already been investigated" not in generation_prompts[0]
+    assert "already been investigated" in generation_prompts[-1]
+    for focus in first:
+        assert f"- {focus.area}" in generation_prompts[-1]
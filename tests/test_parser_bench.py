@@ -0,0 +1,81 @@
+import json
+import os
+import random
+
+import pytest
+
+from src import response_corpus
+from src.parser_bench import MUTATIONS, format_report, mutate, run_benchmark, strict_parse
+from src.response_corpus import ResponseRecorder, enable_recording, load_corpus, record_response
+from src.strategic_analysis_parser import parse_analysis
+
+SEED_CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           response_corpus.DEFAULT_CORPUS_DIR)
+
+@pytest.fixture
+def recording(monkeypatch):
+    # Keep recording switched off for every other test
+    monkeypatch.setattr(response_corpus, '_recorder', None)
+
+def test_recorder_keeps_one_record_per_distinct_response_and_model(tmp_path):
+    path = str(tmp_path / "corpus" / "session.jsonl")
+    recorder = ResponseRecorder(path, model="small")
+    recorder.record('query', "Search query: solar")
+    recorder.record('query', "Search query: solar")
+    recorder.record('evaluation', "Search query: solar")
+
+    # A new recorder on the same file knows what is already in it
+    ResponseRecorder(path, model="small").record('query', "Search query: solar")
+    ResponseRecorder(path, model="large").record('query', "Search query: solar")
+
+    records = load_corpus(str(tmp_path / "corpus"))
+    assert [(r['kind'], r['model']) for r in records] == [('query', 'small'), ('evaluation', 'small'), ('query', 'large')]
+    assert all(r['source'] == "session.jsonl" for r in records)
+
+def test_parsers_record_responses_only_while_recording_is_enabled(tmp_path, recording):
+    path = tmp_path / "corpus.jsonl"
+    response = "Research Gaps:\n1. Battery costs\nPriority: 4"
+
+    parse_analysis(response)
+    assert not path.exists()
+
+    enable_recording(str(path), model="preset")
+    parse_analysis(response)
+    record_response('query', "")
+
+    assert [json.loads(line)['kind'] for line in path.read_text().splitlines()] == ['analysis']
+
+def test_analysis_headings_may_have_a_space_before_the_colon():
+    result = parse_analysis("Research Gaps :\n1. Battery costs\nPriority: 4\n2. Pumped hydro\nPriority: 2")
+
+    assert [(f.area, f.priority) for f in result.focus_areas] == [("Battery costs", 4), ("Pumped hydro", 2)]
+
+def test_mutations_are_seeded_and_keep_crlf_last():
+    text = "Evaluation: good\nDecision: answer"
+
+    assert mutate(text, random.Random(3)) == mutate(text, random.Random(3))
+    for seed in range(50):
+        mutated, names = mutate(text, random.Random(seed))
+        assert 1 <= len(names) <= 3 and set(names) <= set(MUTATIONS)
+        if 'crlf' in names:
+            assert names[-1] == 'crlf' and '\r\n' in mutated
+
+def test_strict_baseline_accepts_only_the_exact_prompt_format():
+    assert strict_parse('evaluation', "Evaluation: good\nDecision: answer")
+    assert not strict_parse('evaluation', "**Evaluation:** good\n**Decision:** answer")
+    assert strict_parse('query', "Search query: solar storage\nTime range: none")
+    assert not strict_parse('query', "search query: solar storage\ntime range: none")
+
+def test_seed_corpus_parses_fully_and_survives_fuzzing():
+    records = load_corpus(SEED_CORPUS)
+
+    stats = run_benchmark(records, fuzz=5, seed=1)
+
+    assert sum(s.total for s in stats.values()) == len(records)
+    for kind, s in stats.items():
+        assert s.success == s.total, (kind, s.failures)
+        assert s.crashes == 0 and s.fuzz_success == s.fuzz_total, (kind, s.failures)
+        # Every kind in the seed corpus holds a response the exact-format parser would reject
+        assert s.retries_avoided > 0
+    report = format_report(stats).splitlines()
+    assert report[-1].split()[:3] == ['all', str(len(records)), '100%']
@@ -0,0 +1,69 @@
+from src.prompt_builder import PromptBuilder, content_budget, estimate_tokens, truncate_to_tokens
+
+def words(count, word="word"):
+    return " ".join(f"{word}{i}" for i in range(count))
+
+def test_truncation_and_content_budget():
+    assert truncate_to_tokens("short text", 100) == "short text"
+    assert truncate_to_tokens(words(10), 0) == ""
+    clipped = truncate_to_tokens(words(1000), 130)
+    assert clipped.endswith(" ...") and estimate_tokens(clipped) <= 130
+
+    template = words(100)
+    assert content_budget(4096, template, max_output_tokens=500) == 4096 - 130 - 500
+    assert content_budget(512, template, max_output_tokens=500) == 256
+
+def test_sections_are_normalized_and_built_by_priority_then_insertion_order():
+    builder = PromptBuilder(1000, section_format="[{index}] {source}: {text}")
+
+    builder.add("first   low\n\npriority", "a")
+    builder.add("high priority", "b", priority=2)
+    builder.add("second low priority", "c")
+    builder.add(" \n ", "d")
+
+    assert builder.build() == "[1] b: high priority\n[2] a: first low priority\n[3] c: second low priority"
+    assert len(builder) == 3
+
+def test_a_source_is_clipped_to_its_quota_and_then_dropped():
+    builder = PromptBuilder(2000, per_source_tokens=100, section_format="{text}")
+
+    assert builder.add(words(500), "https://a.example")
+    assert not builder.add(words(50), "https://a.example")
+    assert builder.add(words(50), "https://b.example")
+
+    assert builder.dropped == 1
+    assert estimate_tokens(builder.build()) <= 200
+
+def test_lower_priority_sections_are_evicted_to_fit_the_budget():
+    builder = PromptBuilder(300, section_format="{source}: {text}", min_section_tokens=50)
+
+    builder.add(words(100, "low"), "low", priority=0)
+    builder.add(words(100, "mid"), "mid", priority=1)
+    assert builder.add(words(100, "top"), "top", priority=2)
+    # Lowest ranked newcomers are clipped into the space left, or dropped when too little is left
+    assert not builder.add(words(100, "late"), "late", priority=0)
+
+    prompt = builder.build()
+    assert prompt.startswith("top: top0") and "mid: mid0" in prompt
+    assert "late0" not in prompt
+    assert builder.used_tokens <= builder.max_tokens
+    assert estimate_tokens(prompt) <= builder.max_tokens
+
+def test_scraped_pages_share_the_content_budget(llm_config):
+    from src.llm_response_parser import UltimateLLMResponseParser
+    from src.llm_wrapper import LLMWrapper
+    from src.page_knowledge import PageKnowledgeBase
+    from src.search_cache import SearchCache
+    from src.Self_Improving_Search import EnhancedSelfImprovingSearch
+
+    engine = EnhancedSelfImprovingSearch(LLMWrapper(llm_config), UltimateLLMResponseParser(),
+                                         search_cache=SearchCache(path=None),
+                                         knowledge_base=PageKnowledgeBase(path=None))
+    pages = {f"https://site{n}.example": words(2000, f"p{n}w") for n in range(3)}
+
+    formatted = engine.format_scraped_content(pages, max_tokens=900)
+
+    assert estimate_tokens(formatted) <= 900
+    for n in range(3):
+        assert f"Content from https://site{n}.example:" in formatted
+        assert 150 <= sum(word.startswith(f"p{n}w") for word in formatted.split()) * 1.3 <= 300
@@ -0,0 +1,86 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import openai
+
+from src.budget import ResearchBudget
+from src.research_manager import ResearchFocus
+from src.session_factory import build_research_manager
+
+def test_budgeted_run_collects_sources(workdir, fake_llm, fake_provider, resources, llm_config):
+    events = []
+    manager = build_research_manager(llm_config, resources,
+                                     budget=ResearchBudget(max_pages=12, max_seconds=60),
+                                     on_event=lambda event, data: events.append(event))
+
+    summary = manager.run_budgeted("How is solar power stored?", str(workdir / "session.txt"))
+
+    status = manager.get_status()
+    assert status['complete']
+    assert status['sources'] >= 6
+    assert fake_provider.queries
+    assert summary
+    assert (workdir / "session.txt").read_text().count("Solar storage") >= 6
+    for event in ('started', 'focus_area_started', 'searching', 'source_added', 'summary'):
+        assert event in events
+
+def test_failed_scrape_releases_claimed_url(workdir, fake_llm, fake_provider, resources, llm_config):
+    manager = build_research_manager(llm_config, resources,
+                                     budget=ResearchBudget(max_pages=1))
+    manager._claimed_urls.add("file:///missing.html")
+
+    assert manager._stage_scrape(ResearchFocus(area="topic", priority=1), "file:///missing.html") == []
+    assert "file:///missing.html" not in manager._claimed_urls
+
+def test_exhausted_budget_cancels_work_in_progress_before_summarizing(workdir, fake_llm, resources, llm_config, monkeypatch):
+    streamed = []
+
+    def slow_create(prompt, stream=False, **parameters):
+        if stream and 'investigate the following research focus' in prompt:
+            # Formulating a query outlasts the time budget
+            def chunks():
+                for _ in range(400):
+                    time.sleep(0.05)
+                    streamed.append(1)
+                    yield SimpleNamespace(choices=[SimpleNamespace(text="x")])
+            return chunks()
+        return fake_llm.create(prompt, stream=stream, **parameters)
+    monkeypatch.setattr(openai.Completion, 'create', slow_create)
+    manager = build_research_manager(llm_config, resources, budget=ResearchBudget(max_seconds=1))
+    workers_at_summary = []
+    terminate_research = manager.terminate_research
+
+    def summarize():
+        workers_at_summary.extend(t.name for t in threading.enumerate() if t.name.startswith("pipeline-"))
+        return terminate_research()
+    monkeypatch.setattr(manager, 'terminate_research', summarize)
+
+    started = time.monotonic()
+    manager.run_budgeted("How is solar power stored?", str(workdir / "session.txt"))
+
+    assert manager.budget_exhausted == 'time'
+    assert time.monotonic() - started < 5
+    assert 0 < len(streamed) < 100
+    assert workers_at_summary == []
+
+def test_fanned_out_queries_are_formulated_in_one_call_and_searched_together(workdir, fake_llm, fake_provider, resources, llm_config, monkeypatch):
+    def diverse_create(prompt, stream=False, **parameters):
+        if 'different search queries' in prompt:
+            fake_llm.prompts.append(prompt)
+            text = "Search query 1: battery storage\nSearch query 2: pumped hydro\nSearch query 3: Battery Storage\n"
+            return iter([SimpleNamespace(choices=[SimpleNamespace(text=line + "\n")]) for line in text.splitlines()])
+        return fake_llm.create(prompt, stream=stream, **parameters)
+    monkeypatch.setattr(openai.Completion, 'create', diverse_create)
+    manager = build_research_manager(llm_config, resources, queries_per_focus=3)
+    manager.original_query = "How is solar power stored?"
+    focus = ResearchFocus(area="storage technologies", priority=5)
+
+    queries = manager.formulate_search_queries(focus)
+    [(query, results)] = manager._stage_search(focus, queries)
+
+    assert queries == ["battery storage", "pumped hydro"]
+    assert len(fake_llm.prompts) == 1 and "Create 3 different search queries" in fake_llm.prompts[0]
+    assert sorted(fake_provider.queries) == ["battery storage", "pumped hydro"]
+    assert query == "battery storage pumped hydro"
+    assert len(results) == 2 * fake_provider.results_per_query
@@ -0,0 +1,94 @@
+import pytest
+
+from src.llm_response_parser import UltimateLLMResponseParser
+from src.response_parsing import StreamingParser, clean_query, parse_response
+from src.strategic_analysis_parser import parse_analysis
+
+def test_evaluation_fields_tolerate_markup_and_continuation_lines():
+    parsed = parse_response(
+        "**Evaluation:** The pages cover storage methods\n"
+        "but give no costs.\n"
+        "- **Decision**: Refine.\n"
+    )
+
+    assert parsed.evaluation == "The pages cover storage methods but give no costs."
+    assert parsed.decision == "refine"
+
+def test_page_selection_and_query_fields():
+    parsed = parse_response(
+        "Selected Results: [2, 5]\nReasoning: official data\n"
+        'Search query 1: "lithium supply"\nSearch Query 2: [Lithium Supply]\nquery 3: cobalt prices\n'
+        "Time range: (Y)"
+    )
+
+    assert parsed.selected_results == [2, 5]
+    assert parsed.reasoning == "official data"
+    # Duplicate queries are dropped case-insensitively once cleaned
+    assert parsed.queries == ["lithium supply", "cobalt prices"]
+    assert parsed.query == "lithium supply"
+    assert parsed.time_range == 'y'
+    assert parse_response("Time range: fortnight").time_range is None
+
+@pytest.mark.parametrize("response", [
+    "1. Battery costs\nPriority: 5\n\n2. Grid storage\nPriority: 9\n\n3. Thermal storage",
+    "1) Battery costs (Priority: 5)\n2) Grid storage - priority 9\n3) Thermal storage",
+    "1. **Battery costs**\n**Priority Level:** 5\n2. [Grid storage]\nImportance = 7\n3. Thermal storage\n",
+])
+def test_numbered_areas_with_inline_next_line_or_missing_priorities(response):
+    assert parse_response(response).areas == [("Battery costs", 5), ("Grid storage", 5), ("Thermal storage", 3)]
+
+def test_clean_query_strips_markup_and_limits_length():
+    assert clean_query(' **"solar   storage"** ') == "solar storage"
+    assert len(clean_query("word " * 50)) == 100
+
+def test_streaming_parser_reports_areas_and_queries_as_lines_complete():
+    areas, queries = [], []
+    parser = StreamingParser(expected_areas=2, on_area=lambda area, priority: areas.append((area, priority)),
+                             on_query=queries.append)
+    text = "1. Battery costs\nPriority: 4\n2. Grid storage\n"
+
+    for i in range(0, len(text), 3):
+        parser.feed(text[i:i + 3])
+    assert areas == [("Battery costs", 4)]
+    assert not parser.is_complete()
+
+    parser.feed("Search query: grid batteries\n")
+    assert queries == ["grid batteries"]
+    # The open area closes at the end of the response, with the default priority
+    assert parser.finish().areas == [("Battery costs", 4), ("Grid storage", 3)]
+    assert parser.is_complete()
+    assert not StreamingParser().is_complete()
+
+def test_required_fields_complete_the_stream():
+    parser = StreamingParser(required_fields=('queries', 'time_range'))
+    parser.feed("Search query: solar storage\n")
+    assert not parser.is_complete()
+    parser.feed("Time range: none\n")
+    assert parser.is_complete()
+
+def test_search_mode_parser_falls_back_from_fields_to_json_to_keywords():
+    parser = UltimateLLMResponseParser()
+
+    structured = parser.parse_llm_response("Selected Results: 3, 1, 2\nReasoning: recent data")
+    assert structured['selected_results'] == [3, 1]
+    assert structured['reasoning'] == "recent data"
+
+    from_json = parser.parse_llm_response('Here you go: {"decision": "answer", "response": "Batteries."}')
+    assert from_json['decision'] == 'answer' and from_json['response'] == "Batteries."
+
+    implicit = parser.parse_llm_response("The content is insufficient, more research is needed.")
+    assert implicit['decision'] == 'refine'
+
+def test_strategic_analysis_keeps_every_area():
+    result = parse_analysis(
+        "Original Question Analysis: How is solar power stored?\n"
+        "Research Gaps:\n"
+        "1. Battery costs\nPriority: 3\n"
+        "2. Pumped hydro\nPriority: 5\n"
+        "3. Thermal storage\nPriority: 4\n"
+    )
+
+    assert result.original_question == "How is solar power stored?"
+    assert [(f.area, f.priority) for f in result.focus_areas] == [
+        ("Pumped hydro", 5), ("Thermal storage", 4), ("Battery costs", 3)
+    ]
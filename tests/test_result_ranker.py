@@ -0,0 +1,116 @@
+from src.result_ranker import PageSelectionPolicy, RankedResult, ResultRanker, YieldTracker
+
+QUERY = "solar battery storage capacity"
+
+def result(number, title, body, domain="example.com"):
+    return {'number': number, 'title': title, 'body': body, 'href': f"https://{domain}/{number}"}
+
+def test_uniformly_weak_results_are_not_confident():
+    ranker = ResultRanker()
+    results = [
+        result(1, "Solar eclipse", "Photos of last year's eclipse."),
+        result(2, "Cooking", "Recipes for the weekend."),
+        result(3, "Football", "Scores from the league."),
+    ]
+
+    ranked = ranker.rank(results, QUERY)
+
+    # Normalization still puts the only partial match near the top score
+    assert ranked[0].result['number'] == 1 and ranked[0].score >= ranker.min_score
+    assert not ranker.is_confident(ranked, 1)
+
+def test_a_result_covering_the_query_is_confident():
+    ranker = ResultRanker()
+    results = [
+        result(1, "Solar battery storage", "How storage capacity of home battery systems is rated."),
+        result(2, "Cooking", "Recipes for the weekend."),
+        result(3, "Football", "Scores from the league."),
+    ]
+
+    ranked = ranker.rank(results, QUERY)
+
+    assert ranked[0].coverage == 1.0
+    assert ranker.is_confident(ranked, 1)
+
+def test_domain_priors_and_unscrapeable_files_adjust_the_score():
+    ranker = ResultRanker()
+
+    assert ranker.domain_prior("https://en.wikipedia.org/wiki/Battery") == 0.15
+    assert ranker.domain_prior("https://energy.gov/storage") == 0.15
+    assert ranker.domain_prior("https://www.youtube.com/watch?v=1") == -0.3
+    assert ranker.domain_prior("https://notyoutube.com/") == 0.0
+    assert ranker.domain_prior("https://example.com/report.pdf") == -0.3
+
+    ranked = ranker.rank([
+        result(1, "Solar battery storage", "Capacity of home batteries.", domain="www.youtube.com"),
+        result(2, "Solar battery storage", "Capacity of home batteries.", domain="en.wikipedia.org"),
+    ], QUERY)
+    assert [r.result['number'] for r in ranked] == [2, 1]
+
+def test_seen_pages_rank_below_unseen_ones_and_leave_the_shortlist():
+    ranker = ResultRanker(shortlist_size=2)
+    results = [
+        result(1, "Solar battery storage capacity", "Everything about storage capacity."),
+        result(2, "Solar battery storage", "Battery capacity explained.", domain="other.org"),
+        result(3, "Cooking", "Recipes for the weekend.", domain="third.net"),
+    ]
+
+    ranked = ranker.rank(results, QUERY, seen_urls=["https://example.com/1"])
+
+    assert ranked[-1].result['number'] == 1
+    assert [r['number'] for r in ranker.shortlist(ranked)] == [2, 3]
+
+def test_confidence_needs_a_margin_over_the_next_result():
+    ranker = ResultRanker()
+    results = [
+        result(1, "Solar battery storage capacity", "Home battery storage capacity."),
+        result(2, "Solar battery storage capacity", "Grid battery storage capacity.", domain="other.org"),
+        result(3, "Cooking", "Recipes for the weekend.", domain="third.net"),
+    ]
+
+    ranked = ranker.rank(results, QUERY)
+
+    assert not ranker.is_confident(ranked, 1)
+    assert ranker.is_confident(ranked, 2)
+    assert not ranker.is_confident(ranked, 0)
+    assert not ranker.is_confident(ranked, 4)
+
+def scored(*scores):
+    return [RankedResult(result(n, "", ""), score) for n, score in enumerate(scores, 1)]
+
+def test_page_count_follows_how_many_results_are_worth_fetching():
+    policy = PageSelectionPolicy(max_pages=4)
+
+    assert policy.choose_count(scored(0.3, 0.2)) == 0
+    assert policy.choose_count([]) == 0
+    assert policy.choose_count(scored(1.0, 0.3, 0.2)) == 1
+    assert policy.choose_count(scored(1.0, 0.9, 0.7, 0.2)) == 3
+    assert policy.choose_count(scored(1.0, 1.0, 1.0, 1.0, 1.0, 1.0)) == 4
+
+def test_page_count_shrinks_with_novelty_and_the_remaining_budget():
+    policy = PageSelectionPolicy(max_pages=4)
+    ranked = scored(1.0, 1.0, 1.0, 1.0)
+
+    assert policy.choose_count(ranked, novelty=0.5) == 2
+    # Even a stale session fetches the single best page...
+    assert policy.choose_count(ranked, novelty=0.0) == 1
+    # ...unless the budget has run out
+    assert policy.choose_count(ranked, remaining_budget=3) == 3
+    assert policy.choose_count(ranked, remaining_budget=0) == 0
+
+def test_yield_tracker_counts_failed_fetches_and_follows_recent_novelty():
+    tracker = YieldTracker(window=2, target_tokens=100)
+    assert tracker.novelty_factor() == 1.0
+    assert tracker.yield_per_fetch() == 0.0
+
+    tracker.record("batteries", 300)
+    tracker.record("batteries", 0)
+    tracker.record("hydro", 50)
+
+    assert tracker.fetches == 3 and tracker.new_tokens == 350
+    assert tracker.yield_per_fetch("batteries") == 150
+    assert tracker.yield_per_fetch("hydro") == 50
+    assert tracker.yield_per_fetch("thermal") == 0.0
+    # Only the last two fetches count: (0 + 50) / 2 of a 100 token target
+    assert tracker.novelty_factor() == 0.25
+    assert tracker.report() == "3 fetches, 350 new tokens, 117 tokens/fetch"
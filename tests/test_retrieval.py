@@ -0,0 +1,53 @@
+from src.retrieval import BM25Index, chunk_text
+from src.session_factory import build_research_manager
+from src.summarizer import estimate_tokens
+
+def test_chunks_overlap_and_cover_the_text():
+    words = [f"w{i}" for i in range(300)]
+
+    chunks = chunk_text(" ".join(words), max_words=120, overlap=20)
+
+    assert all(len(chunk.split()) <= 120 for chunk in chunks)
+    assert chunks[0].split()[-20:] == chunks[1].split()[:20]
+    assert set(" ".join(chunks).split()) == set(words)
+
+def test_search_ranks_the_matching_chunk_first_with_its_source():
+    index = BM25Index()
+    index.add("Lithium batteries store solar power for the night.", "https://example.com/batteries", "Batteries")
+    index.add("Pumped hydro moves water uphill when power is cheap.", "https://example.com/hydro", "Hydro")
+    index.add("Grid operators balance supply and demand.", "https://example.com/grid", "Grid")
+
+    results = index.search("pumped hydro water", k=2)
+
+    chunk, score = results[0]
+    assert chunk.source_url == "https://example.com/hydro"
+    assert chunk.focus_area == "Hydro"
+    assert score > 0
+    # Chunks sharing no term with the query are not returned at all
+    assert all(chunk.source_url != "https://example.com/grid" for chunk, _ in results)
+
+def test_rare_terms_outweigh_common_ones():
+    index = BM25Index()
+    for i in range(5):
+        index.add(f"solar power report number {i}", f"https://example.com/{i}")
+    index.add("solar thermal molten salt storage", "https://example.com/salt")
+
+    chunk, _ = index.search("solar molten salt", k=1)[0]
+
+    assert chunk.source_url == "https://example.com/salt"
+
+def test_conversation_context_stays_bounded_as_the_document_grows(workdir, fake_llm, resources, llm_config):
+    manager = build_research_manager(llm_config, resources)
+    manager.original_query = "How is solar power stored?"
+    manager.document_path = str(workdir / "session.txt")
+    manager._open_store(str(workdir / "session.db"), "1")
+    manager.add_to_document("Molten salt tanks keep concentrated solar heat for hours.", "https://example.com/salt", "Thermal")
+    small = manager._retrieve_context("molten salt heat", max_tokens=800)
+    for i in range(200):
+        manager.add_to_document(" ".join(f"filler{i}w{j}" for j in range(150)), f"https://example.com/{i}", "Other")
+
+    context = manager._retrieve_context("molten salt heat", max_tokens=800)
+
+    assert "https://example.com/salt" in small and "https://example.com/salt" in context
+    assert estimate_tokens(context) <= 800
+    assert context.count("Source:") <= manager.retrieval_top_k
@@ -0,0 +1,194 @@
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+from src.cancellation import UNCANCELLABLE
+
+from src.llm_response_parser import UltimateLLMResponseParser
+from src.llm_wrapper import LLMWrapper
+from src.page_knowledge import PageKnowledgeBase
+from src.search_cache import SearchCache
+from src.search_providers import SearchProvider
+from src.Self_Improving_Search import EnhancedSelfImprovingSearch
+
+class BrokenCache(SearchCache):
+    def put(self, *args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+class FailingProvider(SearchProvider):
+    name = "failing"
+
+    def search(self, query, time_range='none', max_results=10):
+        raise ConnectionError("search backend unavailable")
+
+def make_engine(llm_config, provider, cache=None):
+    return EnhancedSelfImprovingSearch(
+        LLMWrapper(llm_config), UltimateLLMResponseParser(),
+        search_cache=cache or SearchCache(path=None),
+        search_provider=provider,
+        knowledge_base=PageKnowledgeBase(path=None)
+    )
+
+def test_cache_write_error_keeps_the_results(llm_config, fake_provider):
+    fake_provider.cacheable = True
+    engine = make_engine(llm_config, fake_provider, cache=BrokenCache(path=None))
+
+    results = engine.perform_search("solar storage", "none")
+
+    assert [result['number'] for result in results] == [1, 2, 3, 4]
+
+def test_provider_error_returns_no_results(llm_config, workdir):
+    engine = make_engine(llm_config, FailingProvider())
+
+    assert engine.perform_search("solar storage", "none") == []
+
+def test_pipelined_search_and_improve_answers_from_scraped_pages(llm_config, fake_llm, fake_provider):
+    engine = make_engine(llm_config, fake_provider)
+
+    answer = engine.search_and_improve("How is solar power stored?", interactive=False, parallel_attempts=2)
+
+    assert answer.startswith("Summary")
+    assert fake_provider.queries
+    # The snippets were judged insufficient, so the pages were scraped and evaluated
+    assert any("Search Snippets" in prompt for prompt in fake_llm.prompts)
+    assert any("scraped content contains sufficient information" in prompt for prompt in fake_llm.prompts)
+    # Attempts still running when the answer came in were stopped, not left behind
+    assert not [t for t in threading.enumerate() if t.name.startswith("search-attempt")]
+
+def test_pipelined_search_falls_back_when_formulating_a_query_fails(llm_config, fake_llm, fake_provider, monkeypatch):
+    def failing_create(prompt, stream=False, **parameters):
+        if 'Search query' in prompt:
+            raise ConnectionError("LLM server unavailable")
+        return fake_llm.create(prompt, stream=stream, **parameters)
+    monkeypatch.setattr(openai.Completion, 'create', failing_create)
+    engine = make_engine(llm_config, fake_provider)
+
+    answer = engine.search_and_improve("How is solar power stored?", interactive=False)
+
+    assert answer.startswith("Summary")
+    assert fake_provider.queries == ["How is solar power stored?"]
+
+def test_pipelined_search_cancels_work_still_running_once_answered(llm_config, fake_llm, fake_provider, monkeypatch):
+    streamed = []
+
+    def slow_create(prompt, stream=False, **parameters):
+        if stream and 'already tried' in prompt:
+            # Formulating the next query takes far longer than the first attempt
+            def chunks():
+                for _ in range(400):
+                    time.sleep(0.05)
+                    streamed.append(1)
+                    yield SimpleNamespace(choices=[SimpleNamespace(text="x")])
+            return chunks()
+        return fake_llm.create(prompt, stream=stream, **parameters)
+    monkeypatch.setattr(openai.Completion, 'create', slow_create)
+    engine = make_engine(llm_config, fake_provider)
+
+    started = time.monotonic()
+    answer = engine.search_and_improve("How is solar power stored?", interactive=False)
+
+    assert answer.startswith("Summary")
+    assert time.monotonic() - started < 5
+    assert 0 < len(streamed) < 100
+    assert not [t for t in threading.enumerate() if t.name.startswith("search-attempt")]
+    # The engine is back on its own token
+    assert engine.cancel_token is UNCANCELLABLE
+
+def file_result(number, title, body):
+    return {'number': number, 'title': title, 'body': body, 'href': f"file:///corpus/page{number}.html"}
+
+def test_confident_local_ranking_selects_pages_without_the_llm(llm_config, fake_llm, fake_provider):
+    engine = make_engine(llm_config, fake_provider)
+    results = [
+        file_result(1, "Solar battery storage", "How home battery storage holds solar power."),
+        file_result(2, "Cooking", "Recipes for the weekend."),
+        file_result(3, "Football", "Scores from the league."),
+    ]
+
+    selected = engine.select_relevant_pages(results, "solar battery storage")
+
+    assert selected == ["file:///corpus/page1.html"]
+    assert fake_llm.prompts == []
+
+def test_ambiguous_ranking_sends_only_the_shortlist_to_the_llm(llm_config, fake_llm, fake_provider):
+    engine = make_engine(llm_config, fake_provider)
+    results = [file_result(n, f"Solar battery storage {n}", "Battery storage for solar power.") for n in range(1, 9)]
+
+    selected = engine.select_relevant_pages(results, "solar battery storage")
+
+    assert selected == ["file:///corpus/page1.html", "file:///corpus/page2.html"]
+    [prompt] = [prompt for prompt in fake_llm.prompts if 'Selected Results' in prompt]
+    assert prompt.count("file:///corpus/page") == engine.ranker.shortlist_size
+
+class ScriptedProvider(SearchProvider):
+    """Fixed result lists per query"""
+    name = "scripted"
+    cacheable = False
+
+    def __init__(self, results):
+        self.results = results
+
+    def search(self, query, time_range='none', max_results=10):
+        return [{'title': href, 'href': href, 'body': query} for href in self.results[query]]
+
+def test_fanned_out_searches_are_interleaved_by_rank_without_duplicate_urls(llm_config):
+    engine = make_engine(llm_config, ScriptedProvider({
+        'battery storage': ["https://a.org/1", "https://a.org/2", "https://a.org/3"],
+        'pumped hydro': ["http://www.a.org/1/", "https://b.org/1", "https://b.org/2#section"],
+        'thermal storage': ["https://c.org/1", "https://b.org/2"],
+    }))
+
+    results = engine.perform_searches(["battery storage", "pumped hydro", "", "thermal storage"], max_results=5)
+
+    assert [result['href'] for result in results] == [
+        "https://a.org/1", "https://c.org/1", "https://a.org/2", "https://b.org/1", "https://b.org/2"
+    ]
+    assert [result['number'] for result in results] == [1, 2, 3, 4, 5]
+    assert engine.perform_searches(["", ""]) == []
+
+def test_page_selection_accepts_one_up_to_the_chosen_count_of_distinct_results(llm_config, fake_provider):
+    engine = make_engine(llm_config, fake_provider)
+
+    def valid(selected, max_selected=3):
+        return engine.validate_page_selection_response({'selected_results': selected}, 5, {1, 2, 3, 4}, max_selected)
+
+    assert valid([2])
+    assert valid([1, 3, 4])
+    assert not valid([])
+    assert not valid([1, 2, 3, 4])
+    assert not valid([2, 2])
+    assert not valid([5])
+
+def test_sufficient_snippets_answer_without_scraping(llm_config, fake_llm, fake_provider, monkeypatch):
+    def answering_create(prompt, stream=False, **parameters):
+        if 'Search Snippets' in prompt:
+            fake_llm.prompts.append(prompt)
+            return SimpleNamespace(choices=[SimpleNamespace(text="Evaluation: the snippets list the methods\nDecision: answer")])
+        return fake_llm.create(prompt, stream=stream, **parameters)
+    monkeypatch.setattr(openai.Completion, 'create', answering_create)
+    engine = make_engine(llm_config, fake_provider)
+    monkeypatch.setattr(engine, 'scrape_content', lambda urls: pytest.fail("pages were scraped"))
+
+    answer = engine._run_attempt("How is solar power stored?", "solar storage", "none")
+
+    assert answer.startswith("Summary")
+    assert not any('Selected Results' in prompt for prompt in fake_llm.prompts)
+    # The final answer is written from the snippets
+    assert "pumped hydro and thermal storage" in fake_llm.prompts[-1]
+
+def test_short_snippets_or_snippet_first_disabled_go_straight_to_the_pages(llm_config, fake_llm, fake_provider, monkeypatch):
+    engine = make_engine(llm_config, fake_provider)
+    results = [file_result(1, "Storage", "Batteries.")]
+    assert engine.collect_snippets(results, "solar storage") == {}
+
+    engine.snippet_first = False
+    scraped = []
+    monkeypatch.setattr(engine, 'scrape_content', lambda urls: scraped.extend(urls) or {})
+
+    assert engine._run_attempt("How is solar power stored?", "solar storage", "none") is None
+    assert scraped
+    assert not any('Search Snippets' in prompt for prompt in fake_llm.prompts)
@@ -0,0 +1,92 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from src.search_providers import LocalIndexProvider, SearxNGProvider, get_search_provider
+
+@pytest.fixture
+def corpus(tmp_path):
+    corpus_dir = tmp_path / "corpus"
+    corpus_dir.mkdir()
+    (corpus_dir / "batteries.html").write_text(
+        "<html><head><title>Home batteries</title><script>var battery = 1;</script></head>"
+        "<body><p>Lithium battery storage keeps solar power for the evening. Battery prices fell.</p></body></html>")
+    (corpus_dir / "hydro.md").write_text("Pumped hydro stores power by moving water uphill. Storage at grid scale.")
+    (corpus_dir / "notes.txt").write_text("Wind turbines need no storage on windy days.")
+    (corpus_dir / "image.png").write_bytes(b"battery")
+    return corpus_dir
+
+def test_local_index_ranks_matching_files_with_bm25(corpus):
+    provider = LocalIndexProvider(str(corpus))
+
+    results = provider.search("battery storage")
+
+    # Two matching terms outrank one; the PNG is not indexed
+    assert [r['title'] for r in results][0] == "Home batteries"
+    assert sorted(r['title'] for r in results[1:]) == ["hydro", "notes"]
+    assert results[0]['href'] == (corpus / "batteries.html").as_uri()
+    assert "Lithium battery storage" in results[0]['body']
+    assert "var battery" not in results[0]['body']
+    assert len(provider.search("battery storage", max_results=1)) == 1
+
+def test_local_index_treats_query_syntax_as_plain_terms(corpus):
+    provider = LocalIndexProvider(str(corpus))
+
+    assert provider.search('"pumped" OR NEAR(hydro')[0]['title'] == "hydro"
+    assert provider.search("*** ---") == []
+
+def test_local_index_follows_changes_to_the_corpus(corpus):
+    provider = LocalIndexProvider(str(corpus))
+    assert provider.refresh() == 0
+
+    (corpus / "notes.txt").unlink()
+    (corpus / "thermal.txt").write_text("Molten salt stores solar heat.")
+    hydro = corpus / "hydro.md"
+    hydro.write_text("Pumped hydro reservoirs.")
+    os.utime(hydro, (time.time() + 10, time.time() + 10))
+
+    assert provider.refresh() == 2
+    assert [r['title'] for r in provider.search("salt")] == ["thermal"]
+    assert provider.search("windy") == []
+    assert provider.search("grid") == []
+
+def test_local_index_filters_by_time_range(corpus):
+    old = time.time() - 30 * 24 * 60 * 60
+    os.utime(corpus / "hydro.md", (old, old))
+    provider = LocalIndexProvider(str(corpus))
+
+    assert [r['title'] for r in provider.search("pumped hydro", time_range='m')] == ["hydro"]
+    assert provider.search("pumped hydro", time_range='w') == []
+
+def test_local_index_serves_concurrent_searches(corpus):
+    provider = LocalIndexProvider(str(corpus))
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: provider.search("storage"), range(32)))
+
+    assert all(len(r) == 3 for r in results)
+
+def test_searxng_results_are_mapped_to_the_common_format(monkeypatch):
+    provider = SearxNGProvider("http://searx.local/")
+    calls = []
+
+    def get(url, params, timeout):
+        calls.append((url, params))
+        results = [{'title': 'A', 'url': 'https://a.example', 'content': 'first'},
+                   {'title': 'No url', 'content': 'dropped'},
+                   {'title': 'B', 'url': 'https://b.example', 'content': 'second'}]
+        return SimpleNamespace(raise_for_status=lambda: None, json=lambda: {'results': results})
+
+    monkeypatch.setattr(provider.session, 'get', get)
+
+    results = provider.search("solar", time_range='w', max_results=2)
+
+    assert calls == [("http://searx.local/search", {'q': 'solar', 'format': 'json', 'time_range': 'week'})]
+    assert results == [{'title': 'A', 'href': 'https://a.example', 'body': 'first'}]
+
+def test_unknown_provider_is_rejected():
+    with pytest.raises(ValueError, match="Unknown search provider"):
+        get_search_provider("bing")
@@ -0,0 +1,57 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+from src.service import ResearchHTTPServer, ResearchService
+
+DEFAULTS = {'preset': 'default', 'queries_per_focus': 1, 'max_minutes': 1,
+            'max_llm_tokens': None, 'max_pages': None, 'max_document_tokens': None}
+
+@pytest.fixture
+def service(workdir, resources, llm_config):
+    preset_dir = workdir / "config" / "model_presets"
+    preset_dir.mkdir(parents=True)
+    (preset_dir / "default.json").write_text(json.dumps(llm_config))
+    return ResearchService(resources, str(workdir / "service_results"), DEFAULTS)
+
+@pytest.mark.parametrize("preset", ["../../etc/passwd", "/etc/hosts", "model_presets/default", "missing", 7])
+def test_submit_rejects_presets_outside_the_preset_directory(service, preset):
+    with pytest.raises(ValueError):
+        service.submit({'query': "How is solar power stored?", 'preset': preset})
+
+def test_submit_accepts_a_known_preset(service):
+    job = service.submit({'query': "How is solar power stored?", 'preset': "default"})
+
+    assert job.status == 'queued'
+
+@pytest.fixture
+def server(service):
+    server = ResearchHTTPServer(("127.0.0.1", 0), service)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def request(server, method, path, headers=None):
+    # A short timeout turns a handler that blocks on the body into a failure instead of a hang
+    connection = http.client.HTTPConnection(*server.server_address, timeout=5)
+    connection.putrequest(method, path)
+    for name, value in (headers or {}).items():
+        connection.putheader(name, value)
+    connection.endheaders()
+    response = connection.getresponse()
+    status = response.status
+    connection.close()
+    return status
+
+@pytest.mark.parametrize("length, status", [("-1", 400), ("abc", 400), (str(10 ** 9), 413)])
+def test_submit_rejects_invalid_content_length(server, length, status):
+    assert request(server, "POST", "/jobs", {"Content-Length": length}) == status
+
+def test_events_reject_a_negative_since(server, service):
+    job = service.submit({'query': "How is solar power stored?"})
+
+    assert request(server, "GET", f"/jobs/{job.id}/events?since=-3") == 400
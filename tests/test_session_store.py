@@ -0,0 +1,81 @@
+import sqlite3
+import threading
+
+from src.session_factory import build_research_manager
+from src.session_store import SessionStore
+from src.summarizer import estimate_tokens
+
+def make_store(tmp_path):
+    store = SessionStore(str(tmp_path / "session.db"))
+    store.set_meta('session_number', "1")
+    store.set_meta('topic', "How is solar power stored?")
+    return store
+
+def test_sources_are_stored_once_with_chunks_and_token_counts(tmp_path):
+    store = make_store(tmp_path)
+    content = " ".join(f"word{i}" for i in range(300))
+
+    assert store.add_source("https://example.com/a", "Batteries", content) is not None
+    assert store.add_source("https://example.com/a", "Batteries", "Fetched again.") is None
+
+    assert store.source_count() == 1
+    assert store.has_source("https://example.com/a")
+    assert store.total_tokens() == estimate_tokens(content)
+    chunks = list(store.iter_chunks())
+    assert len(chunks) > 1
+    assert all(url == "https://example.com/a" and area == "Batteries" for _, url, area in chunks)
+
+def test_focus_area_stats_count_queries_sources_and_tokens(tmp_path):
+    store = make_store(tmp_path)
+    store.add_focus_area("Batteries", 5)
+    store.add_query("Batteries", "lithium storage")
+    store.add_query("Batteries", "battery cost")
+    store.add_source("https://example.com/a", "Batteries", "Lithium batteries store power.")
+    store.add_source("https://example.com/b", "Hydro", "Pumped hydro moves water.")
+
+    stats = {row['area']: row for row in store.focus_area_stats()}
+
+    assert stats["Batteries"] == {'area': "Batteries", 'priority': 5, 'queries': 2, 'sources': 1,
+                                  'tokens': estimate_tokens("Lithium batteries store power.")}
+    assert stats["Hydro"]['sources'] == 1
+
+def test_document_is_an_export_view_of_the_store(tmp_path):
+    store = make_store(tmp_path)
+    store.add_source("https://example.com/a", "Batteries", "Lithium batteries store power.")
+    store.add_source("https://example.com/b", "Hydro", "Pumped hydro moves water.")
+
+    store.export_text(str(tmp_path / "session.txt"))
+    document = (tmp_path / "session.txt").read_text()
+
+    assert document.startswith("Research Session 1\nTopic: How is solar power stored?")
+    assert document.index("Source: https://example.com/a") < document.index("Source: https://example.com/b")
+    assert "Research Focus: Hydro" in document
+
+def test_store_uses_wal_and_accepts_concurrent_writers(tmp_path):
+    store = make_store(tmp_path)
+
+    def write(worker):
+        for i in range(50):
+            store.add_source(f"https://example.com/{worker}/{i}", f"area {worker}", f"finding {worker} {i}")
+
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert store.source_count() == 200
+    mode = sqlite3.connect(str(tmp_path / "session.db")).execute("PRAGMA journal_mode").fetchone()[0]
+    assert mode == "wal"
+
+def test_manager_appends_findings_to_store_and_document(workdir, fake_llm, resources, llm_config):
+    manager = build_research_manager(llm_config, resources)
+    manager.original_query = "How is solar power stored?"
+    manager.document_path = str(workdir / "session.txt")
+    manager._open_store(str(workdir / "session.db"), "1")
+
+    assert manager.add_to_document("Lithium batteries store power.", "https://example.com/a", "Batteries") > 0
+    assert manager.add_to_document("Lithium batteries store power.", "https://example.com/a", "Batteries") == 0
+
+    assert manager.store.source_count() == 1
+    assert (workdir / "session.txt").read_text() == manager.store.render_document()
@@ -0,0 +1,127 @@
+import pytest
+
+from src.session_factory import build_research_manager
+from src.summarizer import MapReduceSummarizer, RollingSummarizer, estimate_tokens
+
+# Instructions and labels of the update prompt, on top of the notes and findings
+PROMPT_OVERHEAD = 150
+
+class RecordingLLM:
+    def __init__(self, response="Updated notes.", fail=False):
+        self.response = response
+        self.fail = fail
+        self.prompts = []
+
+    def generate(self, prompt, parameter_override=None, **overrides):
+        self.prompts.append(prompt)
+        if self.fail:
+            raise ConnectionError("LLM server unavailable")
+        return self.response
+
+def test_update_prompts_fit_the_chunk_budget():
+    llm = RecordingLLM(response=" ".join(["note"] * 2000))
+    summarizer = RollingSummarizer(llm, n_ctx=1024)
+    summarizer.add_finding("storage", " ".join(f"word{i}" for i in range(5000)), "https://example.com/a")
+    summarizer.flush()
+    summarizer.add_finding("storage", "A short finding.", "https://example.com/b")
+    summarizer.flush()
+
+    assert len(llm.prompts) > 2
+    for prompt in llm.prompts:
+        assert estimate_tokens(prompt) <= summarizer.chunk_tokens + PROMPT_OVERHEAD
+    assert not summarizer.pending_findings()
+
+def test_failed_update_keeps_notes_and_findings():
+    llm = RecordingLLM()
+    summarizer = RollingSummarizer(llm, n_ctx=1024)
+    summarizer.add_finding("storage", "Batteries store solar power.", "https://example.com/a")
+    assert summarizer.flush() == {"storage": "Updated notes."}
+
+    llm.fail = True
+    summarizer.add_finding("storage", "Pumped hydro stores it too.", "https://example.com/b")
+    assert summarizer.flush() == {"storage": "Updated notes."}
+    assert summarizer.pending_findings() == {"storage": ["Source: https://example.com/b\nPumped hydro stores it too."]}
+
+    llm.fail = False
+    assert summarizer.flush() == {"storage": "Updated notes."}
+    assert not summarizer.pending_findings()
+
+def test_flush_with_background_thread_returns_when_updates_fail():
+    llm = RecordingLLM(fail=True)
+    summarizer = RollingSummarizer(llm, n_ctx=1024)
+    summarizer.start("How is solar power stored?")
+    try:
+        summarizer.add_finding("storage", "Batteries store solar power.", "https://example.com/a")
+        assert summarizer.flush(timeout=5) == {}
+        assert summarizer.pending_findings()
+    finally:
+        summarizer.stop()
+
+def test_map_reduce_summarizes_a_document_larger_than_the_context():
+    llm = RecordingLLM(response=" ".join(["note"] * 100))
+    summarizer = MapReduceSummarizer(llm, n_ctx=1024)
+    sections = [f"Source {i}: " + " ".join(f"fact{i}w{j}" for j in range(800)) for i in range(8)]
+
+    summary = summarizer.summarize_sections(iter(sections), "How is solar power stored?")
+
+    assert summary == llm.response
+    chunk_prompts = [p for p in llm.prompts if "Extract and summarize" in p]
+    merge_prompts = [p for p in llm.prompts if "Combine the following" in p]
+    final_prompts = [p for p in llm.prompts if "comprehensive research summary" in p]
+    # Every section is larger than a chunk, so each is split; the notes then need merging
+    assert len(chunk_prompts) >= 16
+    assert merge_prompts
+    assert len(final_prompts) == 1
+    for prompt in llm.prompts:
+        assert estimate_tokens(prompt) <= summarizer.chunk_tokens + 2 * PROMPT_OVERHEAD
+    # Nothing the map step was given is lost: the chunks cover every section
+    assert all(f"fact{i}w0 " in "".join(chunk_prompts) for i in range(8))
+
+def test_map_reduce_goes_straight_to_the_final_summary_when_the_document_fits():
+    llm = RecordingLLM(response="Batteries and pumped hydro.")
+    summarizer = MapReduceSummarizer(llm, n_ctx=1024)
+
+    summary = summarizer.summarize("Batteries store solar power. Pumped hydro too.", "How is solar power stored?")
+
+    assert summary == "Batteries and pumped hydro."
+    assert len(llm.prompts) == 1
+    assert "Batteries store solar power." in llm.prompts[0]
+
+def test_session_larger_than_the_context_is_not_capped_and_is_summarized(workdir, fake_llm, resources, llm_config):
+    manager = build_research_manager(llm_config, resources)
+    manager.original_query = "How is solar power stored?"
+    manager.document_path = str(workdir / "session.txt")
+    manager._open_store(str(workdir / "session.db"), "1")
+    for i in range(6):
+        manager.store.add_source(f"https://example.com/{i}", "storage", " ".join(f"fact{i}w{j}" for j in range(1500)))
+
+    assert manager.store.total_tokens() > 4 * llm_config['n_ctx']
+    assert not manager.check_document_size()
+    summary = manager.terminate_research()
+
+    assert "Summary" in summary
+    assert len(fake_llm.prompts) > 1
+    assert all(estimate_tokens(prompt) < llm_config['n_ctx'] for prompt in fake_llm.prompts)
+
+@pytest.mark.parametrize("from_rolling_summaries", [True, False])
+def test_assessment_prompt_fits_the_context(workdir, fake_llm, resources, llm_config, monkeypatch, from_rolling_summaries):
+    manager = build_research_manager(llm_config, resources)
+    manager.original_query = "How is solar power stored?"
+    manager.document_path = str(workdir / "session.txt")
+    manager._open_store(str(workdir / "session.db"), "1")
+    long_text = " ".join(f"storage{i}" for i in range(3000))
+    for i in range(5):
+        manager.store.add_source(f"https://example.com/{i}", f"area {i}", long_text)
+    if from_rolling_summaries:
+        monkeypatch.setattr(manager.rolling_summary, 'flush',
+                            lambda timeout=None: {f"area {i}": long_text for i in range(5)})
+    manager.llm_wrapper.generate = lambda prompt, *args, **kwargs: fake_llm.prompts.append(prompt) or "Sufficient."
+
+    manager.pause_and_assess()
+
+    prompt = fake_llm.prompts[-1]
+    assert "Research Content:" in prompt
+    assert estimate_tokens(prompt) + 200 <= llm_config['n_ctx']
+    # Every area or source is represented, not just the first ones
+    for i in range(5):
+        assert (f"area {i}" if from_rolling_summaries else f"https://example.com/{i}") in prompt
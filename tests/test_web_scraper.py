@@ -0,0 +1,52 @@
+"""Scraping through the page knowledge base: failures to store a page, and whose base is used"""
+import sqlite3
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.page_knowledge import PageKnowledgeBase
+from src.web_scraper import WebScraper, get_web_content
+
+PAGE = b"<html><head><title>Storage</title></head><body><p>Pumped hydro stores energy.</p></body></html>"
+
+class PageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = PAGE if self.path != '/robots.txt' else b""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class LockedKnowledgeBase(PageKnowledgeBase):
+    """A knowledge base whose database another process holds locked"""
+
+    def put(self, url, page):
+        raise sqlite3.OperationalError("database is locked")
+
+@pytest.fixture
+def page_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/storage"
+    server.shutdown()
+    server.server_close()
+
+def test_page_survives_a_failed_store(workdir, page_url):
+    scraper = WebScraper(rate_limit=0, knowledge_base=LockedKnowledgeBase(path=None))
+    page = scraper.scrape_page(page_url)
+    assert page is not None
+    assert "Pumped hydro" in page['content']
+
+def test_engine_knowledge_base_receives_pages(workdir, page_url):
+    own = PageKnowledgeBase(path="session/pages.db")
+    content = get_web_content([page_url], knowledge_base=own)
+    assert "Pumped hydro" in content[page_url]
+    assert own.contains(page_url)
+    # The process-wide base stays untouched by a session that brought its own
+    assert not PageKnowledgeBase(path="cache/page_knowledge.db").contains(page_url)